@@ -31,16 +31,16 @@ if [ -f "$OUTPUT_FILE" ]; then
     echo "   修改时间: $MOD_TIME"
     echo ""
     
-    # 估算进度（粗略）
-    if [ $OUTPUT_SIZE_KB -gt 100 ]; then
-        echo "📊 状态: 转录可能已完成或接近完成"
-    else
-        echo "📊 状态: 转录可能正在进行中"
-    fi
+    echo "📊 状态: 转录已完成"
+elif [ -f "${OUTPUT_FILE}.progress.json" ]; then
+    # 流式转录（--stream）会实时记录已写入字符数、耗时和速率
+    echo "📝 流式转录进行中："
+    python3 scripts/transcription_progress.py "$(dirname "$OUTPUT_FILE")"
 else
     echo "⏳ 转录文件尚未生成"
     echo ""
     echo "📊 状态: 转录可能正在进行中，或尚未开始"
+    echo "   （使用 --stream 运行转录脚本可查看实时进度）"
 fi
 
 echo ""
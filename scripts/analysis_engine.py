@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+按播客公平调度的并发执行器，供批量分析并发处理多期转录
+
+run_fair() 用固定数量的工作线程处理按键（播客）分组的任务：
+- 每次空出一个线程时，从还有待处理任务的播客里挑当前在跑任务最少的那个，
+  并列时按轮转顺序，保证单集很多的播客不会占满线程、把其它播客饿住
+- 所有线程通常共享同一个 RateLimiter，并发只决定排队顺序，实际请求速率仍由限速器控制
+- 任一任务抛出异常后不再发放新任务，等在跑的任务结束后把第一个异常抛给调用方
+"""
+
+import threading
+from typing import Callable, Dict, List
+
+
+def run_fair(jobs_by_key: Dict[str, List], func: Callable, workers: int = 3, on_done: Callable = None) -> Dict[str, List]:
+    """并发执行 func(key, job)，返回 {key: [结果...]}，结果顺序与输入任务顺序一致
+
+    on_done(key, job, result) 在每个任务完成后于工作线程中调用（用于落盘、打印进度）。
+    """
+    keys = [key for key, jobs in jobs_by_key.items() if jobs]
+    results = {key: [None] * len(jobs) for key, jobs in jobs_by_key.items()}
+    next_index = {key: 0 for key in keys}
+    in_flight = {key: 0 for key in keys}
+    turn = [0]  # 轮转指针：上次选中的播客之后的那个优先
+    errors = []
+    lock = threading.Lock()
+
+    def take():
+        """选出下一个任务；全部发完（或已出错）时返回None"""
+        pending = [i for i, key in enumerate(keys) if next_index[key] < len(jobs_by_key[key])]
+        if errors or not pending:
+            return None
+        position = min(pending, key=lambda i: (in_flight[keys[i]], (i - turn[0]) % len(keys)))
+        key = keys[position]
+        turn[0] = position + 1
+        index = next_index[key]
+        next_index[key] += 1
+        in_flight[key] += 1
+        return key, index
+
+    def worker():
+        while True:
+            with lock:
+                task = take()
+            if task is None:
+                return
+            key, index = task
+            job = jobs_by_key[key][index]
+            try:
+                result = func(key, job)
+                results[key][index] = result
+                if on_done:
+                    on_done(key, job, result)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+            finally:
+                with lock:
+                    in_flight[key] -= 1
+
+    total = sum(len(jobs_by_key[key]) for key in keys)
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, min(workers, total)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
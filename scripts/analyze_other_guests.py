@@ -4,10 +4,15 @@
 使用Gemini API分析他们的公开内容
 """
 
+import argparse
 import json
 import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent))
+from json_extract import INSIGHT_SCHEMA, add_structured_argument, print_run_stats, request_json
+from rate_limiter import RateLimiter
+
 try:
     import google.generativeai as genai
 except ImportError:
@@ -50,7 +55,8 @@ OTHER_GUESTS = {
     }
 }
 
-def analyze_guest_with_gemini(guest_name: str, guest_info: dict, collected_content: str = None):
+def analyze_guest_with_gemini(guest_name: str, guest_info: dict, collected_content: str = None,
+                              rate_limiter: RateLimiter = None):
     """使用Gemini API分析嘉宾信息"""
     print(f"\n分析 {guest_name}...")
     
@@ -98,38 +104,14 @@ def analyze_guest_with_gemini(guest_name: str, guest_info: dict, collected_conte
 """
     
     try:
-        response = model.generate_content(analysis_prompt)
-        result_text = response.text
-        
-        # 提取JSON
-        import re
-        json_match = re.search(r'\{.*?\}', result_text, re.DOTALL)
-        if json_match:
-            insights = json.loads(json_match.group(0))
-        else:
-            insights = {
-                'raw_analysis': result_text,
-                'professional_observations': [],
-                'content_creation_philosophy': [],
-                'industry_insights': [],
-                'personal_views': [],
-                'discussion_topics': [],
-                'expression_style': ''
-            }
+        # 请求JSON（结构化输出或文本提取，失败时重试/修复）
+        insights, result_text = request_json(model, analysis_prompt, INSIGHT_SCHEMA, rate_limiter)
+        if insights is None:
+            insights = {'raw_analysis': result_text}
         
         # 确保所有键都存在
-        default_keys = {
-            'professional_observations': [],
-            'content_creation_philosophy': [],
-            'industry_insights': [],
-            'personal_views': [],
-            'discussion_topics': [],
-            'expression_style': ''
-        }
-        
-        for key, default_value in default_keys.items():
-            if key not in insights:
-                insights[key] = default_value
+        for key, expected in INSIGHT_SCHEMA.items():
+            insights.setdefault(key, [] if expected is list else '')
         
         insights['guest_name'] = guest_name
         insights['role'] = guest_info['role']
@@ -177,6 +159,10 @@ def collect_guest_info_from_pdf(guest_name: str):
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="分析其他嘉宾的观点")
+    add_structured_argument(parser)
+    parser.parse_args()
+    
     print("=" * 60)
     print("分析其他3位嘉宾（潘乱、曾鸣、张晶）")
     print("=" * 60)
@@ -185,6 +171,7 @@ def main():
     output_dir.mkdir(exist_ok=True)
     
     results = {}
+    rate_limiter = RateLimiter(requests_per_minute=20)
     
     for guest_name, guest_info in OTHER_GUESTS.items():
         print(f"\n处理 {guest_name}...")
@@ -193,7 +180,7 @@ def main():
         pdf_content = collect_guest_info_from_pdf(guest_name)
         
         # 使用Gemini分析
-        insights = analyze_guest_with_gemini(guest_name, guest_info, pdf_content)
+        insights = analyze_guest_with_gemini(guest_name, guest_info, pdf_content, rate_limiter)
         
         if insights:
             results[guest_name] = {
@@ -201,9 +188,6 @@ def main():
                 'podcast': guest_info.get('podcast', '无'),
                 'insights': insights
             }
-        
-        import time
-        time.sleep(3)  # API间隔
     
     # 保存结果
     results_file = output_dir / "other_guests_analysis.json"
@@ -211,6 +195,7 @@ def main():
         json.dump(results, f, ensure_ascii=False, indent=2)
     
     print(f"\n✅ 分析完成！结果已保存到: {results_file}")
+    print_run_stats()
     
     # 生成摘要
     summary_file = output_dir / "other_guests_summary.md"
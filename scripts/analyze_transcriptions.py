@@ -3,12 +3,28 @@
 使用Gemini API分析播客转录文本，重点提取主播（Panel嘉宾）的观点
 """
 
+import argparse
+import hashlib
 import json
-import re
-import time
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict
 
+sys.path.insert(0, str(Path(__file__).parent))
+from analysis_engine import run_fair
+from rate_limiter import RateLimiter
+from host_context import compact_utterances, format_compaction
+from insight_dedup import cluster_insights, gemini_embed
+from json_extract import (INSIGHT_SCHEMA, add_structured_argument, parse_json_response, print_run_stats,
+                          request_json, structured_output_enabled)
+from speaker_spans import host_spans, span_texts
+from transcript_chunks import chunk_utterances, coverage
+from transcript_normalizer import MANIFEST_FILENAME, NORMALIZED_DIRNAME
+from utterance_store import UtteranceStore, open_store
+
 try:
     import google.generativeai as genai
 except ImportError:
@@ -27,85 +43,54 @@ if not GEMINI_API_KEY:
 
 genai.configure(api_key=GEMINI_API_KEY)
 
+# 发给模型的文本不超过一块的 token 预算时一次调用分析完，更长的按发言边界分块做 map-reduce
+DEFAULT_CHUNK_TOKENS = 12000
+# 每期分析结果单独保存（附源文件哈希和分析参数）。模型、结构化输出模式和提示词模板都记在参数里，
+# 改了自动失效；只有解析/合并逻辑改变时才需要调高版本号
+EPISODE_ANALYSES_DIRNAME = "episode_analyses"
+ANALYSIS_VERSION = 4
+# 汇总逻辑改变时调高，上次的汇总不再直接沿用
+SUMMARY_VERSION = 2
+# 每类洞察汇总后保留的条数
+MAX_SUMMARY_INSIGHTS = 15
+INSIGHT_LIST_KEYS = [
+    'professional_observations', 'content_creation_philosophy', 'industry_insights',
+    'personal_views', 'discussion_topics',
+]
+
 def identify_host_statements(text: str, host_keywords: List[str] = None) -> List[str]:
     """识别主播的发言 - 重点提取Panel嘉宾（播客主播）的观点"""
-    if host_keywords is None:
-        # 常见的主播标识
-        host_keywords = [
-            "主持人", "主播", "我", "我们", "今天", "这一期",
-            "邀请", "欢迎", "接下来", "刚才", "刚才我们"
-        ]
-    
-    host_statements = []
-    
-    # 方法1：如果转录中有[主播]标签，直接提取
-    if '[主播]' in text or '主播' in text:
-        # 按行分割，查找主播标记的段落
-        lines = text.split('\n')
-        current_statement = []
-        
-        for line in lines:
-            if '[主播]' in line or line.strip().startswith('[主播]'):
-                if current_statement:
-                    host_statements.append(' '.join(current_statement))
-                current_statement = [line]
-            elif current_statement and not line.strip().startswith('['):
-                # 继续当前主播发言
-                current_statement.append(line)
-            elif current_statement:
-                # 主播发言结束
-                if current_statement:
-                    host_statements.append(' '.join(current_statement))
-                current_statement = []
-    
-    # 方法2：如果没有明确标签，使用启发式方法
-    if not host_statements:
-        paragraphs = text.split('\n\n')
-        
-        for para in paragraphs:
-            para_lower = para.lower()
-            
-            # 检查是否明确标注为主播
-            if '[主播]' in para or '主播：' in para or '主播:' in para:
-                host_statements.append(para)
-                continue
-            
-            # 检查是否包含主播关键词（排除嘉宾发言）
-            if any(keyword in para_lower for keyword in host_keywords):
-                # 排除可能是嘉宾说的话（包含"我"但上下文像是回答问题的）
-                if not (re.search(r'[嘉宾]|受访者|被访谈', para)):
-                    # 检查是否是提问句（主播更可能提问）
-                    if '?' in para or '？' in para:
-                        host_statements.append(para)
-                    # 检查是否是引导性语句
-                    elif re.match(r'^(让我们|现在|接下来|这一期|今天|欢迎)', para):
-                        host_statements.append(para)
-                    # 检查是否包含节目引导词
-                    elif re.search(r'(要聊|要讨论|来聊聊|来谈谈|来听听)', para):
-                        host_statements.append(para)
-    
-    return host_statements
-
-def extract_host_insights_with_gemini(text: str, host_name: str, podcast_name: str) -> Dict:
-    """使用Gemini API提取主播的核心观点和洞察"""
-    print(f"  使用Gemini API分析文本...")
-    
+    return span_texts(text, host_spans(text, host_keywords))
+
+def create_analysis_model():
+    """创建分析用的模型（依次尝试可用的模型版本）"""
     try:
-        model = genai.GenerativeModel("models/gemini-2.5-flash")
+        return genai.GenerativeModel("models/gemini-2.5-flash")
     except:
         try:
-            model = genai.GenerativeModel("models/gemini-2.0-flash")
+            return genai.GenerativeModel("models/gemini-2.0-flash")
         except:
-            model = genai.GenerativeModel("gemini-pro")
-    
-    # 准备分析提示词
-    analysis_prompt = f"""请分析以下播客转录文本，重点提取主播（{host_name}）的核心观点和洞察。
+            return genai.GenerativeModel("gemini-pro")
+
+def build_analysis_prompt(text: str, host_name: str, part: str = None, compacted: bool = False) -> str:
+    """主播观点分析提示词；part 形如 "2/5"，表示这是整期转录的第几部分；compacted 表示文本只保留了主播发言"""
+    compact_note = ""
+    if compacted:
+        compact_note = """- 下面的文本已预先筛选：只保留了主播的发言，以及每段主播发言之前对方发言的结尾片段（[嘉宾]/[其他] 开头，可能以"…"开始）作为上下文
+"""
+    part_note = ""
+    if part:
+        part_note = f"""
+**注意**：转录文本很长，已按发言顺序分成若干部分，这是第 {part} 部分。
+只需分析这一部分中出现的内容，各部分的结果会在之后合并，不必重复其他部分可能已有的内容。
+"""
+    return f"""请分析以下播客转录文本，重点提取主播（{host_name}）的核心观点和洞察。
 
 **重要说明**：
 - 主播是播客的主持人/制作者（{host_name}），这是Panel的嘉宾
 - 节目中的嘉宾是播客邀请的访谈对象，不是我们要分析的
 - 请重点关注主播的观点、观察、提问方式和内容创作理念
-
+{compact_note}
 **请提取以下内容**：
 
 1. **专业观察**：主播对行业、技术、商业的专业观察和判断（3-5条）
@@ -126,208 +111,386 @@ def extract_host_insights_with_gemini(text: str, host_name: str, podcast_name: s
 }}
 
 **转录文本**：
-{text[:20000] if len(text) > 20000 else text}
+{text}
 
 请以JSON格式输出，确保提取的都是主播的观点，而非节目中嘉宾的观点。
+{part_note}"""
 
-**注意**：如果转录文本很长，这是前20000字符的摘要。请基于这部分内容进行分析，重点关注主播的发言部分。
-"""
+def empty_insights(host_name: str, podcast_name: str, **extra) -> Dict:
+    insights = {key: [] for key in INSIGHT_LIST_KEYS}
+    insights['expression_style'] = ''
+    insights.update(host_name=host_name, podcast_name=podcast_name, **extra)
+    return insights
+
+def parse_insights(result_text: str, model=None, rate_limiter: RateLimiter = None, insights: Dict = None) -> Dict:
+    """从模型回复中解析洞察JSON（提供 model 时解析失败会请求修复），仍失败时保留原文
+
+    已经解析好的对象（结构化输出）通过 insights 传入，只补齐缺少的键。
+    """
+    if insights is None:
+        insights = parse_json_response(result_text, INSIGHT_SCHEMA, model, rate_limiter)
+    if insights is None:
+        # 如果不是有效JSON，返回文本结果
+        insights = {'raw_analysis': result_text}
+    
+    # 确保所有键都存在
+    for key in INSIGHT_LIST_KEYS:
+        insights.setdefault(key, [])
+    insights.setdefault('expression_style', '')
+    return insights
+
+def extract_host_insights_with_gemini(text: str, host_name: str, podcast_name: str, model=None, part: str = None,
+                                      rate_limiter: RateLimiter = None, compacted: bool = False) -> Dict:
+    """使用Gemini API提取主播的核心观点和洞察"""
+    label = f"第 {part} 部分" if part else "文本"
+    print(f"  使用Gemini API分析{label}...")
     
     try:
-        response = model.generate_content(analysis_prompt)
-        result_text = response.text
-        
-        # 尝试提取JSON
-        import json as json_module
-        # 查找JSON部分
-        json_match = re.search(r'\{[^{}]*\{[^{}]*\{.*?\}\}\}', result_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-        else:
-            # 如果没有找到，尝试提取第一个{}
-            json_match = re.search(r'\{.*?\}', result_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-            else:
-                json_str = result_text
-        
-        try:
-            insights = json_module.loads(json_str)
-        except:
-            # 如果不是有效JSON，返回文本结果
-            insights = {
-                'raw_analysis': result_text,
-                'professional_observations': [],
-                'content_creation_philosophy': [],
-                'industry_insights': [],
-                'personal_views': [],
-                'discussion_topics': [],
-                'expression_style': ''
-            }
-        
-        # 确保所有键都存在
-        default_keys = {
-            'professional_observations': [],
-            'content_creation_philosophy': [],
-            'industry_insights': [],
-            'personal_views': [],
-            'discussion_topics': [],
-            'expression_style': ''
-        }
-        
-        for key, default_value in default_keys.items():
-            if key not in insights:
-                insights[key] = default_value
-        
+        if model is None:
+            model = create_analysis_model()
+        insights, result_text = request_json(model, build_analysis_prompt(text, host_name, part, compacted),
+                                             INSIGHT_SCHEMA, rate_limiter)
+        insights = parse_insights(result_text, insights=insights)
         insights['host_name'] = host_name
         insights['podcast_name'] = podcast_name
         
-        print(f"    ✅ Gemini分析完成")
+        print(f"    ✅ Gemini分析完成{'（' + label + '）' if part else ''}")
         return insights
         
     except Exception as e:
-        print(f"    ❌ Gemini分析失败: {e}")
+        print(f"    ❌ Gemini分析失败{'（' + label + '）' if part else ''}: {e}")
         import traceback
         traceback.print_exc()
-        return {
-            'host_name': host_name,
-            'podcast_name': podcast_name,
-            'error': str(e),
-            'professional_observations': [],
-            'content_creation_philosophy': [],
-            'industry_insights': [],
-            'personal_views': [],
-            'discussion_topics': [],
-            'expression_style': ''
-        }
-
-def analyze_transcription_file(transcription_file: Path, host_name: str, podcast_name: str) -> Dict:
-    """分析单个转录文件 - 使用Gemini API"""
-    print(f"\n分析转录文件: {transcription_file.name}")
+        return empty_insights(host_name, podcast_name, error=str(e))
+
+def reduce_insights(partials: List[Dict], host_name: str, podcast_name: str) -> Dict:
+    """按分块顺序合并各部分的洞察：列表拼接后去重（保留首次出现的顺序），表达风格去重后拼接"""
+    merged = empty_insights(host_name, podcast_name)
+    styles = []
+    failed = []
+    for index, partial in enumerate(partials):
+        if partial.get('error'):
+            failed.append(index)
+        for key in INSIGHT_LIST_KEYS:
+            values = partial.get(key) or []
+            if not isinstance(values, list):
+                values = [values]
+            merged[key].extend(values)
+        style = partial.get('expression_style')
+        if style and style not in styles:
+            styles.append(style)
+    for key in INSIGHT_LIST_KEYS:
+        seen = set()
+        unique = []
+        for value in merged[key]:
+            marker = value.strip() if isinstance(value, str) else json.dumps(value, ensure_ascii=False, sort_keys=True)
+            if marker and marker not in seen:
+                seen.add(marker)
+                unique.append(value)
+        merged[key] = unique
+    merged['expression_style'] = ' | '.join(styles)
+    if failed:
+        merged['failed_chunks'] = failed
+        if len(failed) == len(partials):
+            merged['error'] = partials[0].get('error')
+    return merged
+
+def extract_host_insights_mapreduce(utterances: List[Dict], host_name: str, podcast_name: str,
+                                    chunk_tokens: int = DEFAULT_CHUNK_TOKENS, workers: int = 4,
+                                    rate_limiter: RateLimiter = None, compacted: bool = False,
+                                    host_chars: int = None) -> Dict:
+    """长转录的 map-reduce 分析：按发言边界分块、并发分析各块、再合并为一期的结果
+
+    host_chars 为原文的主播发言总字数（utterances 是压缩后的发言时传入），覆盖率按原文计算。
+    """
+    chunks = chunk_utterances(utterances, chunk_tokens)
+    host_coverage = coverage(utterances, chunks, total=host_chars)
+    print(f"  分块分析: {len(chunks)} 块（每块 ≤{chunk_tokens} tokens，共约 {sum(c['tokens'] for c in chunks)} tokens），"
+          f"主播发言覆盖 {host_coverage:.0%}")
     
-    if not transcription_file.exists():
-        print(f"  ❌ 文件不存在")
-        return None
+    model = create_analysis_model()
+    total = len(chunks)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, total))) as pool:
+        partials = list(pool.map(
+            lambda chunk: extract_host_insights_with_gemini(
+                chunk['text'], host_name, podcast_name, model=model,
+                part=f"{chunk['index'] + 1}/{total}", rate_limiter=rate_limiter, compacted=compacted),
+            chunks,
+        ))
     
-    with open(transcription_file, 'r', encoding='utf-8') as f:
-        text = f.read()
+    insights = reduce_insights(partials, host_name, podcast_name)
+    insights['chunk_count'] = total
+    insights['host_coverage'] = round(host_coverage, 4)
+    return insights
+
+def analyze_transcription_file(store: UtteranceStore, episode: int, host_name: str, podcast_name: str,
+                               rate_limiter: RateLimiter = None, chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                               workers: int = 4) -> Dict:
+    """分析发言存储中的一期转录 - 使用Gemini API（长转录走 map-reduce，覆盖全文）
+
+    发言和统计都直接取自存储（episode 为单集下标），不再读取原文、也不再重新拆分和识别说话人。
+    """
+    transcription_file = store.path.parent.parent / store.episodes[episode]['file']
+    print(f"\n分析转录文件: {transcription_file.name}")
     
-    if len(text.strip()) < 100:
+    stats = store.episode_stats(episode)
+    utterances = list(store.iter_episode(episode))
+    text_length = sum(len(u['text']) for u in utterances)
+    if text_length < 100:
         print(f"  ⚠️  文本过短，跳过")
         return None
     
-    print(f"  文本长度: {len(text)} 字符")
+    print(f"  文本长度: {text_length} 字符，{stats['utterances']} 句发言")
     
-    # 使用Gemini API提取洞察
-    insights = extract_host_insights_with_gemini(text, host_name, podcast_name)
+    # 只把主播发言（附少量上下文）发给模型
+    context = compact_utterances(utterances)
+    compacted = context['utterances'] is not None
+    print(f"  {format_compaction(context)}")
     
-    # 识别主播发言（用于统计）
-    host_statements = identify_host_statements(text)
+    # 使用Gemini API提取洞察
+    if context['tokens'] <= chunk_tokens:
+        insights = extract_host_insights_with_gemini(context['text'], host_name, podcast_name,
+                                                     rate_limiter=rate_limiter, compacted=compacted)
+    else:
+        insights = extract_host_insights_mapreduce(context['utterances'] if compacted else utterances,
+                                                   host_name, podcast_name, chunk_tokens, workers,
+                                                   rate_limiter, compacted,
+                                                   host_chars=context['host_chars'] if compacted else None)
+    insights['prompt_compression'] = round(context['ratio'], 4)
     
+    host_count = stats['speakers']['主播']
     result = {
         'file': str(transcription_file),
         'episode_name': transcription_file.stem,
-        'host_statements_count': len(host_statements),
+        'host_statements_count': host_count,
         'insights': insights,
-        'text_length': len(text),
-        'paragraph_count': len(text.split('\n\n'))
+        'text_length': text_length,
+        'utterance_count': stats['utterances'],
     }
     
     print(f"  ✅ 分析完成")
-    print(f"    主播发言段数: {len(host_statements)}")
+    print(f"    主播发言段数: {host_count}")
     print(f"    专业观察: {len(insights.get('professional_observations', []))} 条")
     print(f"    内容创作理念: {len(insights.get('content_creation_philosophy', []))} 条")
     
     return result
 
-def batch_analyze(transcriptions_dir: Path, output_dir: Path = None) -> Dict:
-    """批量分析转录文件"""
+def file_sha256(path: Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+def episode_artifact_path(artifact_dir: Path, rel_path: Path) -> Path:
+    """单集分析结果路径：research/episode_analyses/<播客>/<单集>.json"""
+    return artifact_dir / rel_path.with_suffix('.json')
+
+def load_episode_artifact(artifact_file: Path, source_sha256: str, settings: Dict) -> Dict:
+    """源文件哈希和分析参数都没变时返回已保存的单集结果，否则返回None"""
+    if not artifact_file.exists():
+        return None
+    try:
+        with open(artifact_file, 'r', encoding='utf-8') as f:
+            artifact = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return None
+    if artifact.get('source_sha256') != source_sha256 or artifact.get('settings') != settings:
+        return None
+    return artifact
+
+def save_episode_artifact(artifact_file: Path, source_sha256: str, settings: Dict, analysis: Dict):
+    artifact_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = artifact_file.with_suffix('.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'source_sha256': source_sha256, 'settings': settings, 'analysis': analysis},
+                  f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, artifact_file)
+
+def summarize_podcast(podcast_name: str, analyses: List[Dict]) -> Dict:
+    """汇总一个播客各期的主播观点"""
+    host_name = podcast_name.split('_')[1] if '_' in podcast_name else podcast_name
+    
+    # 合并所有分析结果（基于Gemini分析的结果）
+    merged_insights = {
+        'professional_observations': [],
+        'content_creation_philosophy': [],
+        'industry_insights': [],
+        'personal_views': [],
+        'discussion_topics': [],
+        'expression_styles': []
+    }
+    
+    for analysis in analyses:
+        if 'insights' in analysis:
+            insights = analysis['insights']
+            for key in merged_insights:
+                if key in insights:
+                    if isinstance(insights[key], list):
+                        merged_insights[key].extend(insights[key])
+                    elif insights[key]:  # 如果是字符串
+                        merged_insights[key].append(insights[key])
+            
+            # 收集表达风格
+            if 'expression_style' in insights and insights['expression_style']:
+                merged_insights['expression_styles'].append(insights['expression_style'])
+    
+    # 近似去重：说法相近的洞察聚成一簇，只留一条代表，按支持的条数排序后截断
+    # INSIGHT_DEDUP_EMBEDDINGS=1 时用 Gemini 嵌入判断相似度
+    embed = gemini_embed if os.getenv("INSIGHT_DEDUP_EMBEDDINGS") == "1" else None
+    insights = {}
+    insight_support = {}
+    for key, values in merged_insights.items():
+        if key == 'expression_styles':
+            continue
+        clusters = cluster_insights(values, embed=embed)[:MAX_SUMMARY_INSIGHTS]
+        insights[key] = [cluster['text'] for cluster in clusters]
+        insight_support[key] = [cluster['support'] for cluster in clusters]
+    
+    return {
+        'summary_version': SUMMARY_VERSION,
+        'host_name': host_name,
+        'podcast_name': podcast_name,
+        'episode_count': len(analyses),
+        'insights': insights,
+        'insight_support': insight_support,
+        'expression_style_summary': ' | '.join(merged_insights['expression_styles'][:3]) if merged_insights['expression_styles'] else '',
+        'key_themes': insights['discussion_topics'][:10]
+    }
+
+def analysis_settings(chunk_tokens: int) -> Dict:
+    """决定单集结果能否复用的分析参数"""
+    template = build_analysis_prompt('{text}', '{host_name}', '{part}', compacted=True)
+    return {
+        'version': ANALYSIS_VERSION,
+        'chunk_tokens': chunk_tokens,
+        'model': create_analysis_model().model_name,
+        'structured': structured_output_enabled(),
+        'prompt_sha256': hashlib.sha256(template.encode('utf-8')).hexdigest(),
+    }
+
+def batch_analyze(transcriptions_dir: Path, output_dir: Path = None, requests_per_minute: float = 20,
+                  chunk_tokens: int = DEFAULT_CHUNK_TOKENS, workers: int = 4, full: bool = False,
+                  tokens_per_minute: float = None, episode_workers: int = 3) -> Dict:
+    """批量分析转录文件（增量：只分析新增或内容变化的单集，只重新汇总受影响的播客）
+
+    需要分析的单集由 episode_workers 个线程并发处理，按播客轮转调度；
+    所有API请求共用一个按请求数/分钟和 token 数/分钟限速的令牌桶。
+    """
     if output_dir is None:
         output_dir = Path(__file__).parent.parent / "research"
     
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
+    artifact_dir = output_dir / EPISODE_ANALYSES_DIRNAME
+    summary_file = output_dir / "host_insights_analysis.json"
+    settings = analysis_settings(chunk_tokens)
     
-    # 查找所有转录文件
-    transcription_files = list(transcriptions_dir.rglob('*.txt'))
-    
-    if not transcription_files:
+    # 规范化所有转录并打开发言存储（增量更新，单集按路径排序，保证汇总顺序稳定）
+    store = open_store(transcriptions_dir)
+    if not store.episodes:
+        store.close()
         print(f"未找到转录文件在: {transcriptions_dir}")
         return {}
     
-    print(f"找到 {len(transcription_files)} 个转录文件")
+    print(f"找到 {len(store.episodes)} 个转录文件")
+    # 规范化清单里已有每个源文件的哈希，不必再读一遍原文
+    with open(transcriptions_dir / NORMALIZED_DIRNAME / MANIFEST_FILENAME, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
     
-    # 按播客分组
-    podcast_analyses = {}
-    
-    for txt_file in transcription_files:
+    # 按播客分组：每期先放复用的结果或待分析的任务，分析完再按原顺序汇总
+    podcast_episodes = {}
+    pending_jobs = {}
+    for index, episode in enumerate(store.episodes):
         # 从路径推断播客名称
-        rel_path = txt_file.relative_to(transcriptions_dir)
+        rel_path = Path(episode['file'])
         parts = rel_path.parts
-        if len(parts) >= 2:
-            podcast_name = parts[0]  # 播客目录名
-            if podcast_name not in podcast_analyses:
-                podcast_analyses[podcast_name] = []
-            
-            # 提取主播名称（从播客名称）
-            host_name = podcast_name.split('_')[1] if '_' in podcast_name else podcast_name
-            
-            analysis = analyze_transcription_file(txt_file, host_name, podcast_name)
-            if analysis:
-                podcast_analyses[podcast_name].append(analysis)
-            
-            # API请求间隔
-            time.sleep(3)
+        if len(parts) < 2:
+            continue
+        podcast_name = parts[0]  # 播客目录名
+        episodes = podcast_episodes.setdefault(podcast_name, [])
+        
+        txt_file = transcriptions_dir / rel_path
+        source_sha256 = manifest.get(str(rel_path), {}).get('sha256') or file_sha256(txt_file)
+        artifact_file = episode_artifact_path(artifact_dir, rel_path)
+        artifact = None if full else load_episode_artifact(artifact_file, source_sha256, settings)
+        if artifact is not None:
+            episodes.append(artifact['analysis'])
+            continue
+        job = {'file': txt_file, 'episode': index, 'artifact_file': artifact_file, 'source_sha256': source_sha256}
+        episodes.append(job)
+        pending_jobs.setdefault(podcast_name, []).append(job)
+    
+    changed_podcasts = set(pending_jobs)
+    pending_count = sum(len(jobs) for jobs in pending_jobs.values())
+    reused = sum(len(episodes) for episodes in podcast_episodes.values()) - pending_count
+    # 所有API请求（包括同一期的各个分块）共用一个限速器，替代固定的请求间隔
+    rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute=tokens_per_minute)
+    progress_lock = threading.Lock()
+    finished = [0]
+    
+    def analyze_job(podcast_name: str, job: Dict) -> Dict:
+        # 提取主播名称（从播客名称）
+        host_name = podcast_name.split('_')[1] if '_' in podcast_name else podcast_name
+        return analyze_transcription_file(store, job['episode'], host_name, podcast_name, rate_limiter,
+                                          chunk_tokens, workers)
+    
+    def job_done(podcast_name: str, job: Dict, analysis: Dict):
+        # 分析失败（包括只有部分分块失败）不落盘，下次运行重试；
+        # 过短跳过的单集也记录下来（analysis 为 None），内容不变就不再重复检查
+        insights = analysis['insights'] if analysis else {}
+        if insights.get('error') or insights.get('failed_chunks'):
+            print(f"  ⚠️ {podcast_name}/{job['file'].name} 有分块分析失败"
+                  f"（{insights.get('failed_chunks') or '全部'}），本次结果不保存，下次运行重试")
+        else:
+            save_episode_artifact(job['artifact_file'], job['source_sha256'], settings, analysis)
+        with progress_lock:
+            finished[0] += 1
+            print(f"  [{finished[0]}/{pending_count}] {podcast_name}/{job['file'].name} 完成")
+    
+    if pending_jobs:
+        print(f"并发分析 {pending_count} 期（{len(pending_jobs)} 个播客，{episode_workers} 个线程按播客轮转）")
+    try:
+        results = run_fair(pending_jobs, analyze_job, episode_workers, job_done) if pending_jobs else {}
+    finally:
+        store.close()
+    for podcast_name, jobs in pending_jobs.items():
+        analyses_by_job = {id(job): analysis for job, analysis in zip(jobs, results[podcast_name])}
+        podcast_episodes[podcast_name] = [analyses_by_job.get(id(entry), entry)
+                                          for entry in podcast_episodes[podcast_name]]
+    podcast_analyses = {podcast_name: [analysis for analysis in episodes if analysis]
+                        for podcast_name, episodes in podcast_episodes.items()}
     
-    # 汇总每个播客的主播观点
+    # 源转录已删除的单集
+    if artifact_dir.exists():
+        for artifact_file in sorted(artifact_dir.rglob('*.json')):
+            rel_path = artifact_file.relative_to(artifact_dir)
+            if not (transcriptions_dir / rel_path.with_suffix('.txt')).exists():
+                artifact_file.unlink()
+                changed_podcasts.add(rel_path.parts[0])
+    
+    print(f"\n单集分析: 复用 {reused} 个，重新分析 {pending_count} 个")
+    
+    # 只重新汇总受影响的播客，其余沿用上次的汇总
+    previous = {}
+    if summary_file.exists() and not full:
+        try:
+            with open(summary_file, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        except json.JSONDecodeError:
+            previous = {}
     summaries = {}
     for podcast_name, analyses in podcast_analyses.items():
-        host_name = podcast_name.split('_')[1] if '_' in podcast_name else podcast_name
-        
-        # 合并所有分析结果（基于Gemini分析的结果）
-        merged_insights = {
-            'professional_observations': [],
-            'content_creation_philosophy': [],
-            'industry_insights': [],
-            'personal_views': [],
-            'discussion_topics': [],
-            'expression_styles': []
-        }
-        
-        for analysis in analyses:
-            if 'insights' in analysis:
-                insights = analysis['insights']
-                for key in merged_insights:
-                    if key in insights:
-                        if isinstance(insights[key], list):
-                            merged_insights[key].extend(insights[key])
-                        elif insights[key]:  # 如果是字符串
-                            merged_insights[key].append(insights[key])
-                
-                # 收集表达风格
-                if 'expression_style' in insights and insights['expression_style']:
-                    merged_insights['expression_styles'].append(insights['expression_style'])
-        
-        # 去重并整理
-        summaries[podcast_name] = {
-            'host_name': host_name,
-            'podcast_name': podcast_name,
-            'episode_count': len(analyses),
-            'insights': {
-                key: list(dict.fromkeys(values))[:15] if isinstance(values, list) else values  # 去重保留顺序
-                for key, values in merged_insights.items()
-                if key != 'expression_styles'
-            },
-            'expression_style_summary': ' | '.join(merged_insights['expression_styles'][:3]) if merged_insights['expression_styles'] else '',
-            'key_themes': list(dict.fromkeys(merged_insights['discussion_topics']))[:10]
-        }
+        if (podcast_name not in changed_podcasts
+                and previous.get(podcast_name, {}).get('summary_version') == SUMMARY_VERSION):
+            summaries[podcast_name] = previous[podcast_name]
+        else:
+            summaries[podcast_name] = summarize_podcast(podcast_name, analyses)
+    if changed_podcasts:
+        print(f"重新汇总: {', '.join(sorted(changed_podcasts & set(summaries)))}")
     
     # 保存分析结果
-    summary_file = output_dir / "host_insights_analysis.json"
     with open(summary_file, 'w', encoding='utf-8') as f:
         json.dump(summaries, f, ensure_ascii=False, indent=2)
     
     print(f"\n✅ 分析完成！结果已保存到: {summary_file}")
+    print_run_stats()
     
     # 生成文本摘要
     summary_text_file = output_dir / "host_insights_summary.md"
@@ -385,6 +548,15 @@ def batch_analyze(transcriptions_dir: Path, output_dir: Path = None) -> Dict:
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="分析播客转录中的主播观点")
+    parser.add_argument("--full", action="store_true", help="忽略已保存的单集结果，全部重新分析")
+    parser.add_argument("--rpm", type=float, default=20, help="每分钟请求数上限")
+    parser.add_argument("--tpm", type=float, default=None, help="每分钟 token 数上限（默认不限）")
+    parser.add_argument("--workers", type=int, default=3, help="同时分析的单集数")
+    parser.add_argument("--chunk-workers", type=int, default=4, help="每期长转录同时分析的分块数")
+    add_structured_argument(parser)
+    args = parser.parse_args()
+    
     transcriptions_dir = Path(__file__).parent.parent / "transcriptions"
     output_dir = Path(__file__).parent.parent / "research"
     
@@ -393,7 +565,8 @@ def main():
         print("请先运行 transcribe_with_gemini.py 进行转录")
         return
     
-    batch_analyze(transcriptions_dir, output_dir)
+    batch_analyze(transcriptions_dir, output_dir, requests_per_minute=args.rpm, workers=args.chunk_workers,
+                  full=args.full, tokens_per_minute=args.tpm, episode_workers=args.workers)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+音频下载的基准：本地起一个 HTTP 服务提供若干大文件，对比整块读入（urlopen().read() 后写文件，即改造前的做法）、流式下载（download_audio）
+和分段并发下载（download_audio segments=N）的耗时、吞吐和峰值内存（RSS）
+
+每次下载在单独的子进程里完成，子进程退出前报告自己的 ru_maxrss，互不影响。
+流式下载的峰值内存应与文件大小无关，整块读入则随文件大小线性增长。
+本地服务支持 Range，--throttle 可以给每个连接限速，模拟单连接速率受限的 CDN（分段下载的收益主要在这种情况下）；
+--no-range 模拟不支持 Range 的服务器，检验分段下载退回单连接。
+
+用法:
+    python3 scripts/benchmark_download.py [--sizes 16,64,128] [--repeat 2] [--segments 4] [--throttle 20] [--no-range]
+"""
+
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from download_podcasts_simple import AUDIO_HEADERS, download_audio
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """提供目录下的文件：支持 keep-alive 和单个 Range，可按连接限速"""
+    protocol_version = 'HTTP/1.1'
+    directory = Path('.')
+    throttle = 0  # 每个连接每秒最多发送的字节数，0 表示不限
+    ranges = True
+    block_size = 64 * 1024
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.directory / self.path.lstrip('/').split('?')[0]
+        if not path.is_file():
+            self.send_error(404)
+            return
+        size = path.stat().st_size
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', '')) if self.ranges else None
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        started = time.perf_counter()
+        sent = 0
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while sent < end - start + 1:
+                block = f.read(min(self.block_size, end - start + 1 - sent))
+                try:
+                    self.wfile.write(block)
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端提前断开（如探测 Range 时收到 200 后直接关闭），不算错误
+                    self.close_connection = True
+                    return
+                sent += len(block)
+                if self.throttle:
+                    delay = sent / self.throttle - (time.perf_counter() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+
+
+def start_server(directory: Path, throttle: float = 0, ranges: bool = True) -> ThreadingHTTPServer:
+    """在后台线程里提供 directory 下的文件，返回服务对象（端口随机）"""
+    handler = type('Handler', (RangeHandler,), {'directory': directory, 'throttle': throttle, 'ranges': ranges})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_file(path: Path, size_mb: int):
+    """写入 size_mb MB 的伪随机内容（重复一块随机数据，生成快且不会被压缩）"""
+    block = os.urandom(1024 * 1024)
+    with open(path, 'wb') as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+
+def buffered_download(url: str, output_path: Path) -> bool:
+    """基线：整个响应体读进内存再写文件，不经过连接池，与下载脚本今后的实现无关"""
+    try:
+        with urlopen(Request(url, headers=AUDIO_HEADERS), timeout=30) as response:
+            data = response.read()
+    except OSError:
+        return False
+    with open(output_path, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def child(mode: str, url: str, output_file: str, segments: str):
+    """子进程：下载一次，打印 {'seconds', 'peak_rss_mb', 'ok'}"""
+    output_path = Path(output_file)
+    output_path.unlink(missing_ok=True)
+    started = time.perf_counter()
+    if mode == 'buffered':
+        ok = buffered_download(url, output_path)
+    elif mode == 'segmented':
+        ok = download_audio(url, output_path, segments=int(segments))
+    else:
+        ok = download_audio(url, output_path)
+    seconds = time.perf_counter() - started
+    print(json.dumps({'seconds': seconds, 'peak_rss_mb': peak_rss_mb(), 'ok': ok}))
+
+
+def run_child(mode: str, url: str, output_file: Path, segments: int) -> dict:
+    result = subprocess.run([sys.executable, __file__, '--child', mode, url, str(output_file), str(segments)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """主函数"""
+    if len(sys.argv) == 6 and sys.argv[1] == '--child':
+        child(*sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="整块读入、流式、分段并发下载的耗时/峰值内存对比")
+    parser.add_argument("--sizes", default="16,64,128", help="测试文件大小（MB），逗号分隔")
+    parser.add_argument("--repeat", type=int, default=2, help="每种方式下载几次，取最快一次")
+    parser.add_argument("--segments", type=int, default=4, help="分段下载的段数")
+    parser.add_argument("--throttle", type=float, default=0, help="本地服务每个连接的限速（MB/秒），0 表示不限")
+    parser.add_argument("--no-range", action="store_true", help="本地服务不支持 Range")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        serve_dir = tmp / "serve"
+        serve_dir.mkdir()
+        for size_mb in sizes:
+            make_file(serve_dir / f"{size_mb}mb.mp3", size_mb)
+        server = start_server(serve_dir, args.throttle * 1024 * 1024, not args.no_range)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        limit = f"每连接限速 {args.throttle:g} MB/秒" if args.throttle else "不限速"
+        print(f"本地服务: {base_url}（{limit}，{'不' if args.no_range else ''}支持 Range），"
+              f"每种方式跑 {args.repeat} 次取最快")
+
+        modes = [("整块读入", 'buffered'), ("流式写盘", 'streaming'), (f"分段并发（{args.segments} 段）", 'segmented')]
+        try:
+            for size_mb in sizes:
+                url = f"{base_url}/{size_mb}mb.mp3"
+                print(f"\n{size_mb} MB:")
+                for label, mode in modes:
+                    runs = [run_child(mode, url, tmp / f"{mode}.mp3", args.segments) for _ in range(args.repeat)]
+                    best = min(runs, key=lambda r: r['seconds'])
+                    downloaded = (tmp / f"{mode}.mp3").stat().st_size if best['ok'] else 0
+                    status = "✅" if downloaded == size_mb * 1024 * 1024 else "❌ 大小不符"
+                    print(f"  {label}: {best['seconds'] * 1000:.0f} ms | "
+                          f"{size_mb / best['seconds']:.0f} MB/秒 | "
+                          f"峰值内存 {max(r['peak_rss_mb'] for r in runs):.0f} MB {status}")
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
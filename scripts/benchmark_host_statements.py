@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+主播发言识别的对照：在 transcriptions/ 全部转录上对比旧实现和按规范化语法识别（speaker_spans）的结果与耗时
+
+旧实现即改写前 analyze_transcriptions.identify_host_statements 的逐行/逐段版本，原样保留在本脚本中作对照。
+结果按转录分两组报告：有说话人标签的（按标签切分）和没有标签、退回启发式判断的。
+改写的目的是识别结果与 transcript_normalizer 一致，不是提速：旧实现在有标签的转录上只对每行做子串判断，
+新实现要按完整写法（各种时间戳、别名、名字标签）解析每个标签，这一组上明显更慢（约 0.35x）；
+启发式一组省掉了逐段复制和小写化，约快一倍。
+
+两边识别出的发言数不同，原因如下（--details 逐个列出数量不同的转录）：
+- 旧实现丢掉文末最后一段主播发言（循环结束后没有收尾），多数转录因此差 1
+- 旧实现只认 [主播]，英文的 [Host]、不带括号的 主持人：/主播：、00:02:856 主持人： 这些写法它都认不出，
+  整篇退回启发式判断或者只找到零星几段
+- 行中间出现的 [主播]（如混进转录的提示词“请清晰标注说话人身份，例如：[主播]、[嘉宾]”）旧实现也算一段，
+  新实现只认行首的标签
+- [049:25]、[54:1]、[053:19s]、[07:6:60] 这类识别出错的时间戳 transcript_normalizer 不认，后面的标签
+  也就不算，这一行并入上一段发言；旧实现只看有没有 [主播]，照样算一段
+
+用法:
+    python3 scripts/benchmark_host_statements.py [--repeat 10] [--details] [转录目录]
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+from typing import List
+
+from speaker_spans import host_spans, speaker_spans
+
+
+def legacy_identify_host_statements(text: str, host_keywords: List[str] = None) -> List[str]:
+    """改写前的实现（仅用于对照）"""
+    if host_keywords is None:
+        host_keywords = [
+            "主持人", "主播", "我", "我们", "今天", "这一期",
+            "邀请", "欢迎", "接下来", "刚才", "刚才我们"
+        ]
+
+    host_statements = []
+
+    if '[主播]' in text or '主播' in text:
+        lines = text.split('\n')
+        current_statement = []
+
+        for line in lines:
+            if '[主播]' in line or line.strip().startswith('[主播]'):
+                if current_statement:
+                    host_statements.append(' '.join(current_statement))
+                current_statement = [line]
+            elif current_statement and not line.strip().startswith('['):
+                current_statement.append(line)
+            elif current_statement:
+                if current_statement:
+                    host_statements.append(' '.join(current_statement))
+                current_statement = []
+
+    if not host_statements:
+        paragraphs = text.split('\n\n')
+
+        for para in paragraphs:
+            para_lower = para.lower()
+
+            if '[主播]' in para or '主播：' in para or '主播:' in para:
+                host_statements.append(para)
+                continue
+
+            if any(keyword in para_lower for keyword in host_keywords):
+                if not (re.search(r'[嘉宾]|受访者|被访谈', para)):
+                    if '?' in para or '？' in para:
+                        host_statements.append(para)
+                    elif re.match(r'^(让我们|现在|接下来|这一期|今天|欢迎)', para):
+                        host_statements.append(para)
+                    elif re.search(r'(要聊|要讨论|来聊聊|来谈谈|来听听)', para):
+                        host_statements.append(para)
+
+    return host_statements
+
+
+def run(funcs, texts: List[str], repeat: int):
+    """各实现轮流跑 repeat 轮（交替进行，减少机器负载波动的影响），返回 [(最快一轮秒数, 识别出的发言总数)]"""
+    best = [float('inf')] * len(funcs)
+    counts = [0] * len(funcs)
+    for _ in range(repeat):
+        for i, func in enumerate(funcs):
+            started = time.perf_counter()
+            counts[i] = sum(len(func(text)) for text in texts)
+            best[i] = min(best[i], time.perf_counter() - started)
+    return list(zip(best, counts))
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="主播发言识别的结果与耗时对比")
+    parser.add_argument("transcriptions_dir", nargs="?", type=Path,
+                        default=Path(__file__).parent.parent / "transcriptions")
+    parser.add_argument("--repeat", type=int, default=10, help="每个实现跑几轮，取最快一轮")
+    parser.add_argument("--details", action="store_true", help="列出两边发言数不同的转录")
+    args = parser.parse_args()
+
+    paths = sorted(args.transcriptions_dir.rglob('*.txt'))
+    texts = [p.read_text(encoding='utf-8') for p in paths]
+    tagged = [any(role == '主播' for _, _, role in speaker_spans(text)) for text in texts]
+    groups = [
+        ("全部", texts),
+        ("有说话人标签", [text for text, t in zip(texts, tagged) if t]),
+        ("无标签（启发式）", [text for text, t in zip(texts, tagged) if not t]),
+    ]
+    results = [
+        ("旧实现（逐行拼接+多次正则）", legacy_identify_host_statements),
+        ("规范化语法（偏移区间）", host_spans),
+    ]
+    print(f"每个实现跑 {args.repeat} 轮取最快")
+    for name, group in groups:
+        if not group:
+            continue
+        size_mb = sum(len(text.encode('utf-8')) for text in group) / 1024 / 1024
+        print(f"\n{name}: {len(group)} 个转录，共 {size_mb:.2f} MB")
+        baseline = None
+        timings = run([func for _, func in results], group, args.repeat)
+        for (label, _), (seconds, count) in zip(results, timings):
+            throughput = size_mb / seconds
+            baseline = baseline or throughput
+            print(f"  {label}: {seconds * 1000:.1f} ms | {throughput:.1f} MB/秒 | "
+                  f"{throughput / baseline:.2f}x | 主播发言 {count} 段")
+
+    if args.details:
+        print("\n发言数不同的转录（旧实现 / 新实现）:")
+        for path, text, t in zip(paths, texts, tagged):
+            legacy, spans = len(legacy_identify_host_statements(text)), len(host_spans(text))
+            if legacy != spans:
+                print(f"  {legacy:5d} / {spans:5d} {'标签' if t else '启发式'} {path.relative_to(args.transcriptions_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,12 @@
 检查转录状态，并在完成后自动进行分析
 """
 
-import time
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent))
+from poller import wait_until
+
 def check_transcription_status():
     """检查转录状态"""
     podcasts_dir = Path(__file__).parent.parent / "podcasts"
@@ -28,12 +31,12 @@ def check_transcription_status():
         'remaining': total_count - completed_count
     }
 
-def wait_for_completion(check_interval=300):  # 5分钟检查一次
-    """等待转录完成"""
+def wait_for_completion(check_interval=300, initial_interval=30, deadline=None):  # 最长5分钟检查一次
+    """等待转录完成（检查间隔从initial_interval开始指数增长，上限check_interval）"""
     print("等待所有转录完成...")
-    print(f"检查间隔: {check_interval}秒（{check_interval//60}分钟）\n")
+    print(f"检查间隔: {initial_interval}秒起，最长{check_interval}秒（{check_interval//60}分钟）\n")
     
-    while True:
+    def is_complete():
         status = check_transcription_status()
         
         print(f"转录进度: {status['completed']}/{status['total']} ({status['progress']:.1f}%)")
@@ -42,9 +45,9 @@ def wait_for_completion(check_interval=300):  # 5分钟检查一次
         if status['remaining'] == 0:
             print("✅ 所有转录已完成！")
             return True
-        
-        print(f"等待 {check_interval//60} 分钟后再次检查...\n")
-        time.sleep(check_interval)
+        return False
+    
+    return wait_until(is_complete, initial=initial_interval, max_interval=check_interval, deadline=deadline)
 
 def main():
     """主函数"""
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+长音频分段转录：按时间切成有重叠的片段并发转录，再按顺序拼接
+
+- 切分依赖 ffmpeg/ffprobe（需在 PATH 中），使用 -c copy 不重新编码
+- 每段的转录结果先保存在 <输出文件名>.segments/ 目录，失败的片段单独重试，
+  重新运行时已完成的片段直接复用
+- 拼接时把各段的相对时间戳换算为整期节目的绝对时间，去掉重叠区域的重复发言，
+  并把 【主播】/主持人: 等写法统一为 [主播]：/[嘉宾]：
+"""
+
+import difflib
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+from transcript_normalizer import parse_line as parse_normalized_line
+from transcription_pipeline import TranscriptionPipeline, emit, new_job, resume_remote_file
+
+SEGMENT_PROMPT_SUFFIX = """
+**分段说明**：
+这是完整节目中从 {start} 开始的一段音频，与前后片段有约 {overlap} 秒重叠。
+请在每段发言前标注相对本段开头的时间点，格式为 [时:分:秒]，例如：
+   [00:01:23] [主播]：...
+"""
+
+
+def cache_prompt(prompt: str, segment_seconds: float, overlap_seconds: float) -> str:
+    """分段转录结果在转录缓存中使用的提示词：分段提示词模板和切分参数都计入缓存键，
+    与整段转录、其他切分参数的结果互不混用"""
+    return f"{prompt}{SEGMENT_PROMPT_SUFFIX}\n[分段 {segment_seconds:g} 秒，重叠 {overlap_seconds:g} 秒]"
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which('ffmpeg') is not None and shutil.which('ffprobe') is not None
+
+
+def probe_duration(audio_file: Path) -> float:
+    """音频时长（秒）"""
+    output = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', str(audio_file)],
+        capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    return float(output)
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def plan_segments(duration: float, segment_seconds: float = 600, overlap_seconds: float = 15) -> List[Dict]:
+    """计算各片段的起止时间（相邻片段重叠 overlap_seconds 秒）"""
+    segments = []
+    start = 0.0
+    while start < duration:
+        end = min(duration, start + segment_seconds)
+        segments.append({'index': len(segments), 'start': start, 'end': end})
+        if end >= duration:
+            break
+        start = end - overlap_seconds
+    return segments
+
+
+def segment_dir_for(output_file: Path) -> Path:
+    """片段音频和片段转录所在的工作目录"""
+    return output_file.parent / f"{output_file.stem}.segments"
+
+
+def resumable_segments(previous_states: Dict[str, Dict], output_file: Path) -> Dict[str, str]:
+    """任务日志中上次已上传、尚未转录完成的片段：片段音频路径 -> 远端文件名"""
+    prefix = str(segment_dir_for(output_file)) + os.sep
+    return {path: state['remote_name'] for path, state in previous_states.items()
+            if path.startswith(prefix) and state.get('state') in ('uploaded', 'processing')
+            and state.get('remote_name') and not Path(path).with_suffix('.transcript').exists()}
+
+
+def split_audio(audio_file: Path, segment_dir: Path, segments: List[Dict]) -> List[Dict]:
+    """用ffmpeg切出各片段（已存在的片段文件不重复切分）"""
+    segment_dir.mkdir(parents=True, exist_ok=True)
+    for seg in segments:
+        seg['audio_file'] = segment_dir / f"seg_{seg['index']:03d}{audio_file.suffix}"
+        # 不用 .txt 后缀，避免未完成的片段被分析脚本当成转录文件
+        seg['text_file'] = segment_dir / f"seg_{seg['index']:03d}.transcript"
+        if seg['audio_file'].exists():
+            continue
+        subprocess.run(
+            ['ffmpeg', '-v', 'error', '-y', '-ss', str(seg['start']), '-t', str(seg['end'] - seg['start']),
+             '-i', str(audio_file), '-c', 'copy', str(seg['audio_file'])],
+            check=True,
+        )
+    return segments
+
+
+def parse_line(line: str):
+    """拆出 (相对秒数或None, 说话人或None, 正文)"""
+    offset, speaker, _, text = parse_normalized_line(line)
+    return offset, speaker, text
+
+
+def _similar(a: str, b: str) -> bool:
+    if not a or not b:
+        return False
+    if a in b or b in a:
+        return True
+    return difflib.SequenceMatcher(None, a, b).ratio() >= 0.8
+
+
+def stitch_segments(segments: List[Dict], overlap_seconds: float = 15) -> str:
+    """按顺序拼接片段：换算绝对时间、去除重叠区重复发言、统一说话人标签"""
+    lines = []
+    last_time = -1.0
+    for seg in segments:
+        recent = [text for _, _, text in lines[-20:]]
+        overlap_end = seg['start'] + overlap_seconds
+        raw_lines = [raw for raw in seg['text'].splitlines() if raw.strip()]
+        for position, raw in enumerate(raw_lines):
+            offset, speaker, text = parse_line(raw)
+            absolute = seg['start'] + offset if offset is not None else None
+            if seg['index'] > 0:
+                # 没有时间戳时，只把片段开头几行视为可能的重叠区
+                in_overlap = absolute <= overlap_end if absolute is not None else position < 10
+                # 重叠区内：时间早于上一段已输出内容，或与上一段结尾内容相似的发言视为重复
+                if in_overlap and ((absolute is not None and absolute <= last_time)
+                                   or any(_similar(text, prev) for prev in recent)):
+                    continue
+            if absolute is not None:
+                last_time = max(last_time, absolute)
+            lines.append((absolute, speaker, text))
+
+    output = []
+    for absolute, speaker, text in lines:
+        prefix = f"[{format_timestamp(absolute)}] " if absolute is not None else ""
+        tag = f"[{speaker}]：" if speaker else ""
+        output.append(f"{prefix}{tag}{text}")
+    return "\n".join(output) + "\n"
+
+
+def transcribe_chunked(client, audio_file: Path, output_file: Path, prompt: str, segment_seconds: float = 600,
+                       overlap_seconds: float = 15, workers: int = 3, max_retries: int = 2, rate_limiter=None,
+                       poller=None, journal=None, resume: Dict[str, str] = None) -> str:
+    """分段并发转录一个长音频，成功返回拼接后的全文，失败返回None
+
+    传入任务日志（TranscriptionJournal）时各片段的上传/删除也记入日志，崩溃后遗留的片段远端文件可被回收；
+    resume（见 resumable_segments）中的片段直接复用上次已上传的远端文件，跳过上传。
+    已转录完的片段保存在工作目录中，重新运行时不再转录。
+    """
+    if not ffmpeg_available():
+        print("  ❌ 分段转录需要 ffmpeg/ffprobe，请先安装")
+        return None
+
+    print(f"\n分段转录: {audio_file.name}")
+    duration = probe_duration(audio_file)
+    segment_dir = segment_dir_for(output_file)
+    segments = split_audio(audio_file, segment_dir, plan_segments(duration, segment_seconds, overlap_seconds))
+    print(f"  时长 {format_timestamp(duration)}，切分为 {len(segments)} 段（每段 {segment_seconds:.0f}秒，重叠 {overlap_seconds:.0f}秒）")
+
+    for attempt in range(max_retries + 1):
+        todo = [seg for seg in segments if not seg['text_file'].exists()]
+        if not todo:
+            break
+        if attempt:
+            print(f"  重试失败片段（第{attempt}次）: {[seg['index'] for seg in todo]}")
+        pipeline = TranscriptionPipeline(
+            client, None, upload_workers=workers, process_workers=workers * 2, generate_workers=workers,
+            rate_limiter=rate_limiter, poller=poller,
+        )
+        jobs = []
+        for seg in todo:
+            job = new_job(seg['audio_file'], seg['text_file'], journal)
+            remote_name = (resume or {}).pop(str(seg['audio_file']), None)
+            job['remote_file'] = resume_remote_file(client, remote_name)
+            emit(job, 'queued')
+            job['prompt'] = prompt + SEGMENT_PROMPT_SUFFIX.format(
+                start=format_timestamp(seg['start']), overlap=int(overlap_seconds))
+            jobs.append(job)
+        pipeline.run(jobs)
+        print(pipeline.format_metrics())
+
+    missing = [seg['index'] for seg in segments if not seg['text_file'].exists()]
+    if missing:
+        print(f"  ❌ 以下片段转录失败，已完成的片段保留在 {segment_dir}: {missing}")
+        return None
+
+    for seg in segments:
+        seg['text'] = seg['text_file'].read_text(encoding='utf-8')
+    transcription = stitch_segments(segments, overlap_seconds)
+
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    output_file.write_text(transcription, encoding='utf-8')
+    shutil.rmtree(segment_dir, ignore_errors=True)
+    print(f"  ✅ 分段转录完成，已保存到: {output_file}（{len(transcription)} 字符）")
+    return transcription
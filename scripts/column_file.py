@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+列式二进制文件的读写工具，发言存储（utterance_store）和检索索引段（transcript_index）共用
+
+- 写：各列按 8 字节对齐、以小端写入
+- 读：mmap 整个文件，按偏移把列切成 memoryview（大端机器上只能复制一份再翻转字节序）
+- 关闭：释放各列的 memoryview 后关闭映射；调用方仍持有某列的切片时不报错，映射留给垃圾回收
+"""
+
+import mmap
+import sys
+from array import array
+from pathlib import Path
+
+
+def pad(f, align: int = 8):
+    """写入 0 字节，使文件位置按 align 对齐"""
+    remainder = f.tell() % align
+    if remainder:
+        f.write(b"\0" * (align - remainder))
+
+
+def write_column(f, column: array) -> int:
+    """对齐后以小端写入一列，返回该列的起始偏移"""
+    pad(f)
+    offset = f.tell()
+    if sys.byteorder != 'little':
+        column = array(column.typecode, column)
+        column.byteswap()
+    column.tofile(f)
+    return offset
+
+
+def open_mapping(path: Path):
+    """只读映射整个文件，返回 (文件对象, mmap)"""
+    file = open(path, 'rb')
+    try:
+        return file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception:
+        file.close()
+        raise
+
+
+def read_column(buf: memoryview, offset: int, typecode: str, length: int):
+    """从映射中取出一列：小端机器上是零拷贝的 memoryview，大端机器上是翻转过字节序的 array"""
+    size = array(typecode).itemsize
+    raw = buf[offset:offset + size * length]
+    if sys.byteorder == 'little':
+        return raw.cast(typecode)
+    column = array(typecode, bytes(raw))
+    column.byteswap()
+    return column
+
+
+def close_mapping(owner, attrs, file, mapping):
+    """释放 owner 上列出的各列 memoryview 并关闭映射和文件"""
+    for attr in attrs:
+        view = getattr(owner, attr, None)
+        if isinstance(view, memoryview):
+            view.release()
+        setattr(owner, attr, None)
+    if mapping is not None:
+        try:
+            mapping.close()
+        except BufferError:
+            pass  # 调用方还持有列的切片，映射等最后一个切片释放后由垃圾回收关闭
+    if file is not None:
+        file.close()
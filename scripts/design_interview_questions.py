@@ -3,10 +3,17 @@
 基于分析结果设计访谈问题
 """
 
+import argparse
 import json
 import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent))
+from json_extract import QUESTION_SCHEMA, add_structured_argument, print_run_stats, request_json
+from quote_retrieval import format_quotes, retrieve_quotes
+from rate_limiter import RateLimiter
+from transcript_index import open_index
+
 try:
     import google.generativeai as genai
 except ImportError:
@@ -77,8 +84,9 @@ PANEL_GUESTS = {
     }
 }
 
-def design_question_for_guest(guest_name: str, guest_info: dict, analysis_data: dict = None):
-    """为嘉宾设计定制问题"""
+def design_question_for_guest(guest_name: str, guest_info: dict, analysis_data: dict = None,
+                              rate_limiter: RateLimiter = None, index=None):
+    """为嘉宾设计定制问题；提供检索索引时附上嘉宾在各话题下的原话作为依据"""
     print(f"\n为 {guest_name} 设计问题...")
     
     try:
@@ -88,6 +96,7 @@ def design_question_for_guest(guest_name: str, guest_info: dict, analysis_data:
     
     # 构建分析信息
     analysis_text = ""
+    topics = [topic for topic in guest_info['focus'].split('、') if topic]
     if analysis_data:
         podcast_name = None
         for pn, data in analysis_data.items():
@@ -102,15 +111,27 @@ def design_question_for_guest(guest_name: str, guest_info: dict, analysis_data:
 - 行业见解：{insights.get('industry_insights', [])[:3]}
 - 讨论主题：{insights.get('discussion_topics', [])[:5]}
 """
+                topics += insights.get('discussion_topics', [])[:3]
                 break
     
+    # 从转录中检索嘉宾本人的原话（总字数有上限，提示词长度固定）
+    quotes_text = ""
+    if index is not None:
+        quotes = retrieve_quotes(index, guest_name, list(dict.fromkeys(topics)))
+        if quotes:
+            print(f"  引用原话 {len(quotes)} 条")
+            quotes_text = f"""
+**嘉宾原话（摘自播客转录）**：
+{format_quotes(quotes)}
+"""
+    
     prompt = f"""请为Panel访谈设计一个问题。以下是嘉宾信息：
 
 **嘉宾**: {guest_name}
 **身份**: {guest_info['role']}
 **播客**: {guest_info['podcast']}
 **关注领域**: {guest_info['focus']}
-{analysis_text}
+{analysis_text}{quotes_text}
 
 **设计要求**：
 1. 问题要体现该嘉宾的独特背景和工作特点
@@ -118,6 +139,7 @@ def design_question_for_guest(guest_name: str, guest_info: dict, analysis_data:
 3. 偏向行业观点讨论，而非个人经历
 4. 适合在Google NYC面向华人Google员工提问
 5. 问题长度：1-2句话
+6. 如果上面给出了嘉宾原话，问题应以这些原话为依据，不要曲解其本意
 
 **输出格式（JSON）**：
 {{
@@ -130,14 +152,10 @@ def design_question_for_guest(guest_name: str, guest_info: dict, analysis_data:
 """
     
     try:
-        response = model.generate_content(prompt)
-        result_text = response.text.strip()
-        
-        # 提取JSON
-        import re
-        json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-        if json_match:
-            question_data = json.loads(json_match.group(0))
+        # 请求JSON（结构化输出或文本提取，失败时重试/修复）
+        question_data, result_text = request_json(model, prompt, QUESTION_SCHEMA, rate_limiter)
+        result_text = result_text.strip()
+        if question_data:
             return question_data
         else:
             return {
@@ -149,7 +167,7 @@ def design_question_for_guest(guest_name: str, guest_info: dict, analysis_data:
         print(f"  ❌ 设计失败: {e}")
         return None
 
-def design_google_question():
+def design_google_question(rate_limiter: RateLimiter = None):
     """设计关于Google的问题"""
     print("\n设计关于Google的问题...")
     
@@ -179,19 +197,16 @@ def design_google_question():
 """
     
     try:
-        response = model.generate_content(prompt)
-        result_text = response.text.strip()
-        
-        import re
-        json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group(0))
+        question_data, result_text = request_json(model, prompt, QUESTION_SCHEMA, rate_limiter)
+        result_text = result_text.strip()
+        if question_data:
+            return question_data
         return {"question": result_text, "rationale": "", "key_points": []}
     except Exception as e:
         print(f"  ❌ 设计失败: {e}")
         return None
 
-def design_ai_question():
+def design_ai_question(rate_limiter: RateLimiter = None):
     """设计关于AI的问题"""
     print("\n设计关于AI的问题...")
     
@@ -219,13 +234,10 @@ def design_ai_question():
 """
     
     try:
-        response = model.generate_content(prompt)
-        result_text = response.text.strip()
-        
-        import re
-        json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group(0))
+        question_data, result_text = request_json(model, prompt, QUESTION_SCHEMA, rate_limiter)
+        result_text = result_text.strip()
+        if question_data:
+            return question_data
         return {"question": result_text, "rationale": "", "key_points": []}
     except Exception as e:
         print(f"  ❌ 设计失败: {e}")
@@ -233,6 +245,10 @@ def design_ai_question():
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="设计Panel访谈问题")
+    add_structured_argument(parser)
+    parser.parse_args()
+    
     print("=" * 60)
     print("设计Panel访谈问题")
     print("=" * 60)
@@ -240,20 +256,29 @@ def main():
     # 加载分析结果
     analysis_data = load_analysis_results()
     
+    rate_limiter = RateLimiter(requests_per_minute=30)
+    
+    # 转录检索索引（用于引用嘉宾原话），没有转录时跳过
+    try:
+        index = open_index()
+    except (OSError, ValueError) as e:
+        print(f"⚠️  无法打开转录检索索引，不引用原话: {e}")
+        index = None
+    
     # 为每位嘉宾设计问题
     guest_questions = {}
-    for guest_name, guest_info in PANEL_GUESTS.items():
-        question = design_question_for_guest(guest_name, guest_info, analysis_data)
-        if question:
-            guest_questions[guest_name] = question
-        import time
-        time.sleep(2)  # API间隔
+    try:
+        for guest_name, guest_info in PANEL_GUESTS.items():
+            question = design_question_for_guest(guest_name, guest_info, analysis_data, rate_limiter, index)
+            if question:
+                guest_questions[guest_name] = question
+    finally:
+        if index is not None:
+            index.close()
     
     # 设计通用问题
-    google_question = design_google_question()
-    import time
-    time.sleep(2)
-    ai_question = design_ai_question()
+    google_question = design_google_question(rate_limiter)
+    ai_question = design_ai_question(rate_limiter)
     
     # 保存问题
     output_dir = Path(__file__).parent.parent / "outputs"
@@ -268,6 +293,7 @@ def main():
         }, f, ensure_ascii=False, indent=2)
     
     print(f"\n✅ 问题设计完成！已保存到: {questions_file}")
+    print_run_stats()
     
     # 更新访谈大纲
     update_outline(guest_questions, google_question, ai_question)
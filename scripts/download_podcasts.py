@@ -11,9 +11,21 @@ import sys
 from pathlib import Path
 from typing import List, Dict
 import time
+from contextlib import contextmanager
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from http_cache import EPISODE_TTL_SECONDS, cached_request, default_cache
+from resumable_download import DownloadManifest, download_segmented
 
 # 小宇宙API端点（需要根据实际情况调整）
 XIAOYUZHOU_API_BASE = "https://www.xiaoyuzhoufm.com/api"
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+def _fetch(url: str, headers: dict):
+    """cached_request 用的 fetch：返回 (状态码, 响应头, 响应体)"""
+    response = requests.get(url, headers=headers, timeout=10)
+    return response.status_code, response.headers, response.content
 
 def get_podcast_info(podcast_id: str) -> Dict:
     """获取播客基本信息"""
@@ -23,9 +35,10 @@ def get_podcast_info(podcast_id: str) -> Dict:
         "Accept": "application/json"
     }
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        return response.json()
+        info = cached_request(url, _fetch, headers, parse=json.loads)
+        if info is None:
+            print(f"获取播客信息失败: {url} 未返回200")
+        return info
     except Exception as e:
         print(f"获取播客信息失败: {e}")
         return None
@@ -46,9 +59,8 @@ def get_episodes(podcast_id: str, limit: int = 3) -> List[Dict]:
     
     for endpoint in endpoints:
         try:
-            response = requests.get(endpoint, headers=headers, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
+            data = cached_request(endpoint, _fetch, headers, parse=json.loads)
+            if data is not None:
                 # 尝试解析不同可能的响应格式
                 if isinstance(data, dict):
                     if 'data' in data:
@@ -68,16 +80,14 @@ def get_episodes(podcast_id: str, limit: int = 3) -> List[Dict]:
     return parse_episodes_from_html(podcast_id, limit)
 
 def parse_episodes_from_html(podcast_id: str, limit: int) -> List[Dict]:
-    """从HTML页面解析单集信息（备用方案）"""
+    """从HTML页面解析单集信息（备用方案；页面没变时沿用缓存的解析结果）"""
     url = f"https://www.xiaoyuzhoufm.com/podcast/{podcast_id}"
     headers = {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
     }
     
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        html = response.text
+    def extract(body: bytes) -> List[Dict]:
+        html = body.decode('utf-8', errors='ignore')
         
         # 查找JSON数据（通常在<script>标签中）
         import re
@@ -102,12 +112,31 @@ def parse_episodes_from_html(podcast_id: str, limit: int) -> List[Dict]:
                 'episode_link': f"https://www.xiaoyuzhoufm.com{ep_link}"
             })
         return result
+    
+    try:
+        result = cached_request(url, _fetch, headers, parse=extract, name=f"parse_episodes_from_html:{limit}")
+        if result is None:
+            raise ValueError(f"{url} 未返回200")
+        return result
     except Exception as e:
         print(f"从HTML解析失败: {e}")
         return []
 
+def _audio_url_from_json(body: bytes) -> str:
+    """从单集API响应中取音频URL，尝试多种可能的数据结构"""
+    data = json.loads(body)
+    audio_url = None
+    if isinstance(data, dict):
+        if 'audio' in data:
+            audio_url = data['audio']
+        elif 'audioUrl' in data:
+            audio_url = data['audioUrl']
+        elif 'data' in data and 'audio' in data['data']:
+            audio_url = data['data']['audio']
+    return audio_url
+
 def get_episode_audio_url(episode_id: str) -> str:
-    """获取单集的音频下载链接"""
+    """获取单集的音频下载链接（单集信息基本不变，缓存 EPISODE_TTL_SECONDS）"""
     endpoints = [
         f"{XIAOYUZHOU_API_BASE}/episode/{episode_id}",
         f"https://www.xiaoyuzhoufm.com/app/api/v1/episode/{episode_id}",
@@ -121,41 +150,37 @@ def get_episode_audio_url(episode_id: str) -> str:
     
     for endpoint in endpoints:
         try:
-            response = requests.get(endpoint, headers=headers, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                # 尝试多种可能的数据结构
-                audio_url = None
-                if isinstance(data, dict):
-                    if 'audio' in data:
-                        audio_url = data['audio']
-                    elif 'audioUrl' in data:
-                        audio_url = data['audioUrl']
-                    elif 'data' in data and 'audio' in data['data']:
-                        audio_url = data['data']['audio']
-                
-                if audio_url:
-                    return audio_url
+            audio_url = cached_request(endpoint, _fetch, headers, parse=_audio_url_from_json, ttl=EPISODE_TTL_SECONDS)
+            if audio_url:
+                return audio_url
         except:
             continue
     
     return None
 
-def download_audio(url: str, output_path: Path) -> bool:
-    """下载音频文件"""
+def download_audio(url: str, output_path: Path, manifest: DownloadManifest = None, expected_sha256: str = None,
+                   segments: int = 1) -> bool:
+    """可续传地下载音频文件（先写 .part，校验大小/可选 sha256 后才重命名并记入下载清单）
+
+    segments > 1 时按字节范围分段并发下载，服务器不支持 Range 时自动退回单连接。
+    """
     headers = {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
         "Referer": "https://www.xiaoyuzhoufm.com/"
     }
     
+    @contextmanager
+    def fetch(offset: int, end: int = None):
+        request_headers = dict(headers)
+        if offset or end is not None:
+            request_headers["Range"] = f"bytes={offset}-{'' if end is None else end}"
+        with requests.get(url, headers=request_headers, stream=True, timeout=30) as response:
+            if response.status_code != 416:
+                response.raise_for_status()
+            yield response.status_code, response.headers, response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+    
     try:
-        response = requests.get(url, headers=headers, stream=True, timeout=30)
-        response.raise_for_status()
-        
-        with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
+        download_segmented(fetch, output_path, segments, manifest, url, expected_sha256)
         return True
     except Exception as e:
         print(f"下载失败: {e}")
@@ -181,6 +206,7 @@ def download_podcast_episodes(podcast_id: str, podcast_name: str, limit: int = 3
     
     print(f"找到 {len(episodes)} 期单集")
     
+    manifest = DownloadManifest(output_dir)
     downloaded = []
     for i, episode in enumerate(episodes, 1):
         ep_id = episode.get('episode_id') or episode.get('id') or episode.get('eid')
@@ -192,6 +218,11 @@ def download_podcast_episodes(podcast_id: str, podcast_name: str, limit: int = 3
         
         print(f"\n[{i}/{len(episodes)}] 处理单集: {ep_title}")
         
+        output_file = output_dir / f"{i:02d}_{ep_title}.mp3"
+        if manifest.is_complete(output_file):
+            print(f"  ✅ 已下载且校验通过，跳过: {output_file.name}")
+            continue
+        
         # 获取音频URL
         audio_url = get_episode_audio_url(ep_id)
         
@@ -207,8 +238,7 @@ def download_podcast_episodes(podcast_id: str, podcast_name: str, limit: int = 3
         print(f"  音频URL: {audio_url[:80]}...")
         
         # 下载音频
-        output_file = output_dir / f"{i:02d}_{ep_title}.mp3"
-        if download_audio(audio_url, output_file):
+        if download_audio(audio_url, output_file, manifest=manifest):
             print(f"  ✅ 下载成功: {output_file.name}")
             downloaded.append({
                 'episode_id': ep_id,
@@ -224,15 +254,13 @@ def download_podcast_episodes(podcast_id: str, podcast_name: str, limit: int = 3
     return downloaded
 
 def parse_audio_from_episode_page(episode_url: str) -> str:
-    """从单集页面解析音频URL（备用方案）"""
+    """从单集页面解析音频URL（备用方案；页面没变时沿用缓存的解析结果）"""
     headers = {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
     }
     
-    try:
-        response = requests.get(episode_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        html = response.text
+    def extract_audio_url(body: bytes) -> str:
+        html = body.decode('utf-8', errors='ignore')
         
         # 查找音频URL的模式
         import re
@@ -247,6 +275,10 @@ def parse_audio_from_episode_page(episode_url: str) -> str:
             for match in matches:
                 if '.mp3' in match or 'audio' in match.lower():
                     return match.strip('"')
+        return None
+    
+    try:
+        return cached_request(episode_url, _fetch, headers, parse=extract_audio_url, ttl=EPISODE_TTL_SECONDS)
     except:
         pass
     
@@ -296,6 +328,8 @@ def main():
     
     print(f"\n✅ 下载完成！记录已保存到: {record_file}")
     print(f"总计下载: {sum(len(eps) for eps in all_downloaded.values())} 个音频文件")
+    if default_cache():
+        print(default_cache().format_stats())
 
 if __name__ == "__main__":
     main()
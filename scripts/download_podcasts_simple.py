@@ -9,26 +9,50 @@ import os
 import sys
 import re
 import time
+import argparse
+import threading
+from contextlib import contextmanager
+from http.client import HTTPException
 from pathlib import Path
-from urllib.request import urlopen, Request
-from urllib.parse import urljoin
 from typing import List, Dict
 
-def http_get(url: str, headers: dict = None) -> bytes:
-    """使用urllib进行HTTP GET请求"""
-    if headers is None:
-        headers = {}
-    
-    default_headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-        "Accept": "text/html,application/json"
-    }
-    default_headers.update(headers)
-    
-    req = Request(url, headers=default_headers)
+sys.path.insert(0, str(Path(__file__).parent))
+
+from analysis_engine import run_fair
+from http_cache import DEFAULT_TTL_SECONDS, EPISODE_TTL_SECONDS, cached_request, default_cache
+from http_pool import HostPool
+from resumable_download import PART_SUFFIX, DownloadManifest, download_segmented
+
+# 音频按块流式写盘，每块大小（字节）
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+AUDIO_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+    "Referer": "https://www.xiaoyuzhoufm.com/"
+}
+# 小宇宙页面：同时最多 2 个请求、间隔至少 1 秒（原来逐集 sleep(2)、逐播客 sleep(3)）；
+# 音频 CDN 等其它主机间隔 0.05 秒（分段下载的各段请求也按这个间隔错开）
+HOST_LIMITS = {'www.xiaoyuzhoufm.com': (2, 1.0)}
+AUDIO_HOST_INTERVAL = 0.05
+# 所有请求共用的连接池：同一主机复用 keep-alive 连接，全局和每主机的并发/间隔限制见 HostPool
+POOL = HostPool(per_host=4, min_interval=AUDIO_HOST_INTERVAL, host_limits=HOST_LIMITS)
+
+PAGE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+    "Accept": "text/html,application/json"
+}
+
+def _fetch_page(url: str, headers: dict):
+    """cached_request 用的 fetch：经连接池请求，返回 (状态码, 响应头, 响应体)"""
+    with POOL.open(url, headers) as response:
+        return response.status, response.headers, response.read()
+
+def get_cached_page(url: str, parse=None, name: str = None, ttl: float = DEFAULT_TTL_SECONDS):
+    """带条件请求缓存地获取页面，返回 parse(响应体)（或响应体）；失败时返回None
+
+    页面没变（TTL 内、304 或内容相同）时直接返回上次缓存的解析结果，不重新解析。
+    """
     try:
-        with urlopen(req, timeout=10) as response:
-            return response.read()
+        return cached_request(url, _fetch_page, PAGE_HEADERS, parse=parse, name=name, ttl=ttl)
     except Exception as e:
         print(f"HTTP请求失败: {e}")
         return None
@@ -36,11 +60,20 @@ def http_get(url: str, headers: dict = None) -> bytes:
 def get_podcast_html(podcast_id: str) -> str:
     """获取播客页面HTML"""
     url = f"https://www.xiaoyuzhoufm.com/podcast/{podcast_id}"
-    data = http_get(url)
+    data = get_cached_page(url)
     if data:
         return data.decode('utf-8', errors='ignore')
     return None
 
+def get_podcast_episodes(podcast_id: str, limit: int = 10) -> List[Dict]:
+    """获取播客页面并提取单集信息；页面无法获取时返回None
+
+    提取结果按 limit 缓存，播客页面没变时不重新解析。
+    """
+    url = f"https://www.xiaoyuzhoufm.com/podcast/{podcast_id}"
+    return get_cached_page(url, lambda body: extract_episodes_from_html(body.decode('utf-8', errors='ignore'), limit),
+                           name=f"extract_episodes_from_html:{limit}")
+
 def extract_episodes_from_html(html: str, limit: int = 10) -> List[Dict]:
     """从HTML中提取单集信息"""
     episodes = []
@@ -118,17 +151,8 @@ def extract_episodes_from_html(html: str, limit: int = 10) -> List[Dict]:
     
     return episodes[:limit]
 
-def get_episode_audio_url(episode_id: str) -> str:
-    """获取单集的音频URL"""
-    url = f"https://www.xiaoyuzhoufm.com/episode/{episode_id}"
-    html = http_get(url)
-    
-    if not html:
-        return None
-    
-    html_str = html.decode('utf-8', errors='ignore')
-    
-    # 查找音频URL
+def extract_audio_url_from_html(html_str: str) -> str:
+    """从单集页面HTML中查找音频URL"""
     patterns = [
         r'"audioUrl"\s*:\s*"([^"]+)"',
         r'"audio"\s*:\s*"([^"]+)"',
@@ -145,30 +169,58 @@ def get_episode_audio_url(episode_id: str) -> str:
     
     return None
 
-def download_audio(url: str, output_path: Path) -> bool:
-    """下载音频文件"""
+def get_episode_audio_url(episode_id: str) -> str:
+    """获取单集的音频URL（单集页面基本不变，缓存 EPISODE_TTL_SECONDS）"""
+    url = f"https://www.xiaoyuzhoufm.com/episode/{episode_id}"
+    return get_cached_page(url, lambda body: extract_audio_url_from_html(body.decode('utf-8', errors='ignore')),
+                           name="extract_audio_url_from_html", ttl=EPISODE_TTL_SECONDS)
+
+def _read_chunks(response, chunk_size: int):
+    """按 chunk_size 把响应读进同一个缓冲区，逐块产出（内存占用与音频大小无关）"""
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        n = response.readinto(buffer)
+        if not n:
+            return
+        yield view[:n]
+
+def _audio_fetcher(url: str, chunk_size: int):
+    """download_resumable / download_segmented 用的 fetch(offset, end)：需要时带 Range 请求头"""
+    @contextmanager
+    def fetch(offset: int, end: int = None):
+        headers = dict(AUDIO_HEADERS)
+        if offset or end is not None:
+            headers["Range"] = f"bytes={offset}-{'' if end is None else end}"
+        with POOL.open(url, headers) as response:
+            if response.status >= 400 and response.status != 416:
+                raise HTTPException(f"HTTP {response.status} {response.reason}")
+            yield response.status, response.headers, _read_chunks(response, chunk_size)
+    return fetch
+
+def download_audio(url: str, output_path: Path, chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+                   manifest: DownloadManifest = None, expected_sha256: str = None, label: str = '',
+                   segments: int = 1) -> bool:
+    """流式、可续传地下载音频文件
+
+    响应按 chunk_size 分块直接写入 <文件名>.part，连接中断时按已有字节数续传；
+    大小（及可选的 sha256）校验通过后才原子重命名为正式文件并记入下载清单，
+    中途失败不会留下半截的 .mp3 被当成已下载。
+    segments > 1 时按字节范围分段并发下载（单连接限速的 CDN 上更快），服务器不支持 Range 时自动退回单连接。
+    """
     if not url:
         return False
     
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-        "Referer": "https://www.xiaoyuzhoufm.com/"
-    }
-    
     try:
-        data = http_get(url, headers)
-        if data:
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_path, 'wb') as f:
-                f.write(data)
-            return True
+        download_segmented(_audio_fetcher(url, chunk_size), Path(output_path), segments, manifest, url,
+                           expected_sha256, label=label)
+        return True
     except Exception as e:
-        print(f"  下载失败: {e}")
-    
-    return False
+        print(f"  {label}下载失败: {e}")
+        return False
 
-def download_podcast_episodes(podcast_id: str, podcast_name: str, limit: int = 3, output_dir: Path = None, skip_existing: bool = True):
-    """下载播客的最近N期"""
+def plan_podcast_episodes(podcast_id: str, podcast_name: str, limit: int = 3, output_dir: Path = None, skip_existing: bool = True) -> Dict:
+    """获取播客页面并挑出需要下载的最近N期，返回 {'output_dir', 'manifest', 'items': [待下载单集...]}"""
     if output_dir is None:
         output_dir = Path("podcasts")
     
@@ -178,35 +230,40 @@ def download_podcast_episodes(podcast_id: str, podcast_name: str, limit: int = 3
     print(f"\n开始处理播客: {podcast_name} (ID: {podcast_id})")
     print(f"目标: 最近 {limit} 期")
     
-    # 检查已下载的文件
+    # 检查已下载的文件：只有下载清单里登记过且大小一致的才算下载完成，
+    # 其余 .mp3（以前中断留下的可能是截断文件）和 .part 会在下载时续传并校验
+    manifest = DownloadManifest(output_dir)
     existing_files = set()
+    unverified_files = set()
     if skip_existing:
         for file in output_dir.glob("*.mp3"):
-            existing_files.add(file.name)
-        print(f"  已存在 {len(existing_files)} 个文件")
-    
-    # 获取播客页面
+            if manifest.is_complete(file):
+                existing_files.add(file.name)
+            else:
+                unverified_files.add(file.name)
+        for file in output_dir.glob("*.mp3" + PART_SUFFIX):
+            unverified_files.add(file.name[:-len(PART_SUFFIX)])
+        print(f"  已存在 {len(existing_files)} 个已校验文件" +
+              (f"，{len(unverified_files)} 个未完成/未校验" if unverified_files else ""))
+    
+    # 获取播客页面并提取单集信息（获取更多期以便跳过已下载的；页面没变时沿用缓存的解析结果）
     print("  获取播客页面...")
-    html = get_podcast_html(podcast_id)
+    # 需要至少提取limit + 已存在数量，以便有足够的新单集
+    episodes = get_podcast_episodes(podcast_id, limit + len(existing_files) + 5)  # 获取更多期以便筛选
     
-    if not html:
+    if episodes is None:
         print(f"  ❌ 无法获取播客页面")
-        return []
-    
-    # 提取单集信息（获取更多期以便跳过已下载的）
-    print("  解析单集列表...")
-    # 需要至少提取limit + 已存在数量，以便有足够的新单集
-    episodes = extract_episodes_from_html(html, limit + len(existing_files) + 5)  # 获取更多期以便筛选
+        return {'output_dir': output_dir, 'manifest': manifest, 'items': []}
     
     if not episodes:
         print(f"  ⚠️  无法从页面提取单集信息")
-        return []
+        return {'output_dir': output_dir, 'manifest': manifest, 'items': []}
     
     print(f"  找到 {len(episodes)} 期单集")
     
     # 跳过已下载的，只下载新的
     new_episodes = []
-    episode_counter = len(existing_files) + 1  # 从已存在文件数+1开始编号
+    episode_counter = len(existing_files | unverified_files) + 1  # 从已存在文件数+1开始编号
     
     for episode in episodes:
         ep_id = episode.get('episode_id')
@@ -218,19 +275,27 @@ def download_podcast_episodes(podcast_id: str, podcast_name: str, limit: int = 3
         
         # 检查是否已存在
         already_exists = False
+        resume_name = None
         if skip_existing:
             for existing_file in existing_files:
                 if ep_id in existing_file or clean_title[:30] in existing_file:
                     already_exists = True
                     break
+            if not already_exists:
+                for unverified_file in unverified_files:
+                    if ep_id in unverified_file or clean_title[:30] in unverified_file:
+                        resume_name = unverified_file
+                        break
         
         if not already_exists:
             new_episodes.append({
                 'episode': episode,
                 'episode_counter': episode_counter,
-                'clean_title': clean_title
+                'clean_title': clean_title,
+                'resume_name': resume_name
             })
-            episode_counter += 1
+            if resume_name is None:
+                episode_counter += 1
             
             if len(new_episodes) >= limit:
                 break
@@ -239,50 +304,96 @@ def download_podcast_episodes(podcast_id: str, podcast_name: str, limit: int = 3
     
     if not new_episodes:
         print("  ✅ 所有单集已下载，无需重复下载")
-        return []
     
-    downloaded = []
-    for i, item in enumerate(new_episodes, 1):
-        episode = item['episode']
-        ep_id = episode.get('episode_id')
-        ep_title = episode.get('title', f"Episode_{ep_id}")
-        clean_title = item['clean_title']
-        ep_counter = item['episode_counter']
-        
-        print(f"\n  [{i}/{len(new_episodes)}] {ep_title}")
-        
-        # 获取音频URL
-        audio_url = episode.get('audio_url')
-        if not audio_url:
-            print(f"    获取音频URL...")
-            audio_url = get_episode_audio_url(ep_id)
-        
-        if not audio_url:
-            print(f"    ⚠️  无法获取音频URL")
-            continue
-        
-        print(f"    音频URL: {audio_url[:60]}...")
-        
-        # 下载音频（使用连续编号）
+    return {'output_dir': output_dir, 'manifest': manifest, 'items': new_episodes}
+
+def download_episode(item: Dict, output_dir: Path, manifest: DownloadManifest, label: str = '', segments: int = 1) -> Dict:
+    """下载一期（plan_podcast_episodes 给出的条目），成功时返回下载记录，失败返回None"""
+    episode = item['episode']
+    ep_id = episode.get('episode_id')
+    ep_title = episode.get('title', f"Episode_{ep_id}")
+    clean_title = item['clean_title']
+    ep_counter = item['episode_counter']
+    
+    # 获取音频URL
+    audio_url = episode.get('audio_url')
+    if not audio_url:
+        audio_url = get_episode_audio_url(ep_id)
+    
+    if not audio_url:
+        print(f"    {label}⚠️  无法获取音频URL: {ep_title}")
+        return None
+    
+    # 下载音频（使用连续编号；未完成的沿用原文件名续传）
+    if item['resume_name']:
+        output_file = output_dir / item['resume_name']
+        print(f"    {label}续传/校验已有文件: {output_file.name}")
+    else:
         output_file = output_dir / f"{ep_counter:02d}_{ep_id}_{clean_title}.mp3"
-        if download_audio(audio_url, output_file):
-            file_size = output_file.stat().st_size / (1024 * 1024)
-            print(f"    ✅ 下载成功 ({file_size:.1f}MB): {output_file.name}")
-            downloaded.append({
-                'episode_id': ep_id,
-                'title': ep_title,
-                'audio_file': str(output_file),
-                'audio_url': audio_url
-            })
-        else:
-            print(f"    ❌ 下载失败")
-        
-        time.sleep(2)  # 避免请求过快
+    if not download_audio(audio_url, output_file, manifest=manifest, label=label, segments=segments):
+        print(f"    {label}❌ 下载失败: {ep_title}")
+        return None
     
+    file_size = output_file.stat().st_size / (1024 * 1024)
+    print(f"    {label}✅ 下载成功 ({file_size:.1f}MB): {output_file.name}")
+    return {
+        'episode_id': ep_id,
+        'title': ep_title,
+        'audio_file': str(output_file),
+        'audio_url': audio_url
+    }
+
+def download_podcast_episodes(podcast_id: str, podcast_name: str, limit: int = 3, output_dir: Path = None, skip_existing: bool = True):
+    """下载播客的最近N期（逐期进行；多个播客并发下载见 download_all）"""
+    plan = plan_podcast_episodes(podcast_id, podcast_name, limit, output_dir, skip_existing)
+    downloaded = []
+    for i, item in enumerate(plan['items'], 1):
+        print(f"\n  [{i}/{len(plan['items'])}] {item['episode'].get('title')}")
+        record = download_episode(item, plan['output_dir'], plan['manifest'])
+        if record:
+            downloaded.append(record)
     return downloaded
 
+def download_all(podcasts: List[Dict], limit: int, output_dir: Path, workers: int = 6, segments: int = 1) -> Dict[str, List[Dict]]:
+    """并发下载多个播客：先并发获取各播客页面，再按播客轮转并发下载各期
+
+    实际同时进行的请求数和每主机的请求间隔由共享连接池 POOL 控制，
+    某个播客的音频下载期间，其它播客的单集页面和音频可以同时进行。
+    """
+    plans = run_fair({podcast['name']: [podcast] for podcast in podcasts},
+                     lambda name, podcast: plan_podcast_episodes(podcast['id'], name, limit=limit,
+                                                                 output_dir=output_dir, skip_existing=True),
+                     workers=workers)
+    plans = {name: results[0] for name, results in plans.items()}
+    jobs = {name: plan['items'] for name, plan in plans.items()}
+    total = sum(len(items) for items in jobs.values())
+    print(f"\n共需下载 {total} 期，并发 {workers}")
+    
+    done = [0]
+    lock = threading.Lock()
+    
+    def job_done(name, item, record):
+        with lock:
+            done[0] += 1
+            status = "✅" if record else "❌"
+            print(f"  [{done[0]}/{total}] {status} {name}: {item['episode'].get('title')}")
+    
+    def download(name, item):
+        plan = plans[name]
+        return download_episode(item, plan['output_dir'], plan['manifest'], label=f"[{name}] ", segments=segments)
+    
+    results = run_fair(jobs, download, workers=workers, on_done=job_done)
+    return {name: [record for record in records if record] for name, records in results.items()}
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="并发下载各播客最近N期音频")
+    parser.add_argument("--limit", type=int, default=10, help="每个播客下载几期")
+    parser.add_argument("--workers", type=int, default=6, help="全局同时进行的请求数上限")
+    parser.add_argument("--per-host", type=int, default=4, help="同一音频主机同时进行的请求数上限")
+    parser.add_argument("--segments", type=int, default=1, help="单集分成几段并发下载（需服务器支持 Range）")
+    args = parser.parse_args()
+    
     podcasts = [
         {
             'id': '61933ace1b4320461e91fd55',
@@ -311,20 +422,15 @@ def main():
     ]
     
     output_dir = Path(__file__).parent.parent / "podcasts"
-    limit = 10  # 每个播客下载10期
-    
-    all_downloaded = {}
     
-    for podcast in podcasts:
-        downloaded = download_podcast_episodes(
-            podcast['id'],
-            podcast['name'],
-            limit=limit,
-            output_dir=output_dir,
-            skip_existing=True  # 跳过已下载的
-        )
-        all_downloaded[podcast['name']] = downloaded
-        time.sleep(3)
+    global POOL
+    POOL = HostPool(max_connections=args.workers, per_host=args.per_host, min_interval=AUDIO_HOST_INTERVAL,
+                    host_limits=HOST_LIMITS)
+    started = time.time()
+    try:
+        all_downloaded = download_all(podcasts, args.limit, output_dir, workers=args.workers, segments=args.segments)
+    finally:
+        POOL.close()
     
     # 保存下载记录
     record_file = output_dir / "download_records.json"
@@ -333,7 +439,10 @@ def main():
     
     print(f"\n✅ 下载完成！记录已保存到: {record_file}")
     total = sum(len(eps) for eps in all_downloaded.values())
-    print(f"总计下载: {total} 个音频文件")
+    print(f"总计下载: {total} 个音频文件，用时 {time.time() - started:.0f}s")
+    print(POOL.format_stats())
+    if default_cache():
+        print(default_cache().format_stats())
 
 if __name__ == "__main__":
     main()
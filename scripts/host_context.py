@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+主播发言压缩：只把主播说的话（外加前一位说话人结尾的一小段作上下文）发给分析模型
+
+分析只关心主播的观点，原始转录里大段的嘉宾独白只会拉长提示词、增加延迟和费用。
+compact_host_context() 基于 identify_host_statements 使用的说话人区间（speaker_spans），
+compact_utterances() 直接使用规范化后的发言（发言存储中的一集）：
+- 保留全部主播发言区间
+- 每段主播发言前，如果上一段是嘉宾/其他人，附上其结尾最多 guest_window_chars 个字符
+- 完全相同的发言（"嗯。""对。"之类）和上下文只保留第一次
+- 主播发言保留标签行上的时间戳
+压缩后仍然很长的不在这里截断，由调用方按发言边界分块做 map-reduce。
+没有主播标签的转录原样返回（压缩比为 1）。
+
+直接运行本脚本可查看 transcriptions/ 下各播客的压缩比。
+"""
+
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+from speaker_spans import speaker_spans
+from transcript_chunks import estimate_tokens
+from transcript_normalizer import format_utterance, parse_timestamp
+
+DEFAULT_GUEST_WINDOW_CHARS = 200
+
+
+def _normalize(text: str) -> str:
+    return ''.join(text.split())
+
+
+def _tag_start(text: str, body_start: int):
+    """发言所在行标签里的时间戳（秒），没有时返回None"""
+    line_start = text.rfind('\n', 0, body_start) + 1
+    start, _ = parse_timestamp(text[line_start:body_start])
+    return start
+
+
+def compact_host_context(text: str, guest_window_chars: int = DEFAULT_GUEST_WINDOW_CHARS) -> Dict:
+    """返回 {'utterances', 'text', 'original_tokens', 'tokens', 'ratio', 'host_spans', 'host_chars', 'duplicates'}
+
+    host_chars 是压缩前全部主播发言的字数（含重复），用来计算分块后的主播发言覆盖率。
+    """
+    # 只按说话人标签压缩。没有主播标签时启发式只能挑出少数提问段落，
+    # 据此压缩会丢掉大部分主播发言，因此这类转录原样发送
+    utterances = [{'speaker': role, 'start': _tag_start(text, start) if role == '主播' else None,
+                   'text': text[start:end]} for start, end, role in speaker_spans(text)]
+    return _compact(utterances, text, guest_window_chars)
+
+
+def compact_utterances(utterances: List[Dict], guest_window_chars: int = DEFAULT_GUEST_WINDOW_CHARS) -> Dict:
+    """与 compact_host_context 相同，输入是已规范化的发言（如 UtteranceStore.iter_episode 的结果），
+    不再重新扫描原文；没有主播发言时返回按统一格式拼接的全文"""
+    text = "\n".join(format_utterance(u) for u in utterances)
+    return _compact(utterances, text, guest_window_chars)
+
+
+def _compact(utterances: List[Dict], text: str, guest_window_chars: int) -> Dict:
+    original_tokens = estimate_tokens(text)
+    compacted = []
+    seen = set()
+    duplicates = 0
+    host_count = 0
+    host_chars = 0
+    previous = None
+    for utterance in utterances:
+        if utterance['speaker'] == '主播':
+            host_text = utterance['text']
+            host_chars += len(host_text)
+            key = _normalize(host_text)
+            if key in seen:
+                duplicates += 1
+            else:
+                seen.add(key)
+                if previous is not None and previous['speaker'] not in (None, '主播') and guest_window_chars > 0:
+                    tail = previous['text'][-guest_window_chars:]
+                    tail_key = _normalize(tail)
+                    if tail_key and tail_key not in seen:
+                        seen.add(tail_key)
+                        prefix = '…' if len(previous['text']) > guest_window_chars else ''
+                        compacted.append({'speaker': previous['speaker'], 'name': None, 'start': None,
+                                          'text': prefix + tail, 'context': True})
+                compacted.append({'speaker': '主播', 'name': None, 'start': utterance['start'], 'text': host_text})
+                host_count += 1
+        previous = utterance
+
+    if not compacted:
+        return {'utterances': None, 'text': text, 'original_tokens': original_tokens, 'tokens': original_tokens,
+                'ratio': 1.0, 'host_spans': 0, 'host_chars': 0, 'duplicates': 0}
+
+    compact_text = "\n".join(format_utterance(u) for u in compacted)
+    total = estimate_tokens(compact_text)
+    return {
+        'utterances': compacted,
+        'text': compact_text,
+        'original_tokens': original_tokens,
+        'tokens': total,
+        'ratio': total / original_tokens if original_tokens else 1.0,
+        'host_spans': host_count,
+        'host_chars': host_chars,
+        'duplicates': duplicates,
+    }
+
+
+def format_compaction(context: Dict) -> str:
+    """一行压缩统计"""
+    if context['utterances'] is None:
+        return f"未找到主播标签，发送全文（{context['original_tokens']} tokens）"
+    line = (f"主播发言压缩: {context['original_tokens']} → {context['tokens']} tokens"
+            f"（{context['ratio']:.0%}），主播发言 {context['host_spans']} 段")
+    if context['duplicates']:
+        line += f"，去重 {context['duplicates']} 段"
+    return line
+
+
+def main():
+    """打印 transcriptions/ 下各播客的主播发言压缩比"""
+    transcriptions_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent.parent / "transcriptions"
+    totals = {}
+    for txt_file in sorted(transcriptions_dir.rglob('*.txt')):
+        podcast = txt_file.relative_to(transcriptions_dir).parts[0]
+        context = compact_host_context(txt_file.read_text(encoding='utf-8'))
+        entry = totals.setdefault(podcast, [0, 0])
+        entry[0] += context['original_tokens']
+        entry[1] += context['tokens']
+    original = sum(entry[0] for entry in totals.values())
+    compact = sum(entry[1] for entry in totals.values())
+    for podcast, (podcast_original, podcast_compact) in totals.items():
+        print(f"{podcast}: {podcast_original} → {podcast_compact} tokens（{podcast_compact / max(1, podcast_original):.0%}）")
+    print(f"合计: {original} → {compact} tokens（{compact / max(1, original):.0%}）")
+
+
+if __name__ == "__main__":
+    main()
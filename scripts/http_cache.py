@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+播客/单集页面和 API 探测的磁盘 HTTP 缓存（条件请求），下载脚本共用
+
+每个 URL 保存响应体、ETag/Last-Modified、响应体 SHA-256 和由它解析出的结果（如单集列表、音频地址），
+数据在仓库根目录的 .http_cache/pages.sqlite：
+- 上次校验后 TTL 内：直接返回缓存的解析结果，不发请求
+- 超过 TTL：带 If-None-Match / If-Modified-Since 发条件请求，304 时只刷新校验时间，沿用缓存的解析结果
+- 200 且响应体哈希与缓存相同（服务器不支持条件请求时）：同样不重新解析
+- 只有响应体真的变了才重新解析；非 200/304 的响应不缓存，返回None
+
+解析结果按解析器名称分别保存，需能序列化为 JSON；响应体变化时全部作废。
+解析结果为空（None、空列表等，多半是页面结构变了或临时出错）时不缓存，下次调用会重新请求、重新解析，
+不会在长 TTL 内一直返回空结果。
+具体的 HTTP 请求由调用方通过 fetch(url, headers) -> (状态码, 响应头, 响应体bytes) 提供（连接池或 requests）。
+设置环境变量 HTTP_CACHE_DISABLE=1 可以临时绕过缓存。
+
+用法:
+    python3 scripts/http_cache.py            # 查看缓存统计
+    python3 scripts/http_cache.py --clear    # 清空缓存
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+CACHE_DIR = Path(__file__).parent.parent / ".http_cache"
+CACHE_FILENAME = "pages.sqlite"
+# 播客主页会上新，10 分钟内不重复请求；单集页面基本不变，可以给更长的 TTL
+DEFAULT_TTL_SECONDS = 10 * 60
+EPISODE_TTL_SECONDS = 7 * 24 * 3600
+
+
+def _usable(value) -> bool:
+    """空的解析结果不缓存"""
+    return value is not None and not (isinstance(value, (str, bytes, list, dict)) and not value)
+
+
+class HTTPCache:
+    """SQLite 页面缓存（线程安全，多个进程可同时使用）"""
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path) if path else CACHE_DIR / CACHE_FILENAME
+        self.lock = threading.Lock()
+        self.counts = {'fresh': 0, 'not_modified': 0, 'unchanged': 0, 'fetched': 0, 'parsed': 0}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB, body_sha256 TEXT,"
+                " parsed TEXT, fetched_at REAL, validated_at REAL)"
+            )
+            self.conn.commit()
+
+    def count(self, name: str):
+        with self.lock:
+            self.counts[name] += 1
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, body, body_sha256, parsed, validated_at FROM pages WHERE url = ?",
+                (url,)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body, body_sha256, parsed, validated_at = row
+        return {'etag': etag, 'last_modified': last_modified, 'body': body, 'body_sha256': body_sha256,
+                'parsed': json.loads(parsed) if parsed else {}, 'validated_at': validated_at}
+
+    def store(self, url: str, etag: str, last_modified: str, body: bytes, parsed: Dict):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              (url, etag, last_modified, body, hashlib.sha256(body).hexdigest(),
+                               json.dumps(parsed, ensure_ascii=False), now, now))
+            self.conn.commit()
+
+    def update(self, url: str, parsed: Dict, revalidated: bool):
+        """保存（新增的）解析结果；revalidated 时同时刷新校验时间（304 或内容未变）"""
+        with self.lock:
+            if revalidated:
+                self.conn.execute("UPDATE pages SET parsed = ?, validated_at = ? WHERE url = ?",
+                                  (json.dumps(parsed, ensure_ascii=False), time.time(), url))
+            else:
+                self.conn.execute("UPDATE pages SET parsed = ? WHERE url = ?",
+                                  (json.dumps(parsed, ensure_ascii=False), url))
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM pages")
+            self.conn.commit()
+
+    def stats(self) -> Dict:
+        with self.lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM pages").fetchone()
+            counts = dict(self.counts)
+        return {'entries': entries, 'bytes': size, 'session': counts}
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        session = stats['session']
+        return (f"页面缓存: TTL内直接命中 {session['fresh']} | 304 {session['not_modified']} | "
+                f"内容未变 {session['unchanged']} | 重新下载 {session['fetched']} | 解析 {session['parsed']} 次，"
+                f"缓存 {stats['entries']} 个页面，{stats['bytes'] / 1024 / 1024:.1f} MB")
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> Optional[HTTPCache]:
+    """进程内共享的默认缓存；HTTP_CACHE_DISABLE=1 时返回None"""
+    global _default_cache
+    if os.getenv("HTTP_CACHE_DISABLE") == "1":
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = HTTPCache()
+        return _default_cache
+
+
+def cached_request(url: str, fetch: Callable, headers: Dict = None, parse: Callable = None, name: str = None,
+                   ttl: float = DEFAULT_TTL_SECONDS, cache: HTTPCache = None):
+    """带条件请求缓存的 GET，返回 parse(响应体)（未给 parse 时返回响应体）；响应不是 200/304 时返回None
+
+    name 区分同一页面的不同解析结果（默认用 parse 的函数名），parse 抛出的异常原样抛给调用方。
+    """
+    if parse is None:
+        parse, name = (lambda body: body), None
+    elif name is None:
+        name = parse.__name__
+    if cache is None:
+        cache = default_cache()
+    if cache is None:
+        status, _, body = fetch(url, dict(headers or {}))
+        return parse(body) if status == 200 else None
+
+    def has_result(entry) -> bool:
+        return name is None or _usable(entry['parsed'].get(name))
+
+    def from_entry(entry, counter):
+        """沿用缓存的响应体：解析结果已缓存就直接返回，否则解析一次（结果非空时记下）"""
+        cache.count(counter)
+        parsed = entry['parsed']
+        if has_result(entry):
+            value = parse(entry['body']) if name is None else parsed[name]
+        else:
+            value = parse(entry['body'])
+            cache.count('parsed')
+            if _usable(value):
+                parsed[name] = value
+            else:
+                parsed.pop(name, None)
+        cache.update(url, parsed, revalidated=True)
+        return value
+
+    entry = cache.lookup(url)
+    if entry and time.time() - entry['validated_at'] <= ttl and has_result(entry):
+        # 只有缓存了非空解析结果才算新鲜，否则照常发条件请求
+        cache.count('fresh')
+        return parse(entry['body']) if name is None else entry['parsed'][name]
+
+    request_headers = dict(headers or {})
+    if entry and entry['etag']:
+        request_headers['If-None-Match'] = entry['etag']
+    if entry and entry['last_modified']:
+        request_headers['If-Modified-Since'] = entry['last_modified']
+    status, response_headers, body = fetch(url, request_headers)
+    if status == 304 and entry:
+        return from_entry(entry, 'not_modified')
+    if status != 200:
+        return None
+    if entry and hashlib.sha256(body).hexdigest() == entry['body_sha256']:
+        return from_entry(entry, 'unchanged')
+
+    cache.count('fetched')
+    value = parse(body)
+    parsed = {}
+    if name is not None:
+        cache.count('parsed')
+        if _usable(value):
+            parsed[name] = value
+    cache.store(url, response_headers.get('ETag'), response_headers.get('Last-Modified'), body, parsed)
+    return value
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="查看/清理页面缓存")
+    parser.add_argument("--clear", action="store_true", help="清空缓存")
+    args = parser.parse_args()
+
+    cache = HTTPCache()
+    if args.clear:
+        cache.clear()
+        print("🧹 缓存已清空")
+    stats = cache.stats()
+    print(f"缓存文件: {cache.path}")
+    print(f"页面: {stats['entries']} | 大小: {stats['bytes'] / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
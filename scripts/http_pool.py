@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+按主机复用 keep-alive 连接的 HTTP 连接池，供并发下载脚本共用
+
+- 每个主机（scheme + host:port）保留空闲的 http.client 连接，读完的响应把连接放回池中，
+  下一个请求省掉 TCP/TLS 握手；服务器已关闭的空闲连接在第一次失败时换新连接重试一次
+- 全局并发上限：同时在用的连接总数不超过 max_connections
+- 每主机礼貌限制：同一主机同时最多 per_host 个连接，相邻两次请求的发起间隔不少于 min_interval 秒
+  （取代原来逐集 sleep(2)、逐播客 sleep(3) 的固定等待）；host_limits 可按主机名单独设置
+- 自动跟随重定向（音频地址常跳转到 CDN，新主机按自己的限制排队）
+"""
+
+import http.client
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+
+class HostPool:
+    """线程安全的按主机连接池"""
+
+    def __init__(self, max_connections: int = 6, per_host: int = 2, min_interval: float = 0.5,
+                 timeout: float = 30, host_limits: Dict[str, Tuple[int, float]] = None):
+        """host_limits: {主机名: (同时连接数, 请求间隔秒数)}，未列出的主机用 per_host / min_interval"""
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self.host_limits = host_limits or {}
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.lock = threading.Lock()
+        self.hosts: Dict[tuple, Dict] = {}
+        self.stats = {'requests': 0, 'connections': 0, 'reused': 0}
+
+    def _host(self, key: tuple) -> Dict:
+        with self.lock:
+            host = self.hosts.get(key)
+            if host is None:
+                per_host, interval = self.host_limits.get(key[1].split(':')[0], (self.per_host, self.min_interval))
+                host = {'idle': [], 'slots': threading.BoundedSemaphore(per_host), 'interval': interval,
+                        'next_start': 0.0}
+                self.hosts[key] = host
+            return host
+
+    def _wait_turn(self, host: Dict):
+        """同一主机的请求按间隔错开发起"""
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, host['next_start'])
+            host['next_start'] = start + host['interval']
+        if start > now:
+            time.sleep(start - now)
+
+    def _new_connection(self, key: tuple):
+        with self.lock:
+            self.stats['connections'] += 1
+        scheme, netloc = key
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(netloc, timeout=self.timeout)
+
+    def _connect(self, key: tuple, host: Dict):
+        """取一个空闲连接（没有则新建），返回 (连接, 是否复用)"""
+        with self.lock:
+            if host['idle']:
+                self.stats['reused'] += 1
+                return host['idle'].pop(), True
+        return self._new_connection(key), False
+
+    def _release(self, host: Dict, connection, response):
+        """响应已读完且服务器没要求关闭时放回空闲列表，否则关闭"""
+        if response is not None and response.isclosed() and not response.will_close:
+            with self.lock:
+                host['idle'].append(connection)
+        else:
+            connection.close()
+
+    def _send(self, key: tuple, host: Dict, method: str, path: str, headers: Dict):
+        connection, reused = self._connect(key, host)
+        try:
+            connection.request(method, path, headers=headers)
+            return connection, connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            if not reused:
+                raise
+        # 复用的空闲连接可能已被服务器关闭，换新连接重试一次
+        connection = self._new_connection(key)
+        try:
+            connection.request(method, path, headers=headers)
+            return connection, connection.getresponse()
+        except Exception:
+            connection.close()
+            raise
+
+    @contextmanager
+    def open(self, url: str, headers: Optional[Dict] = None, method: str = 'GET'):
+        """发起请求并产出 http.client.HTTPResponse（跟随重定向）；退出时归还连接
+
+        响应体未读完就退出时连接会被关闭而不是放回池中。
+        """
+        headers = dict(headers or {})
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            key = (parts.scheme, parts.netloc)
+            path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+            host = self._host(key)
+            with host['slots'], self.slots:
+                self._wait_turn(host)
+                with self.lock:
+                    self.stats['requests'] += 1
+                connection, response = self._send(key, host, method, path, headers)
+                location = response.getheader('Location')
+                if response.status in REDIRECT_STATUSES and location:
+                    response.read()
+                    self._release(host, connection, response)
+                    url = urljoin(url, location)
+                    continue
+                try:
+                    yield response
+                finally:
+                    self._release(host, connection, response)
+                return
+        raise http.client.HTTPException(f"重定向超过 {MAX_REDIRECTS} 次: {url}")
+
+    def get(self, url: str, headers: Optional[Dict] = None) -> bytes:
+        """GET 并返回响应体；状态码 >= 400 时抛 HTTPException"""
+        with self.open(url, headers) as response:
+            body = response.read()
+            if response.status >= 400:
+                raise http.client.HTTPException(f"HTTP {response.status} {response.reason}")
+            return body
+
+    def close(self):
+        with self.lock:
+            for host in self.hosts.values():
+                for connection in host['idle']:
+                    connection.close()
+                host['idle'].clear()
+
+    def format_stats(self) -> str:
+        with self.lock:
+            stats = dict(self.stats)
+        return (f"HTTP 请求 {stats['requests']} 次，新建连接 {stats['connections']} 个，"
+                f"复用 keep-alive 连接 {stats['reused']} 次")
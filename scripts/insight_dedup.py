@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+合并多期洞察时的近似去重：把说法略有不同的同一条观点聚成一簇，每簇保留一条代表并记录支持数
+
+- 每条洞察去掉空白和标点后取字符 n-gram（中文按字切，不需要分词），算 MinHash 签名
+- 签名分成若干段做 LSH 分桶，只有落进同一个桶的两条才比较，条目越多也不会两两全比
+- 估计的 Jaccard 相似度达到阈值就用并查集合并成一簇
+- 代表取簇内与其他成员最相似的一条（相同时取最早出现的），支持数 = 簇大小
+- 去掉标点后不足 MIN_FUZZY_CHARS 个字的短条目（如 discussion_topics 里的“内容创作”“大模型”）只合并完全相同的，
+  否则差一个字的不同话题也会被判为相似
+- 非字符串条目（如结构化的字典）不参与相似度计算，只合并完全相同的，原样保留
+- 可选传入 embed(texts) -> 向量列表（例如 gemini_embed），改用随机超平面 LSH 分桶、余弦相似度判定，
+  能合并字面不同但意思相同的说法
+
+用法:
+    python3 scripts/insight_dedup.py [research/host_insights_analysis.json]   # 查看各播客合并前后的条数
+"""
+
+import json
+import random
+import re
+import sys
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List
+
+NGRAM = 2  # 中文词多为两个字，二元组对改写更稳
+NUM_PERM = 64
+BANDS = 16  # 每段 4 行，阈值约 (1/16)^(1/4) ≈ 0.5
+DEFAULT_THRESHOLD = 0.5
+EMBEDDING_BITS = 64
+EMBEDDING_BANDS = 8
+DEFAULT_EMBEDDING_THRESHOLD = 0.85
+MIN_FUZZY_CHARS = 8
+EMBED_BATCH_SIZE = 100  # embed_content 单次请求最多 100 条
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)  # 固定种子，同一条文本的签名在不同运行间一致
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_STRIP_RE = re.compile(r'[\s\W_]+')
+
+
+def shingles(text: str, n: int = NGRAM) -> set:
+    """去掉空白和标点、转小写后的字符 n-gram 集合（不足 n 个字时整体作为一个）"""
+    normalized = _normalize(text)
+    if len(normalized) <= n:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + n] for i in range(len(normalized) - n + 1)}
+
+
+def _normalize(text: str) -> str:
+    return _STRIP_RE.sub('', text.lower())
+
+
+def minhash(items: set) -> List[int]:
+    hashes = [zlib.crc32(item.encode('utf-8')) for item in items] or [0]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _union(parent: List[int], i: int, j: int):
+    root_i, root_j = _find(parent, i), _find(parent, j)
+    if root_i != root_j:
+        parent[max(root_i, root_j)] = min(root_i, root_j)
+
+
+def _cosine(u: List[float], v: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(u, v))
+    norm = (sum(x * x for x in u) * sum(y * y for y in v)) ** 0.5
+    return dot / norm if norm else 0.0
+
+
+def _candidate_pairs(signatures: List[tuple], bands: int) -> set:
+    """LSH：签名按段分桶，同桶的条目两两成为候选"""
+    rows = len(signatures[0]) // bands
+    pairs = set()
+    for band in range(bands):
+        buckets = {}
+        for i, signature in enumerate(signatures):
+            buckets.setdefault(tuple(signature[band * rows:(band + 1) * rows]), []).append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((members[x], members[y]))
+    return pairs
+
+
+def cluster_insights(items: List, threshold: float = None, embed: Callable = None) -> List[Dict]:
+    """把近似重复的洞察聚簇，返回 [{'text': 代表, 'support': 簇大小, 'members': [原文...]}]
+
+    结果按支持数从高到低、同支持数按首次出现的顺序排列。
+    """
+    items = [item for item in items if item is not None and not (isinstance(item, str) and not item.strip())]
+    if not items:
+        return []
+    positions = [i for i, item in enumerate(items) if isinstance(item, str)]
+    texts = [items[i] for i in positions]
+    others = [(i, item) for i, item in enumerate(items) if not isinstance(item, str)]
+    if not texts:
+        return _finish_clusters([], others)
+
+    if embed is None:
+        threshold = DEFAULT_THRESHOLD if threshold is None else threshold
+        signatures = [minhash(shingles(text)) for text in texts]
+        bands = BANDS
+
+        def similarity(i, j):
+            return sum(a == b for a, b in zip(signatures[i], signatures[j])) / NUM_PERM
+    else:
+        threshold = DEFAULT_EMBEDDING_THRESHOLD if threshold is None else threshold
+        vectors = embed(texts)
+        rng = random.Random(20240601)
+        planes = [[rng.gauss(0, 1) for _ in vectors[0]] for _ in range(EMBEDDING_BITS)]
+        signatures = [[sum(p * x for p, x in zip(plane, vector)) >= 0 for plane in planes] for vector in vectors]
+        bands = EMBEDDING_BANDS
+
+        def similarity(i, j):
+            return _cosine(vectors[i], vectors[j])
+
+    parent = list(range(len(texts)))
+    scores = [0.0] * len(texts)
+    normalized = [_normalize(text) for text in texts]
+    exact = {}
+    for i, key in enumerate(normalized):
+        if key in exact:
+            _union(parent, exact[key], i)
+        else:
+            exact[key] = i
+    for i, j in _candidate_pairs(signatures, bands):
+        if min(len(normalized[i]), len(normalized[j])) < MIN_FUZZY_CHARS:
+            continue
+        score = similarity(i, j)
+        if score >= threshold:
+            _union(parent, i, j)
+            scores[i] += score
+            scores[j] += score
+
+    clusters = {}
+    for i in range(len(texts)):
+        clusters.setdefault(_find(parent, i), []).append(i)
+    result = []
+    for root, members in clusters.items():
+        representative = max(members, key=lambda i: (scores[i], -i))
+        result.append({'text': texts[representative], 'support': len(members),
+                       'members': [texts[i] for i in members], 'first': positions[root]})
+    return _finish_clusters(result, others)
+
+
+def _finish_clusters(result: List[Dict], others: List[tuple]) -> List[Dict]:
+    """并入非字符串条目 [(原位置, 条目)]（完全相同的算一簇）并排序"""
+    exact = {}
+    for position, item in others:
+        marker = json.dumps(item, ensure_ascii=False, sort_keys=True, default=str)
+        if marker in exact:
+            exact[marker]['support'] += 1
+            exact[marker]['members'].append(item)
+        else:
+            exact[marker] = {'text': item, 'support': 1, 'members': [item], 'first': position}
+    result = result + list(exact.values())
+    result.sort(key=lambda cluster: (-cluster['support'], cluster['first']))
+    for cluster in result:
+        del cluster['first']
+    return result
+
+
+def gemini_embed(texts: List[str], model: str = "models/text-embedding-004") -> List[List[float]]:
+    """用 Gemini 嵌入模型向量化（需要 google-generativeai 且已 configure）"""
+    import google.generativeai as genai
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        batch = texts[start:start + EMBED_BATCH_SIZE]
+        vectors.extend(genai.embed_content(model=model, content=batch)['embedding'])
+    return vectors
+
+
+def main():
+    """打印各播客洞察去重前后的条数"""
+    analysis_file = Path(sys.argv[1]) if len(sys.argv) > 1 else \
+        Path(__file__).parent.parent / "research" / "host_insights_analysis.json"
+    with open(analysis_file, 'r', encoding='utf-8') as f:
+        summaries = json.load(f)
+    for podcast_name, summary in summaries.items():
+        print(f"{podcast_name}:")
+        for key, values in summary.get('insights', {}).items():
+            if isinstance(values, list) and values:
+                clusters = cluster_insights(values)
+                print(f"  {key}: {len(values)} → {len(clusters)}")
+
+
+if __name__ == "__main__":
+    main()
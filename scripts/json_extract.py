@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+r"""
+从模型回复中提取 JSON 对象，各分析/问题设计脚本共用
+
+模型回复常带 ```json 代码块、前后说明文字，或者在对象里嵌套对象/列表，
+原来的 r'\{.*?\}' 之类的正则会在第一个 } 处截断，导致解析失败后整期重跑。这里改为：
+- JSONObjectScanner 跳着扫描括号和引号，用栈跟踪尚未闭合的 { / [ 以及字符串/转义状态
+  （字符串里的括号不计入），栈清空时得到一个完整的顶层对象；括号不配对、解析失败或到文本结尾
+  仍未闭合（比如说明文字里的 {xxx} 或单独一个 {），就从这个 { 的下一个字符重新找；
+  支持分段 feed()，流式回复可以边收边找
+- validate() 按字段类型表检查提取出的对象
+- parse_json_response() 提取或校验失败时，只把这次的回复连同字段要求发回模型做一次修复，
+  不重新发送原始转录
+
+结构化输出模式（LLM_STRUCTURED_OUTPUT=1，或各脚本的 --structured 参数）下，
+generate_structured() 直接让模型按 response_schema 输出 JSON，校验失败的回复计数后自动重试，
+不经过上面的文本提取和修复流程。
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from llm_cache import default_cache, generate_text
+
+# 字段 → 类型（list 表示字符串列表）
+INSIGHT_SCHEMA = {
+    'professional_observations': list,
+    'content_creation_philosophy': list,
+    'industry_insights': list,
+    'personal_views': list,
+    'discussion_topics': list,
+    'expression_style': str,
+}
+QUESTION_SCHEMA = {
+    'question': str,
+    'rationale': str,
+    'key_points': list,
+}
+# 修复请求里附带的原回复最多这么多字符
+REPAIR_MAX_CHARS = 8000
+STRUCTURED_MAX_RETRIES = 2
+
+# 字符串外需要关心的字符 / 字符串内需要关心的字符
+_STRUCTURE_RE = re.compile(r'[{}\[\]"]')
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+
+_structured_lock = threading.Lock()
+structured_stats = {'requests': 0, 'validation_failures': 0, 'retries': 0, 'failed': 0}
+
+
+class JSONObjectScanner:
+    """增量扫描文本，返回第一个能解析的完整顶层 JSON 对象
+
+    候选对象内用一个栈记录尚未闭合的 {/[，右括号与栈顶不配对、闭合后解析失败，或者文本结束时仍未闭合
+    （finish()），都说明这个 { 只是说明文字里的字符，从它的下一个字符重新找。
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.pos = 0  # 下一个待扫描的位置
+        self.start = None  # 当前候选对象的起点
+        self.closers = []  # 候选对象内尚未闭合的括号对应的右括号
+        self.in_string = False
+        self.result = None
+
+    def feed(self, chunk: str) -> Optional[Dict]:
+        """追加一段文本；找到对象后返回它（之后再 feed 也只返回同一个对象）"""
+        if self.result is not None:
+            return self.result
+        self.text += chunk
+        return self._scan()
+
+    def finish(self) -> Optional[Dict]:
+        """文本已经全部 feed 完：没闭合的候选对象不会再完整，从它后面接着找"""
+        while self.result is None and self.start is not None:
+            self._restart()
+            self._scan()
+        return self.result
+
+    def _restart(self):
+        self.pos = self.start + 1
+        self.start = None
+        self.closers = []
+        self.in_string = False
+
+    def _scan(self) -> Optional[Dict]:
+        text = self.text
+        while self.pos < len(text):
+            if self.start is None:
+                start = text.find('{', self.pos)
+                if start < 0:
+                    self.pos = len(text)
+                    break
+                self.start = start
+                self.closers.append('}')
+                self.pos = start + 1
+                continue
+            if self.in_string:
+                match = _STRING_SPECIAL_RE.search(text, self.pos)
+                if match is None:
+                    self.pos = len(text)
+                    break
+                # 反斜杠连同被转义的字符一起跳过（被转义的字符可能在下一段 feed 里）
+                self.pos = match.end() + (1 if match.group() == '\\' else 0)
+                self.in_string = match.group() != '"'
+                continue
+            match = _STRUCTURE_RE.search(text, self.pos)
+            if match is None:
+                self.pos = len(text)
+                break
+            char = match.group()
+            self.pos = match.end()
+            if char == '"':
+                self.in_string = True
+            elif char == '{':
+                self.closers.append('}')
+            elif char == '[':
+                self.closers.append(']')
+            elif char != self.closers.pop():
+                self._restart()
+            elif not self.closers:
+                try:
+                    value = json.loads(text[self.start:self.pos])
+                except ValueError:
+                    value = None
+                if isinstance(value, dict):
+                    self.result = value
+                    return value
+                self._restart()
+        return None
+
+
+def extract_json_object(text: str) -> Optional[Dict]:
+    """返回文本中第一个完整的 JSON 对象，没有时返回None"""
+    if not text:
+        return None
+    scanner = JSONObjectScanner()
+    return scanner.feed(text) or scanner.finish()
+
+
+def validate(data: Dict, schema: Dict) -> List[str]:
+    """按字段类型表检查对象，返回问题列表（空列表表示通过）"""
+    errors = []
+    for key, expected in schema.items():
+        if key not in data:
+            errors.append(f"缺少字段 {key}")
+        elif expected is list:
+            if not isinstance(data[key], list) or not all(isinstance(item, str) for item in data[key]):
+                errors.append(f"{key} 应为字符串列表")
+        elif not isinstance(data[key], expected):
+            errors.append(f"{key} 应为{'字符串' if expected is str else expected.__name__}")
+    return errors
+
+
+def schema_example(schema: Dict) -> str:
+    """字段要求的示例 JSON，用于提示词"""
+    example = {key: ["..."] if expected is list else "..." for key, expected in schema.items()}
+    return json.dumps(example, ensure_ascii=False, indent=4)
+
+
+def build_repair_prompt(response_text: str, schema: Dict, errors: List[str]) -> str:
+    if len(response_text) > REPAIR_MAX_CHARS:
+        response_text = response_text[:REPAIR_MAX_CHARS] + "…"
+    problems = "；".join(errors) if errors else "不是合法的JSON"
+    return f"""下面是一段应当为JSON的模型输出，但它有问题：{problems}。
+
+请在不改变原有内容含义的前提下，把它整理成符合以下结构的合法JSON（列表字段的每一项都是字符串；原文没有的内容用空列表或空字符串）：
+{schema_example(schema)}
+
+**原输出**：
+{response_text}
+
+请只输出JSON，不要其他文字。
+"""
+
+
+def parse_json_response(response_text: str, schema: Dict, model=None, rate_limiter=None) -> Optional[Dict]:
+    """提取并校验模型回复中的JSON；失败且提供了 model 时发一次修复请求
+
+    仍不完全符合时返回问题较少的那个对象（缺的字段由调用方补默认值），
+    提取到的对象连一个所需字段都没有时返回None。
+    """
+    data = extract_json_object(response_text)
+    errors = validate(data, schema) if data is not None else []
+    if data is not None and not errors:
+        return data
+    if model is not None and response_text:
+        print(f"    🔧 JSON{'校验' if data is not None else '解析'}失败，请求修复: {'；'.join(errors[:3]) or '未找到完整对象'}")
+        try:
+            repaired = extract_json_object(generate_text(model, build_repair_prompt(response_text, schema, errors),
+                                                         rate_limiter=rate_limiter))
+        except Exception as e:
+            print(f"    ⚠️  修复请求失败: {e}")
+            repaired = None
+        if repaired is not None and (data is None or len(validate(repaired, schema)) < len(errors)):
+            data = repaired
+    if data is None or not any(key in data for key in schema):
+        return None
+    return data
+
+
+def structured_output_enabled() -> bool:
+    return os.getenv("LLM_STRUCTURED_OUTPUT") == "1"
+
+
+class _EnableStructuredOutput(argparse.Action):
+    def __call__(self, parser, namespace, values, option_string=None):
+        setattr(namespace, self.dest, True)
+        os.environ["LLM_STRUCTURED_OUTPUT"] = "1"
+
+
+def add_structured_argument(parser: argparse.ArgumentParser):
+    """给脚本的命令行加上 --structured，解析到时直接打开结构化输出模式"""
+    parser.add_argument("--structured", action=_EnableStructuredOutput, nargs=0, default=False,
+                        help="使用结构化输出（response_schema）请求JSON，等同 LLM_STRUCTURED_OUTPUT=1")
+
+
+def response_schema(schema: Dict) -> Dict:
+    """把字段类型表转成 Gemini response_schema（OpenAPI 子集），所有字段必填"""
+    properties = {
+        key: {'type': 'ARRAY', 'items': {'type': 'STRING'}} if expected is list else {'type': 'STRING'}
+        for key, expected in schema.items()
+    }
+    return {'type': 'OBJECT', 'properties': properties, 'required': list(schema)}
+
+
+def _count(name: str):
+    with _structured_lock:
+        structured_stats[name] += 1
+
+
+def generate_structured(model, prompt: str, schema: Dict, rate_limiter=None,
+                        max_retries: int = STRUCTURED_MAX_RETRIES) -> Tuple[Optional[Dict], str]:
+    """按 schema 请求 JSON 输出，返回 (通过校验的对象或None, 最后一次回复原文)
+
+    校验失败的回复不进缓存，重试时会真正重新请求。
+    """
+    generation_config = {'response_mime_type': 'application/json', 'response_schema': response_schema(schema)}
+
+    def is_valid(text: str) -> bool:
+        data = extract_json_object(text)
+        return data is not None and not validate(data, schema)
+
+    text = ''
+    _count('requests')
+    for attempt in range(max_retries + 1):
+        if attempt:
+            _count('retries')
+        text = generate_text(model, prompt, rate_limiter=rate_limiter, validate=is_valid,
+                             generation_config=generation_config)
+        data = extract_json_object(text)
+        errors = validate(data, schema) if data is not None else ["未返回JSON对象"]
+        if not errors:
+            return data, text
+        _count('validation_failures')
+        print(f"    ⚠️  结构化输出校验失败（第 {attempt + 1} 次）: {'；'.join(errors[:3])}")
+    _count('failed')
+    return None, text
+
+
+def format_structured_stats() -> str:
+    with _structured_lock:
+        stats = dict(structured_stats)
+    return (f"结构化输出: 请求 {stats['requests']} 次，校验失败 {stats['validation_failures']} 次，"
+            f"重试 {stats['retries']} 次，最终失败 {stats['failed']} 次")
+
+
+def print_run_stats():
+    """脚本结束时打印本次运行的 LLM 响应缓存统计和结构化输出统计"""
+    cache = default_cache()
+    if cache:
+        print(cache.format_stats())
+    if structured_output_enabled():
+        print(format_structured_stats())
+
+
+def request_json(model, prompt: str, schema: Dict, rate_limiter=None) -> Tuple[Optional[Dict], str]:
+    """请求一个符合 schema 的JSON对象，返回 (对象或None, 回复原文)
+
+    结构化输出模式下走 generate_structured()，否则生成文本后提取（失败时请求修复）。
+    """
+    if structured_output_enabled():
+        return generate_structured(model, prompt, schema, rate_limiter)
+    text = generate_text(model, prompt, rate_limiter=rate_limiter)
+    return parse_json_response(text, schema, model, rate_limiter), text
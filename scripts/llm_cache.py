@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Gemini 文本生成的持久化响应缓存，所有分析/问题设计脚本共用
+
+缓存键 = 模型名 + 提示词SHA-256 + 生成参数（generation_config 等，按键排序后序列化）。
+数据保存在仓库根目录的 .llm_cache/responses.sqlite：
+- 条目超过 TTL（默认30天）视为过期，不再命中
+- 总大小超过上限（默认200MB）时按最近访问时间淘汰最久未用的条目（LRU）；
+  每个进程打开时统计一次总大小，之后按写入累加估算，估算值超过上限才真正扫描和淘汰
+- 命中/未命中/写入次数按进程统计，同时累计到数据库里；命中时的访问时间和计数先攒在内存里，
+  攒够 ACCESS_FLUSH_BATCH 次、写入新条目、淘汰或进程退出时一次性落盘
+
+提示词不是纯文本（例如带上传的音频文件）的请求不走缓存。
+未命中时按估算的 token 数占用限速配额；遇到 429 按服务端给的 retry-after 暂停共享限速器后重试。
+设置环境变量 LLM_CACHE_DISABLE=1 可以临时绕过缓存。
+
+用法:
+    python3 scripts/llm_cache.py            # 查看缓存统计
+    python3 scripts/llm_cache.py --evict    # 清理过期条目并按大小上限淘汰
+    python3 scripts/llm_cache.py --clear    # 清空缓存
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict
+
+from rate_limiter import is_rate_limit_error, retry_after_seconds
+from transcript_chunks import estimate_tokens
+
+CACHE_DIR = Path(__file__).parent.parent / ".llm_cache"
+CACHE_FILENAME = "responses.sqlite"
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+MAX_RATE_LIMIT_RETRIES = 3
+# 攒够这么多次查询再把访问时间和命中计数写入数据库
+ACCESS_FLUSH_BATCH = 50
+
+
+def _param_value(value):
+    """把 GenerationConfig 之类的对象转成可序列化的形式"""
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    if hasattr(value, '__dict__'):
+        return {k: v for k, v in vars(value).items() if not k.startswith('_')}
+    return repr(value)
+
+
+def cache_key(model_name: str, prompt: str, params: Dict = None) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    params_json = json.dumps(params or {}, sort_keys=True, ensure_ascii=False, default=_param_value)
+    return hashlib.sha256(f"{model_name}\n{prompt_hash}\n{params_json}".encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """SQLite 响应缓存（线程安全，多个进程可同时使用）"""
+
+    def __init__(self, path: Path = None, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path) if path else CACHE_DIR / CACHE_FILENAME
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evicted = 0
+        self._accessed = {}  # 尚未落盘的命中: key -> (最近访问时间, 命中次数)
+        self._pending = {'hits': 0, 'misses': 0, 'stores': 0}  # 尚未落盘的累计计数
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER,"
+                " created_at REAL, accessed_at REAL, hits INTEGER DEFAULT 0)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+            self.conn.commit()
+            self._size_estimate = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        atexit.register(self.flush)
+
+    def _flush(self):
+        """把攒下的访问时间和计数写入数据库并提交（调用方持有锁）"""
+        if self._accessed:
+            self.conn.executemany("UPDATE responses SET accessed_at = ?, hits = hits + ? WHERE key = ?",
+                                  [(accessed_at, count, key) for key, (accessed_at, count) in self._accessed.items()])
+            self._accessed.clear()
+        for name, value in self._pending.items():
+            if value:
+                self.conn.execute("INSERT INTO counters VALUES (?, ?) "
+                                  "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, value))
+                self._pending[name] = 0
+        self.conn.commit()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def get(self, key: str) -> str:
+        """命中返回缓存的文本，否则返回None"""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] <= self.ttl_seconds:
+                _, count = self._accessed.get(key, (now, 0))
+                self._accessed[key] = (now, count + 1)
+                self._pending['hits'] += 1
+                self.hits += 1
+                response = row[0]
+            else:
+                self._pending['misses'] += 1
+                self.misses += 1
+                response = None
+            if self._pending['hits'] + self._pending['misses'] >= ACCESS_FLUSH_BATCH:
+                self._flush()
+            return response
+
+    def put(self, key: str, model_name: str, response: str):
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, 0)",
+                              (key, model_name, response, size, now, now))
+            self._pending['stores'] += 1
+            self._flush()
+            self.stores += 1
+            self._size_estimate += size
+            over_limit = self._size_estimate > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def evict(self) -> int:
+        """删除过期条目，总大小超过上限时按最久未访问淘汰，返回删除条数"""
+        removed = 0
+        with self.lock:
+            self._flush()
+            cursor = self.conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            removed += cursor.rowcount
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                doomed = []
+                for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                self.conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+                removed += len(doomed)
+            self.conn.commit()
+            self._size_estimate = total
+            self.evicted += removed
+        return removed
+
+    def clear(self):
+        with self.lock:
+            self._accessed.clear()
+            self._pending = dict.fromkeys(self._pending, 0)
+            self.conn.execute("DELETE FROM responses")
+            self.conn.execute("DELETE FROM counters")
+            self.conn.commit()
+            self._size_estimate = 0
+
+    def stats(self) -> Dict:
+        with self.lock:
+            self._flush()
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            totals = dict(self.conn.execute("SELECT name, value FROM counters").fetchall())
+        return {
+            'entries': entries,
+            'bytes': size,
+            'session': {'hits': self.hits, 'misses': self.misses, 'stores': self.stores, 'evicted': self.evicted},
+            'total': {name: totals.get(name, 0) for name in ('hits', 'misses', 'stores')},
+        }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        session = stats['session']
+        lookups = session['hits'] + session['misses']
+        rate = f"{session['hits'] / lookups:.0%}" if lookups else "-"
+        return (f"LLM响应缓存: 本次命中 {session['hits']} / 未命中 {session['misses']}（命中率 {rate}），"
+                f"缓存 {stats['entries']} 条，{stats['bytes'] / 1024 / 1024:.1f} MB")
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> LLMCache:
+    """进程内共享的默认缓存；LLM_CACHE_DISABLE=1 时返回None"""
+    global _default_cache
+    if os.getenv("LLM_CACHE_DISABLE") == "1":
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+        return _default_cache
+
+
+def _generate(model, prompt, rate_limiter, params) -> str:
+    """调用模型；429 时暂停限速器（没有限速器时直接等待）到 retry-after 之后重试"""
+    tokens = estimate_tokens(prompt) if isinstance(prompt, str) else 0
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        if rate_limiter:
+            rate_limiter.acquire(tokens)
+        try:
+            return model.generate_content(prompt, **params).text
+        except Exception as e:
+            if attempt == MAX_RATE_LIMIT_RETRIES or not is_rate_limit_error(e):
+                raise
+            wait = retry_after_seconds(e, default=10 * 2 ** attempt)
+            print(f"  ⏳ 触发限流(429)，{wait:.0f}秒后重试 ({attempt + 1}/{MAX_RATE_LIMIT_RETRIES})")
+            if rate_limiter:
+                rate_limiter.pause(wait)
+            else:
+                time.sleep(wait)
+
+
+def generate_text(model, prompt, cache: LLMCache = None, rate_limiter=None, validate=None, **params) -> str:
+    """带缓存的 model.generate_content(prompt, **params).text；只有未命中时才占用限速配额
+
+    validate(text) 返回 False 的回复不写入缓存，已缓存的也视为未命中（用于结构化输出校验失败后重试）。
+    """
+    if cache is None:
+        cache = default_cache()
+    if cache is None or not isinstance(prompt, str):
+        return _generate(model, prompt, rate_limiter, params)
+
+    model_name = getattr(model, 'model_name', str(model))
+    key = cache_key(model_name, prompt, params)
+    cached = cache.get(key)
+    if cached is not None and (validate is None or validate(cached)):
+        return cached
+    text = _generate(model, prompt, rate_limiter, params)
+    if text and (validate is None or validate(text)):
+        cache.put(key, model_name, text)
+    return text
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="查看/清理 LLM 响应缓存")
+    parser.add_argument("--evict", action="store_true", help="清理过期条目并按大小上限淘汰")
+    parser.add_argument("--clear", action="store_true", help="清空缓存")
+    args = parser.parse_args()
+
+    cache = LLMCache()
+    if args.clear:
+        cache.clear()
+        print("🧹 缓存已清空")
+    elif args.evict:
+        print(f"🧹 已删除 {cache.evict()} 条")
+    stats = cache.stats()
+    print(f"缓存文件: {cache.path}")
+    print(f"条目: {stats['entries']} | 大小: {stats['bytes'] / 1024 / 1024:.1f} MB")
+    total = stats['total']
+    lookups = total['hits'] + total['misses']
+    rate = f"{total['hits'] / lookups:.0%}" if lookups else "-"
+    print(f"累计: 命中 {total['hits']} | 未命中 {total['misses']} | 写入 {total['stores']} | 命中率 {rate}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+自适应轮询工具：带抖动的指数退避，替代固定间隔的 time.sleep 轮询
+
+- AdaptivePoller 根据文件大小和历史处理耗时估算首次轮询时间，之后指数退避
+- poll_many 到期文件较多时用一次列表请求获取状态（最多看一页），少量文件逐个 get_file
+- wait_until 是通用的“等待条件满足”循环，供进度检查脚本复用
+"""
+
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+
+def backoff_intervals(initial: float = 2, factor: float = 1.6, max_interval: float = 60,
+                      jitter: float = 0.2) -> Iterator[float]:
+    """生成带抖动的指数退避间隔（抖动比例为 ±jitter）"""
+    interval = initial
+    while True:
+        yield max(0.0, interval * random.uniform(1 - jitter, 1 + jitter))
+        interval = min(max_interval, interval * factor)
+
+
+def wait_until(check: Callable[[], bool], initial: float = 30, factor: float = 1.5, max_interval: float = 300,
+               deadline: float = None, jitter: float = 0.1) -> bool:
+    """反复调用check直到返回True；超过deadline秒返回False（deadline为None时不限时）"""
+    started = time.monotonic()
+    intervals = backoff_intervals(initial, factor, max_interval, jitter)
+    while True:
+        if check():
+            return True
+        interval = next(intervals)
+        if deadline is not None:
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                return False
+            interval = min(interval, remaining)
+        time.sleep(interval)
+
+
+# 到期文件达到这个数量才用 list_files；列表会分页遍历项目里的所有远端文件，少量文件逐个 get_file 更省
+LIST_FILES_MIN_NAMES = 5
+# list_files 最多看这么多个文件（约一页），找不到的再逐个 get_file，遗留文件很多时不会翻完所有分页
+LIST_FILES_SCAN_LIMIT = 100
+
+
+def poll_many(client, names: List[str], min_names: int = LIST_FILES_MIN_NAMES,
+              scan_limit: int = LIST_FILES_SCAN_LIMIT) -> Dict[str, object]:
+    """一次性获取多个远端文件的最新状态
+
+    待查询文件不少于 min_names 个且 client 支持 list_files 时先发列表请求，找齐或看过 scan_limit 个文件就停，
+    列表中缺失的文件再单独 get_file。
+    """
+    found = {}
+    if len(names) >= min_names and hasattr(client, 'list_files'):
+        wanted = set(names)
+        for scanned, remote_file in enumerate(client.list_files(), 1):
+            if remote_file.name in wanted:
+                found[remote_file.name] = remote_file
+                if len(found) == len(wanted):
+                    break
+            if scanned >= scan_limit:
+                break
+    for name in names:
+        if name not in found:
+            found[name] = client.get_file(name)
+    return found
+
+
+class AdaptivePoller:
+    """根据文件大小和历史处理耗时决定轮询节奏"""
+
+    def __init__(self, history_file: Path = None, min_interval: float = 2, max_interval: float = 60,
+                 factor: float = 1.6, jitter: float = 0.2, deadline: float = 1800, max_samples: int = 50):
+        self.history_file = Path(history_file) if history_file else None
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.jitter = jitter
+        self.deadline = deadline
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.samples = self._load_history()
+
+    def _load_history(self) -> List[List[float]]:
+        if not self.history_file or not self.history_file.exists():
+            return []
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get('samples', [])[-self.max_samples:]
+        except (json.JSONDecodeError, OSError, AttributeError):
+            return []
+
+    def _save_history(self):
+        if not self.history_file:
+            return
+        self.history_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.history_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'samples': self.samples}, f)
+        os.replace(tmp_file, self.history_file)
+
+    def record(self, size_bytes: int, seconds: float):
+        """记录一次处理耗时，用于后续估算"""
+        with self.lock:
+            self.samples.append([size_bytes, round(seconds, 2)])
+            self.samples = self.samples[-self.max_samples:]
+            self._save_history()
+
+    def expected_seconds(self, size_bytes: int) -> float:
+        """按历史每MB处理耗时的中位数估算处理时间，无历史时返回None"""
+        with self.lock:
+            rates = [seconds / max(size, 1) for size, seconds in self.samples if seconds > 0]
+        if not rates:
+            return None
+        return statistics.median(rates) * max(size_bytes, 1)
+
+    def intervals(self, size_bytes: int = 0) -> Iterator[float]:
+        """单个文件的轮询间隔序列：首次约在预计完成时间的八成处，之后指数退避"""
+        expected = self.expected_seconds(size_bytes) if size_bytes else None
+        initial = self.min_interval if expected is None else expected * 0.8
+        initial = min(self.max_interval, max(self.min_interval, initial))
+        return backoff_intervals(initial, self.factor, self.max_interval, self.jitter)
+
+    def wait_for_file(self, client, remote_file, size_bytes: int = 0, throttle: Callable = None):
+        """等待单个远端文件离开PROCESSING状态，超过deadline抛出TimeoutError"""
+        started = time.monotonic()
+        intervals = self.intervals(size_bytes)
+        while remote_file.state.name == "PROCESSING":
+            elapsed = time.monotonic() - started
+            if elapsed >= self.deadline:
+                raise TimeoutError(f"处理超时（{elapsed:.0f}秒）")
+            time.sleep(min(next(intervals), self.deadline - elapsed))
+            if throttle:
+                throttle()
+            remote_file = client.get_file(remote_file.name)
+        if remote_file.state.name == "ACTIVE":
+            self.record(size_bytes, time.monotonic() - started)
+        return remote_file
@@ -8,10 +8,12 @@
 
 import os
 import sys
-import time
 from pathlib import Path
 import json
 
+sys.path.insert(0, str(Path(__file__).parent))
+from poller import wait_until
+
 # 尝试从.env文件加载环境变量
 def load_env_file():
     """从.env文件加载环境变量"""
@@ -181,23 +183,17 @@ def main():
         print("开始转录...")
         transcribe_pending()
         
-        # 等待转录完成
+        # 等待转录完成（从1分钟开始逐步放宽到5分钟检查一次，最多2小时）
         print("\n等待转录完成...")
-        max_wait = 7200  # 2小时
-        wait_interval = 300  # 5分钟检查一次
-        waited = 0
         
-        while waited < max_wait:
-            time.sleep(wait_interval)
-            waited += wait_interval
-            status = check_transcription_status()
-            total_pending = sum(info['pending'] for info in status.values())
-            
-            if total_pending == 0:
-                print("✅ 所有文件转录完成！")
-                break
-            else:
-                print(f"⏳ 还有 {total_pending} 个文件待转录，继续等待...")
+        def all_transcribed():
+            pending = sum(info['pending'] for info in check_transcription_status().values())
+            if pending:
+                print(f"⏳ 还有 {pending} 个文件待转录，继续等待...")
+            return pending == 0
+        
+        if wait_until(all_transcribed, initial=60, max_interval=300, deadline=7200):
+            print("✅ 所有文件转录完成！")
     else:
         print("\n✅ 所有文件已转录完成")
     
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+从转录检索索引中挑选嘉宾本人的原话，作为设计访谈问题时的依据
+
+- bm25_search(): 在检索索引（transcript_index，字二元组）上按 BM25 给发言打分，
+  可限定播客和说话人；直接遍历 mmap 里的倒排，不解码未入选的发言文本
+- guest_sources(): 嘉宾在哪些播客里说话：目录名为 <节目>_<嘉宾> 的取主播发言，
+  <嘉宾>_<...>（如 曾鸣_采访）的取嘉宾发言
+- retrieve_quotes(): 对每个候选话题各取前 k 句，跨话题去重，总字数不超过预算，保证提示词长度固定有上限
+
+用法:
+    python3 scripts/quote_retrieval.py 潘乱 AI 内容创作     # 打印检索到的原话和每次检索耗时
+"""
+
+import math
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from transcript_index import TranscriptIndex, format_timestamp, open_index, tokenize
+from utterance_store import SPEAKER_CODES
+
+K1 = 1.2
+B = 0.75
+# 少于这么多词的发言（"对。""嗯，是的。"）不作为引文
+MIN_QUOTE_TOKENS = 12
+DEFAULT_QUOTES_PER_TOPIC = 3
+DEFAULT_QUOTE_CHARS = 160
+DEFAULT_BUDGET_CHARS = 1200
+
+
+def bm25_search(index: TranscriptIndex, query: str, k: int = 5, podcasts: List[str] = None,
+                speaker: str = None) -> List[Tuple[float, int]]:
+    """返回得分最高的 k 句发言 [(得分, 全局发言下标)]；podcasts 为播客目录名列表（精确匹配）"""
+    terms = set(tokenize(query))
+    if not terms:
+        return []
+    store = index.store
+    offsets = store.episode_offsets
+    speaker_codes = store.speaker_codes
+    speaker_code = SPEAKER_CODES[speaker] if speaker else None
+    segments = [(j, segment) for j, segment in enumerate(index.segments)
+                if podcasts is None or store.episodes[j]['podcast'] in podcasts]
+    total = index.count
+    avg_doc_len = index.avg_doc_len or 1.0
+
+    scores = {}
+    for term in terms:
+        df = index.doc_freq(term)
+        if not df:
+            continue
+        idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+        for j, segment in segments:
+            postings = segment.postings(term)
+            if not postings:
+                continue
+            base = offsets[j]
+            docs, tfs, lengths = segment.docs, segment.tfs, segment.doc_lengths
+            for p in postings:
+                local = docs[p]
+                length = lengths[local]
+                if length < MIN_QUOTE_TOKENS:
+                    continue
+                i = base + local
+                if speaker_code is not None and speaker_codes[i] != speaker_code:
+                    continue
+                tf = tfs[p]
+                scores[i] = scores.get(i, 0.0) + idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg_doc_len))
+    ranked = sorted(scores.items(), key=lambda item: -item[1])[:k]
+    return [(score, i) for i, score in ranked]
+
+
+def guest_sources(index: TranscriptIndex, guest_name: str) -> List[Tuple[str, str]]:
+    """嘉宾本人说话的播客及其说话人角色 [(播客目录名, '主播'|'嘉宾')]"""
+    sources = []
+    for podcast in dict.fromkeys(episode['podcast'] for episode in index.store.episodes):
+        parts = podcast.split('_')
+        if len(parts) < 2:
+            continue
+        if parts[-1] == guest_name:
+            sources.append((podcast, '主播'))
+        elif parts[0] == guest_name:
+            sources.append((podcast, '嘉宾'))
+    return sources
+
+
+def _dedup_key(text: str) -> str:
+    """同一期的不同转录版本常有几乎相同的句子，按去掉标点空白后的开头判重"""
+    return ''.join(ch for ch in text if ch.isalnum())[:30]
+
+
+def _trim(text: str, max_chars: int) -> str:
+    text = ' '.join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars] + '…'
+
+
+def retrieve_quotes(index: TranscriptIndex, guest_name: str, topics: List[str],
+                    per_topic: int = DEFAULT_QUOTES_PER_TOPIC, quote_chars: int = DEFAULT_QUOTE_CHARS,
+                    budget_chars: int = DEFAULT_BUDGET_CHARS) -> List[Dict]:
+    """按话题检索嘉宾原话：[{'topic', 'text', 'podcast', 'episode', 'start', 'score'}]，总字数不超过 budget_chars"""
+    sources = guest_sources(index, guest_name)
+    if not sources:
+        return []
+    by_speaker = {}
+    for podcast, speaker in sources:
+        by_speaker.setdefault(speaker, []).append(podcast)
+
+    quotes = []
+    seen = set()
+    used = 0
+    # 各话题轮流取第 1 名、第 2 名……，预算不够时每个话题至少都有引文
+    ranked_by_topic = []
+    for topic in topics:
+        hits = []
+        for speaker, podcasts in by_speaker.items():
+            hits.extend(bm25_search(index, topic, per_topic, podcasts, speaker))
+        ranked_by_topic.append((topic, sorted(hits, reverse=True)[:per_topic]))
+    for rank in range(per_topic):
+        for topic, hits in ranked_by_topic:
+            if rank >= len(hits):
+                continue
+            score, i = hits[rank]
+            hit = index.hit(i)
+            key = _dedup_key(hit['text'])
+            if key in seen:
+                continue
+            text = _trim(hit['text'], quote_chars)
+            if used + len(text) > budget_chars:
+                return quotes
+            seen.add(key)
+            used += len(text)
+            quotes.append({'topic': topic, 'text': text, 'podcast': hit['podcast'], 'episode': hit['episode'],
+                           'start': hit['start'], 'score': round(score, 3)})
+    return quotes
+
+
+def format_quotes(quotes: List[Dict]) -> str:
+    """提示词中的引文列表"""
+    lines = []
+    for quote in quotes:
+        where = quote['podcast']
+        if quote['start'] is not None:
+            where += f" {format_timestamp(quote['start'])}"
+        lines.append(f"- 「{quote['text']}」（{where}，话题：{quote['topic']}）")
+    return "\n".join(lines)
+
+
+def main():
+    """打印某位嘉宾在若干话题下的原话"""
+    if len(sys.argv) < 3:
+        print("用法: python3 scripts/quote_retrieval.py <嘉宾> <话题> [话题...]")
+        return
+    guest_name, topics = sys.argv[1], sys.argv[2:]
+    with open_index() as index:
+        sources = guest_sources(index, guest_name)
+        print(f"来源: {', '.join(f'{podcast}（{speaker}）' for podcast, speaker in sources) or '无'}")
+        for topic in topics:
+            started = time.perf_counter()
+            for speaker in {speaker for _, speaker in sources}:
+                bm25_search(index, topic, DEFAULT_QUOTES_PER_TOPIC,
+                            [podcast for podcast, s in sources if s == speaker], speaker)
+            print(f"  {topic}: 检索 {(time.perf_counter() - started) * 1000:.1f} ms")
+        quotes = retrieve_quotes(index, guest_name, topics)
+        print(format_quotes(quotes))
+        print(f"共 {len(quotes)} 条，{sum(len(q['text']) for q in quotes)} 字")
+
+
+if __name__ == "__main__":
+    main()
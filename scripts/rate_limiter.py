@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+线程安全的API请求限速器，替代各脚本中固定的 time.sleep 间隔
+
+- 请求数按每分钟请求数限速（令牌桶）
+- 可选按每分钟 token 数限速：acquire(tokens=...) 预扣本次请求的 token，
+  单次请求超过一分钟额度时允许透支，之后的请求等额度补回再放行
+- 收到 429 时调用 pause(秒) ，所有共享该实例的线程都暂停到 retry-after 之后
+"""
+
+import re
+import threading
+import time
+
+# Gemini 429 错误信息里的重试间隔："retry_delay { seconds: 37 }" 或 "Please retry in 37.5s"
+RETRY_DELAY_RE = re.compile(r'retry[_ ]delay\s*\{\s*seconds:\s*(\d+)|retry in ([\d.]+)\s*s', re.IGNORECASE)
+
+
+class RateLimiter:
+    """按每分钟请求数（和可选的每分钟 token 数）限速，多个线程共享同一个实例"""
+
+    def __init__(self, requests_per_minute: float = 30, burst: int = 1, tokens_per_minute: float = None):
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute 必须大于0")
+        if tokens_per_minute is not None and tokens_per_minute <= 0:
+            raise ValueError("tokens_per_minute 必须大于0")
+        self.rate = requests_per_minute / 60.0  # 每秒补充的令牌数
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.token_rate = tokens_per_minute / 60.0 if tokens_per_minute else None
+        self.token_capacity = float(tokens_per_minute or 0)
+        self.token_level = self.token_capacity
+        self.paused_until = 0.0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        if self.token_rate:
+            self.token_level = min(self.token_capacity, self.token_level + elapsed * self.token_rate)
+        self.updated_at = now
+        return now
+
+    def acquire(self, tokens: int = 0):
+        """阻塞直到获得一个请求配额（以及 tokens 个 token 的配额）"""
+        while True:
+            with self.lock:
+                now = self._refill()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    # 超过一分钟额度的大请求只要求桶是满的，扣成负数后由后续请求等待补回
+                    need = min(tokens, self.token_capacity) if self.token_rate else 0
+                    if self.tokens >= 1 and (not need or self.token_level >= need):
+                        self.tokens -= 1
+                        if self.token_rate:
+                            self.token_level -= tokens
+                        return
+                    wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0
+                    if need and self.token_level < need:
+                        wait = max(wait, (need - self.token_level) / self.token_rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """暂停发放配额 seconds 秒（用于服务端返回 429 时遵守 retry-after）"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """是否为限流错误（HTTP 429 / google.api_core ResourceExhausted）"""
+    code = getattr(error, 'code', None)
+    if code == 429 or getattr(code, 'value', None) == 429:
+        return True
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) == 429 or getattr(response, 'status', None) == 429:
+        return True
+    return type(error).__name__ == 'ResourceExhausted' or '429' in str(error)
+
+
+def retry_after_seconds(error: Exception, default: float) -> float:
+    """从异常中取服务端建议的重试间隔（Retry-After 头或错误信息），取不到时返回 default"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    match = RETRY_DELAY_RE.search(str(error))
+    if match:
+        return float(match.group(1) or match.group(2))
+    return default
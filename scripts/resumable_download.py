@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+可续传的音频下载与完整性记录，download_podcasts.py 和 download_podcasts_simple.py 共用
+
+- 下载先写 <文件名>.part；连接中断后按已有字节数发 Range: bytes=N- 续传，
+  服务器返回 206 时核对 Content-Range 起点再追加，返回 200（不支持 Range）时从头写
+- 收完后核对总大小（Content-Range / Content-Length），计算 sha256，可选与期望值比对；
+  全部通过才 fsync 并原子重命名为正式文件，同时记入目录下的 download_manifest.json
+- skip_existing 只认清单里登记过、且磁盘大小与登记一致的文件；没有登记的旧文件（可能是以前中断留下的截断文件）
+  先用一次 Range 请求取回它末尾 VERIFY_TAIL_BYTES 字节在新 URL 上对应的内容：总大小不小于它、内容一致、
+  ETag 与清单里的登记不冲突时才当作 .part 前缀续传（完整的旧文件再一次 416 即可入册），
+  否则（例如单集重新编号后同名文件其实是另一集）改名为 <文件名>.stale 挪开，重新下载
+
+分段下载（download_segmented）：先用 Range: bytes=0-0 探测总大小，把文件分成 N 段并发请求，
+各段用 os.pwrite 写进预先分配好大小的 <文件名>.segpart，段内断线从该段已写到的位置续传；
+组装后核对大小和校验和再重命名。服务器不支持 Range、文件太小或平台没有 os.pwrite 时退回单连接续传下载。
+.segpart 中间有空洞，不能当作前缀续传，中断后下次重新分段下载。
+
+具体的 HTTP 请求由调用方通过 fetch(offset, end=None) 提供（urllib 或 requests），这里只负责续传、校验和落盘。
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+PART_SUFFIX = ".part"
+SEGMENTED_SUFFIX = ".segpart"
+# 每段至少这么大，小文件分段得不偿失
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+MANIFEST_FILENAME = "download_manifest.json"
+MAX_RESUME_ATTEMPTS = 5
+HASH_CHUNK_SIZE = 1024 * 1024
+# 复用未登记的旧文件前，比对它末尾这么多字节与服务器上同一位置的内容
+VERIFY_TAIL_BYTES = 64 * 1024
+STALE_SUFFIX = ".stale"
+CONTENT_RANGE_RE = re.compile(r'bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)')
+
+
+def part_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + PART_SUFFIX)
+
+
+def parse_content_range(value: str) -> Tuple[Optional[int], Optional[int]]:
+    """'bytes 100-199/1000' → (100, 1000)；'bytes */1000' → (None, 1000)；无法解析时两项都为None"""
+    match = CONTENT_RANGE_RE.match(value or '')
+    if not match:
+        return None, None
+    start, total = match.groups()
+    return (int(start) if start is not None else None), (int(total) if total != '*' else None)
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadManifest:
+    """目录下已校验完整的文件 {文件名: {'size', 'sha256', 'url', 'etag', 'verified_at'}}，每次登记后原子写回"""
+
+    def __init__(self, directory: Path):
+        self.path = Path(directory) / MANIFEST_FILENAME
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries: Dict[str, Dict] = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def is_complete(self, path: Path) -> bool:
+        """文件已登记且磁盘上的大小与登记一致"""
+        entry = self.entries.get(Path(path).name)
+        try:
+            return entry is not None and Path(path).stat().st_size == entry['size']
+        except FileNotFoundError:
+            return False
+
+    def record(self, path: Path, size: int, sha256: str, url: str = None, etag: str = None):
+        with self.lock:
+            self.entries[Path(path).name] = {
+                'size': size,
+                'sha256': sha256,
+                'url': url,
+                'etag': etag,
+                'verified_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.path)
+
+
+def download_resumable(fetch: Callable, output_path: Path, manifest: DownloadManifest = None, url: str = None,
+                       expected_sha256: str = None, max_attempts: int = MAX_RESUME_ATTEMPTS, label: str = '') -> int:
+    """下载到 output_path，返回文件大小；多次续传仍不完整时抛 IOError，校验和不符时抛 ValueError
+
+    fetch(offset, end=None) 是上下文管理器，产出 (HTTP状态码, 响应头, 字节块迭代器)；
+    offset > 0 或给出 end 时应带 Range: bytes=offset-[end] 请求头。
+    失败时保留 .part（校验和不符除外），下次调用从断点继续。label 加在输出行前（并发下载时区分各集）。
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    part_file = part_path(output_path)
+    if manifest is None:
+        manifest = DownloadManifest(output_path.parent)
+    if output_path.exists():
+        # 未登记（或大小不符）的旧文件可能是中断后留下的截断文件，核对过是同一个文件才作为前缀续传
+        if part_file.exists() and part_file.stat().st_size >= output_path.stat().st_size:
+            output_path.unlink()
+        elif _matches_remote(fetch, output_path, manifest.entries.get(output_path.name), url, label):
+            os.replace(output_path, part_file)
+        else:
+            stale_file = output_path.with_name(output_path.name + STALE_SUFFIX)
+            os.replace(output_path, stale_file)
+            print(f"    {label}⚠️  已有的 {output_path.name} 与 {url or '下载地址'} 的内容对不上，已改名为 {stale_file.name}")
+
+    started = time.perf_counter()
+    resumed_from = part_file.stat().st_size if part_file.exists() else 0
+    received = 0
+    total = None
+    etag = None
+    for attempt in range(1, max_attempts + 1):
+        offset = part_file.stat().st_size if part_file.exists() else 0
+        try:
+            with fetch(offset) as (status, headers, chunks):
+                etag = headers.get('ETag') or etag
+                if status == 416:
+                    # 请求的起点已到文件末尾：.part 可能本来就是完整的
+                    _, total = parse_content_range(headers.get('Content-Range'))
+                    if total is not None and offset == total:
+                        break
+                    print(f"    {label}⚠️  服务器拒绝续传（已有 {offset} 字节），从头下载")
+                    part_file.unlink()
+                    continue
+                if status == 206:
+                    start, total = parse_content_range(headers.get('Content-Range'))
+                    if start != offset:
+                        raise IOError(f"Content-Range 起点 {start} 与本地已有的 {offset} 字节不符")
+                else:
+                    if offset:
+                        print(f"    {label}⚠️  服务器不支持断点续传，从头下载")
+                    offset = 0
+                    length = headers.get('Content-Length')
+                    total = int(length) if length else None
+                with open(part_file, 'r+b' if offset else 'wb') as f:
+                    f.truncate(offset)
+                    f.seek(offset)
+                    try:
+                        for chunk in chunks:
+                            f.write(chunk)
+                            received += len(chunk)
+                    finally:
+                        f.flush()
+                        os.fsync(f.fileno())
+        except Exception as e:
+            if attempt == max_attempts:
+                raise
+            print(f"    {label}⚠️  连接中断（{e}），第 {attempt} 次续传")
+            continue
+        size = part_file.stat().st_size
+        if total is None or size == total:
+            break
+        if size > total:
+            raise IOError(f"收到 {size} 字节，超过声明的 {total} 字节")
+        print(f"    {label}⚠️  只收到 {size}/{total} 字节，第 {attempt} 次续传")
+    else:
+        raise IOError(f"续传 {max_attempts} 次后仍不完整")
+
+    size = _finish(part_file, output_path, manifest, url, expected_sha256, etag)
+    elapsed = time.perf_counter() - started
+    resumed = f"（续传自 {resumed_from / 1024 / 1024:.1f}MB）" if resumed_from else ""
+    print(f"    {label}⏱️  {size / 1024 / 1024:.1f}MB{resumed}，本次接收 {received / 1024 / 1024:.1f}MB，"
+          f"用时 {elapsed:.1f}s，{received / 1024 / 1024 / max(elapsed, 1e-6):.2f} MB/s")
+    return size
+
+
+def _finish(tmp_file: Path, output_path: Path, manifest: DownloadManifest, url: str, expected_sha256: str,
+            etag: str = None) -> int:
+    """校验和比对通过后把临时文件原子重命名为正式文件并登记，返回大小"""
+    size = tmp_file.stat().st_size
+    sha256 = file_sha256(tmp_file)
+    if expected_sha256 and sha256 != expected_sha256.lower():
+        tmp_file.unlink()
+        raise ValueError(f"sha256 不符: 期望 {expected_sha256}，实际 {sha256}")
+    os.replace(tmp_file, output_path)
+    manifest.record(output_path, size, sha256, url, etag)
+    return size
+
+
+def _matches_remote(fetch: Callable, path: Path, entry: Optional[Dict], url: str, label: str = '') -> bool:
+    """未登记的旧文件是否是 url 对应文件的前缀：取回末尾一段在服务器上同一位置的内容比对
+
+    清单里有同名条目时，登记的 URL 和 ETag 也要对得上；服务器不支持 Range 时无法核对，视为不是。
+    """
+    size = path.stat().st_size
+    if size == 0:
+        return True
+    if entry and url and entry.get('url') and entry['url'] != url:
+        return False
+    start = max(0, size - VERIFY_TAIL_BYTES)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        local_tail = f.read()
+    try:
+        with fetch(start, size - 1) as (status, headers, chunks):
+            if status != 206:
+                return False
+            got, total = parse_content_range(headers.get('Content-Range'))
+            etag = headers.get('ETag')
+            # 字节块可能是复用同一缓冲区的 memoryview，逐块复制后再拼接
+            remote_tail = b''.join(bytes(chunk) for chunk in chunks)
+    except Exception as e:
+        print(f"    {label}⚠️  核对已有文件失败（{e}）")
+        return False
+    if entry and entry.get('etag') and etag and entry['etag'] != etag:
+        return False
+    return got == start and total is not None and total >= size and remote_tail == local_tail
+
+
+def _probe(fetch: Callable) -> Tuple[Optional[int], Optional[str]]:
+    """请求第一个字节，返回 (服务器支持 Range 时的文件总大小否则None, ETag)"""
+    with fetch(0, 0) as (status, headers, chunks):
+        if status != 206:
+            return None, None
+        for _ in chunks:
+            pass
+        _, total = parse_content_range(headers.get('Content-Range'))
+        return total, headers.get('ETag')
+
+
+def _fetch_range(fetch: Callable, fd: int, start: int, end: int, progress: List[int], index: int,
+                 max_attempts: int, label: str):
+    """把 [start, end] 写进 fd 的对应位置；断线时从本段已写到的位置续传"""
+    for attempt in range(1, max_attempts + 1):
+        position = start + progress[index]
+        if position > end:
+            return
+        try:
+            with fetch(position, end) as (status, headers, chunks):
+                if status != 206:
+                    raise IOError(f"分段请求返回 HTTP {status}")
+                got, _ = parse_content_range(headers.get('Content-Range'))
+                if got != position:
+                    raise IOError(f"Content-Range 起点 {got} 与请求的 {position} 不符")
+                for chunk in chunks:
+                    if position + len(chunk) > end + 1:
+                        raise IOError(f"第 {index + 1} 段收到的数据超出请求范围")
+                    os.pwrite(fd, chunk, position)
+                    position += len(chunk)
+                    progress[index] += len(chunk)
+        except Exception as e:
+            if attempt == max_attempts:
+                raise
+            print(f"    {label}⚠️  第 {index + 1} 段中断（{e}），第 {attempt} 次续传")
+            continue
+        if position > end:
+            return
+        print(f"    {label}⚠️  第 {index + 1} 段只收到 {progress[index]}/{end - start + 1} 字节，第 {attempt} 次续传")
+    raise IOError(f"第 {index + 1} 段续传 {max_attempts} 次后仍不完整")
+
+
+def download_segmented(fetch: Callable, output_path: Path, segments: int, manifest: DownloadManifest = None,
+                       url: str = None, expected_sha256: str = None, max_attempts: int = MAX_RESUME_ATTEMPTS,
+                       label: str = '') -> int:
+    """把文件分成 segments 段并发下载，返回文件大小；不适合分段时退回 download_resumable
+
+    已有单连接下载留下的 .part 时也走 download_resumable，从断点续传更省流量。
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if manifest is None:
+        manifest = DownloadManifest(output_path.parent)
+    single = partial(download_resumable, fetch, output_path, manifest, url, expected_sha256, max_attempts, label)
+    if segments <= 1 or not hasattr(os, 'pwrite') or part_path(output_path).exists() or output_path.exists():
+        return single()
+    total, etag = _probe(fetch)
+    if total is None:
+        print(f"    {label}ℹ️  服务器不支持 Range，改为单连接下载")
+        return single()
+    segments = min(segments, total // MIN_SEGMENT_SIZE)
+    if segments <= 1:
+        return single()
+
+    started = time.perf_counter()
+    tmp_file = output_path.with_name(output_path.name + SEGMENTED_SUFFIX)
+    bounds = [total * i // segments for i in range(segments + 1)]
+    progress = [0] * segments
+    errors = []
+    fd = os.open(tmp_file, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, total)
+
+        def run(i):
+            try:
+                _fetch_range(fetch, fd, bounds[i], bounds[i + 1] - 1, progress, i, max_attempts, label)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(segments)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if not errors:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+    received = sum(progress)
+    if errors or received != total or tmp_file.stat().st_size != total:
+        tmp_file.unlink()
+        if errors:
+            raise errors[0]
+        raise IOError(f"分段下载组装后大小不符: 收到 {received} 字节，应为 {total} 字节")
+
+    size = _finish(tmp_file, output_path, manifest, url, expected_sha256, etag)
+    elapsed = time.perf_counter() - started
+    print(f"    {label}⏱️  {size / 1024 / 1024:.1f}MB，{segments} 段并发，"
+          f"用时 {elapsed:.1f}s，{size / 1024 / 1024 / max(elapsed, 1e-6):.2f} MB/s")
+    return size
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+按说话人标签把转录切成主播/嘉宾发言的偏移区间，标签写法与 transcript_normalizer 完全一致
+
+speaker_spans() 用一个以换行符开头的预编译正则扫完全文，找出所有带说话人标签的行首
+（时间戳、说话人写法和别名表都来自 transcript_normalizer，与规范化结果对同一行的判断一致），
+两个相邻标签之间就是前一位说话人的发言，结果是 (起点, 终点, 说话人) 的偏移三元组，
+调用方需要文本时再按区间切片 text[start:end]。
+
+这里的目标是识别结果与规范化器一致，而不是更快：按完整写法解析每个标签，在有标签的转录上
+比原来逐行做子串判断的实现慢（benchmark_host_statements.py 给出两边的耗时和识别差异）。
+批量分析直接读取发言存储，不再经过这里。
+
+没有任何主播标签的转录退回到按空行分段的启发式判断，只在原文上用 pattern.search(text, pos, endpos)
+检查每段，不复制段落。
+"""
+
+import re
+from itertools import chain
+from typing import List, Tuple
+
+from transcript_normalizer import (BARE_SPEAKER_PATTERN, BRACKET_SPEAKER_PATTERN, CLOCK_PATTERN, NAMED_SPEAKER_PATTERN,
+                                   SPEAKER_ALIASES, UNIT_PATTERN)
+
+# 行首的 可选时间戳 + 说话人标签，片段与 transcript_normalizer 逐行解析用的完全相同：
+# [00:01:02] [主播]：/ (00:20) [嘉宾 许梦圆] / 00:02:856 主持人：/ [李翔]：
+# 时间戳写成 (?=(...))\1：前瞻里的分组先匹配出完整的时间戳，再用反向引用 \1 原样吃掉这段文字。
+# 前瞻一旦成功就不会再回头尝试别的匹配，效果等同原子分组 (?>...)（Python 3.11 才支持，这里还要兼容更早的版本）：
+# 说话人标签不成立时不再回溯时间戳的各种拆法，普通的带时间戳正文行一次就能判定失败。
+# 行首（括号后）不是数字时直接跳过时间戳的两种写法。
+_TIMESTAMP = r'[^\S\n]*(?:(?=[\[(（]?[^\S\n]*\d)(?=((?:' + UNIT_PATTERN + '|' + CLOCK_PATTERN + r')))\1)?'
+_SPEAKER = '(?:' + BRACKET_SPEAKER_PATTERN + '|' + BARE_SPEAKER_PATTERN + '|' + NAMED_SPEAKER_PATTERN + ')'
+# 以字面量 \n 开头，引擎直接跳到下一个换行再尝试匹配，不在行中间逐字符试探；换行后只跳过同一行的空白，
+# 连续空行不会被反复扫描（单独一行的时间戳仍归下一句发言）。标签本身不跨行，finditer 找完一个标签后
+# 下一行的换行符还在，不会漏掉紧接着的标签
+LINE_TAG_RE = re.compile(r'\n' + _TIMESTAMP + _SPEAKER)
+FIRST_LINE_TAG_RE = re.compile(r'\s*' + _TIMESTAMP + _SPEAKER)
+
+
+def _hint_pattern():
+    """标签的必要条件：说话人写法后面紧跟空白、分隔符、右括号或冒号，或者 ]：/】：（只写名字的标签）
+
+    每个分支都以字面量开头，引擎先用首字符集合跳过无关字符，比直接搜索 _SPEAKER 快得多
+    """
+    after = r'(?:[^\S\n]|[\]】：:·\-－])'
+    branches = []
+    for label in sorted(SPEAKER_ALIASES, key=len, reverse=True):
+        if label.isascii():
+            branches += [first + '(?i:' + re.escape(label[1:]) + ')' + after
+                         for first in (label[0].upper(), label[0].lower())]
+        else:
+            branches.append(re.escape(label) + after)
+    return re.compile('|'.join(branches + [r'\][^\S\n]*[：:]', r'】[^\S\n]*[：:]']))
+
+
+# 文中第一处可能的标签；一处都没有的转录（只有时间戳的整篇正文）不必逐行扫描
+SPEAKER_HINT_RE = _hint_pattern()
+# 方括号标签 / 不带括号的标签中说话人写法所在的分组（前面是原子分组和两种时间戳的分组）
+_BRACKET_GROUP = 1 + re.compile(UNIT_PATTERN).groups + re.compile(CLOCK_PATTERN).groups + 1
+_BARE_GROUP = _BRACKET_GROUP + re.compile(BRACKET_SPEAKER_PATTERN).groups
+PARAGRAPH_BREAK_RE = re.compile(r'\n[ \t]*\n')
+WHITESPACE = frozenset(' \t\r\n\u3000')
+
+# 启发式判断用的模式（与原 identify_host_statements 一致）
+DEFAULT_HOST_KEYWORDS = ["主持人", "主播", "我", "我们", "今天", "这一期", "邀请", "欢迎", "接下来", "刚才", "刚才我们"]
+# 等价于 [嘉宾]|受访者|被访谈，写成字符集开头让引擎可以快速跳过无关字符
+GUEST_MARK_RE = re.compile(r'[嘉宾受被](?:(?<=[嘉宾])|(?<=受)访者|(?<=被)访谈)')
+QUESTION_RE = re.compile(r'[?？]')
+GUIDE_START_RE = re.compile(r'[ \t]*(?:让我们|现在|接下来|这一期|今天|欢迎)')
+TOPIC_RE = re.compile(r'要聊|要讨论|来聊聊|来谈谈|来听听')
+
+Span = Tuple[int, int, str]
+
+
+def _keyword_pattern(host_keywords: List[str]):
+    if host_keywords is None:
+        host_keywords = DEFAULT_HOST_KEYWORDS
+    # 与 _LABELS 一样只给英文关键词加 (?i:)，中文关键词不必按忽略大小写逐字比较
+    return re.compile('|'.join(f'(?i:{re.escape(k)})' if k.isascii() else re.escape(k)
+                               for k in sorted(host_keywords, key=len, reverse=True)))
+
+
+_DEFAULT_KEYWORD_RE = _keyword_pattern(None)
+
+
+def speaker_spans(text: str) -> List[Span]:
+    """按说话人标签切分：返回 [(起点, 终点, '主播'|'嘉宾'|'其他'), ...]，区间不含标签本身"""
+    spans = []
+    hint = SPEAKER_HINT_RE.search(text)
+    if not hint:
+        return spans
+    # 第一处标签写法所在行之前不会有标签行，从这一行开始扫描
+    line_start = text.rfind('\n', 0, hint.start())
+    first = FIRST_LINE_TAG_RE.match(text) if line_start < 0 else None
+    matches = LINE_TAG_RE.finditer(text, first.end() if first else line_start)
+    role = None
+    body_start = 0
+    for match in chain((first,), matches) if first else matches:
+        if role is not None:
+            end = match.start()
+            while end > body_start and text[end - 1] in WHITESPACE:
+                end -= 1
+            if end > body_start:
+                spans.append((body_start, end, role))
+        label = match.group(_BRACKET_GROUP) or match.group(_BARE_GROUP)
+        role = SPEAKER_ALIASES[label.lower()] if label else '其他'
+        body_start = match.end()
+    if role is not None:
+        end = len(text)
+        while end > body_start and text[end - 1] in WHITESPACE:
+            end -= 1
+        if end > body_start:
+            spans.append((body_start, end, role))
+    return spans
+
+
+def heuristic_host_spans(text: str, host_keywords: List[str] = None) -> List[Span]:
+    """没有说话人标签时按空行分段，挑出像主播说的段落"""
+    keyword_re = _DEFAULT_KEYWORD_RE if host_keywords is None else _keyword_pattern(host_keywords)
+    spans = []
+    start = 0
+    breaks = [(m.start(), m.end()) for m in PARAGRAPH_BREAK_RE.finditer(text)]
+    breaks.append((len(text), len(text)))
+    for para_end, next_start in breaks:
+        if (para_end > start
+                and keyword_re.search(text, start, para_end)
+                and not GUEST_MARK_RE.search(text, start, para_end)
+                and (QUESTION_RE.search(text, start, para_end)
+                     or GUIDE_START_RE.match(text, start, para_end)
+                     or TOPIC_RE.search(text, start, para_end))):
+            spans.append((start, para_end, '主播'))
+        start = next_start
+    return spans
+
+
+def host_spans(text: str, host_keywords: List[str] = None) -> List[Span]:
+    """主播发言区间：优先用说话人标签，没有主播标签时退回启发式判断"""
+    spans = [span for span in speaker_spans(text) if span[2] == '主播']
+    if spans:
+        return spans
+    return heuristic_host_spans(text, host_keywords)
+
+
+def span_texts(text: str, spans: List[Span]) -> List[str]:
+    """按区间取出发言文本"""
+    return [text[start:end] for start, end, _ in spans]
@@ -7,9 +7,20 @@ import os
 import sys
 from pathlib import Path
 import json
-import time
+import argparse
 from typing import List, Dict
 
+sys.path.insert(0, str(Path(__file__).parent))
+from rate_limiter import RateLimiter
+from poller import AdaptivePoller
+from transcription_cache import TranscriptionCache
+from transcription_journal import TranscriptionJournal, collect_orphans
+from chunked_transcription import cache_prompt, resumable_segments, transcribe_chunked
+from transcription_pipeline import (
+    MODEL_CANDIDATES, TranscriptionPipeline, new_job, create_model, emit,
+    upload_stage, process_stage, generate_stage, cleanup_remote, resume_remote_file,
+)
+
 try:
     import google.generativeai as genai
 except ImportError:
@@ -29,75 +40,7 @@ def setup_gemini():
     genai.configure(api_key=GEMINI_API_KEY)
     return genai
 
-def transcribe_audio_with_gemini(audio_file: Path, output_file: Path = None) -> str:
-    """使用Gemini API转录音频文件"""
-    print(f"\n转录音频: {audio_file.name}")
-    
-    if not audio_file.exists():
-        print(f"  ❌ 文件不存在: {audio_file}")
-        return None
-    
-    # 检查文件大小
-    file_size_mb = audio_file.stat().st_size / (1024 * 1024)
-    print(f"  文件大小: {file_size_mb:.1f}MB")
-    
-    # Gemini API支持的最大文件大小通常是20MB，但Gemini 1.5支持更大文件
-    # 如果超过限制，可能需要使用其他方法
-    
-    try:
-        # 初始化Gemini (已在setup_gemini中配置)
-        if not GEMINI_API_KEY:
-            print("  ❌ 错误: GEMINI_API_KEY 未设置")
-            return None
-        
-        # 上传音频文件
-        print(f"  上传音频文件到Gemini...")
-        uploaded_file = genai.upload_file(
-            path=str(audio_file),
-            display_name=audio_file.name
-        )
-        print(f"  文件已上传: {uploaded_file.name}")
-        
-        # 等待文件处理完成
-        max_wait = 300  # 最多等待5分钟
-        wait_time = 0
-        while uploaded_file.state.name == "PROCESSING":
-            if wait_time >= max_wait:
-                print(f"  ⚠️  处理超时")
-                break
-            print(f"  处理中... ({wait_time}秒)")
-            time.sleep(10)
-            wait_time += 10
-            uploaded_file = genai.get_file(uploaded_file.name)
-        
-        if uploaded_file.state.name == "FAILED":
-            print(f"  ❌ 文件处理失败")
-            try:
-                genai.delete_file(uploaded_file.name)
-            except:
-                pass
-            return None
-        
-        if uploaded_file.state.name != "ACTIVE":
-            print(f"  ⚠️  文件状态异常: {uploaded_file.state.name}")
-        
-        # 使用Gemini模型进行转录
-        print(f"  开始转录...")
-        # 使用gemini-2.5-flash模型
-        try:
-            model = genai.GenerativeModel("models/gemini-2.5-flash")
-            print(f"  使用模型: gemini-2.5-flash")
-        except Exception as e:
-            print(f"  ⚠️  无法使用gemini-2.5-flash: {e}")
-            # 备用方案：尝试其他模型
-            try:
-                model = genai.GenerativeModel("models/gemini-2.0-flash")
-                print(f"  使用备用模型: gemini-2.0-flash")
-            except:
-                model = genai.GenerativeModel("gemini-pro")
-                print(f"  使用默认模型: gemini-pro")
-        
-        prompt = """请将这段中文播客音频完整转录为文字。重要要求：
+TRANSCRIPTION_PROMPT = """请将这段中文播客音频完整转录为文字。重要要求：
 
 **关键要求**：
 - 必须明确区分"主播/主持人"和"节目嘉宾"的发言
@@ -118,97 +61,239 @@ def transcribe_audio_with_gemini(audio_file: Path, output_file: Path = None) ->
    [嘉宾]：我认为这个问题...
    [主播]：那你觉得...
 """
-        
-        print(f"  发送转录请求...")
-        response = model.generate_content([uploaded_file, prompt])
-        
-        transcription = response.text
-        
-        # 保存转录文本
-        if output_file:
-            output_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(transcription)
-            print(f"  ✅ 转录完成，已保存到: {output_file}")
-            print(f"  转录文本长度: {len(transcription)} 字符")
+
+# 缓存键使用的模型版本（首选模型）
+TRANSCRIPTION_MODEL = MODEL_CANDIDATES[0]
+
+def transcribe_audio_with_gemini(audio_file: Path, output_file: Path = None, rate_limiter: RateLimiter = None,
+                                 poller: AdaptivePoller = None, cache: TranscriptionCache = None,
+                                 stream: bool = False, journal: TranscriptionJournal = None,
+                                 remote_file=None) -> str:
+    """使用Gemini API转录音频文件（单文件依次执行流水线的三个阶段）
+    
+    传入 remote_file（上次运行中已上传的远端文件）时跳过上传。
+    """
+    print(f"\n转录音频: {audio_file.name}")
+    
+    if not audio_file.exists():
+        print(f"  ❌ 文件不存在: {audio_file}")
+        return None
+    
+    # 检查文件大小
+    file_size_mb = audio_file.stat().st_size / (1024 * 1024)
+    print(f"  文件大小: {file_size_mb:.1f}MB")
+    
+    # Gemini API支持的最大文件大小通常是20MB，但Gemini 1.5支持更大文件
+    # 如果超过限制，可能需要使用其他方法
+    
+    throttle = rate_limiter.acquire if rate_limiter else None
+    job = new_job(audio_file, output_file, journal)
+    job['remote_file'] = remote_file
+    try:
+        # 上传音频文件
+        if job['remote_file'] is None:
+            print(f"  上传音频文件到Gemini...")
+            upload_stage(genai, job, throttle)
         else:
-            print(f"  ✅ 转录完成")
+            print(f"  复用已上传的文件: {job['remote_file'].name}")
         
-        # 清理上传的文件
-        try:
-            genai.delete_file(uploaded_file.name)
-            print(f"  已清理上传文件")
-        except Exception as e:
-            print(f"  清理文件时出错: {e}")
+        # 等待文件处理完成
+        process_stage(genai, job, throttle, poller)
+        
+        # 使用Gemini模型进行转录
+        print(f"  开始转录...")
+        model = create_model(genai)
+        print(f"  发送转录请求...")
+        generate_stage(genai, job, model, TRANSCRIPTION_PROMPT, throttle, stream)
         
-        return transcription
+        if cache and output_file:
+            cache.store(audio_file, output_file, job['transcription'], TRANSCRIPTION_PROMPT,
+                        job['model_name'] or TRANSCRIPTION_MODEL)
+        return job['transcription']
         
     except Exception as e:
         print(f"  ❌ 转录失败: {e}")
+        emit(job, 'failed', error=str(e))
         import traceback
         traceback.print_exc()
-        # 尝试清理
-        try:
-            if 'uploaded_file' in locals():
-                genai.delete_file(uploaded_file.name)
-        except:
-            pass
         return None
+    finally:
+        # 清理上传的文件
+        cleanup_remote(genai, job)
+
+def output_path_for(audio_file: Path, podcasts_dir: Path, output_dir: Path) -> Path:
+    """音频文件对应的转录文件路径"""
+    rel_path = audio_file.relative_to(podcasts_dir)
+    return output_dir / rel_path.with_suffix('.txt')
+
+def success_record(audio_file: Path, output_file: Path) -> Dict:
+    """转录成功记录"""
+    return {
+        'audio_file': str(audio_file),
+        'transcription_file': str(output_file),
+        'status': 'success'
+    }
 
-def batch_transcribe(podcasts_dir: Path, output_dir: Path = None):
-    """批量转录音频文件"""
+def merge_transcription_records(record_file: Path, results: List[Dict]):
+    """将本次结果合并进转录记录（按音频路径去重并排序，保证输出稳定）"""
+    records = {}
+    if record_file.exists():
+        try:
+            with open(record_file, 'r', encoding='utf-8') as f:
+                for record in json.load(f):
+                    records[record['audio_file']] = record
+        except (json.JSONDecodeError, KeyError, TypeError):
+            print(f"  ⚠️  转录记录格式异常，将重新生成: {record_file}")
+    
+    for record in results:
+        records[record['audio_file']] = record
+    
+    merged = [records[key] for key in sorted(records)]
+    tmp_file = record_file.with_suffix('.json.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(merged, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, record_file)
+
+def batch_transcribe(podcasts_dir: Path, output_dir: Path = None, workers: int = 1, requests_per_minute: float = 30,
+                     processing_deadline: float = 1800, chunk_threshold_mb: float = None,
+                     segment_seconds: float = 600, overlap_seconds: float = 15, stream: bool = False):
+    """批量转录音频文件
+    
+    workers > 1 时使用分阶段流水线，多个文件的上传/处理/生成阶段重叠执行，
+    所有线程共享同一个限速器，代替固定的请求间隔。
+    设置 chunk_threshold_mb 后，超过该大小的音频切成有重叠的片段分段并发转录。
+    stream=True 时转录文本边生成边写入 .partial 文件，可用 transcription_progress.py 查看进度。
+    """
     if output_dir is None:
         output_dir = Path(__file__).parent.parent / "transcriptions"
     
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # 查找所有音频文件
+    # 查找所有音频文件（排序以保证处理顺序和记录顺序稳定）
     audio_files = []
     for ext in ['*.mp3', '*.m4a', '*.wav', '*.aac']:
         audio_files.extend(podcasts_dir.rglob(ext))
+    audio_files.sort()
     
     if not audio_files:
         print(f"未找到音频文件在: {podcasts_dir}")
         return
     
-    print(f"找到 {len(audio_files)} 个音频文件")
+    workers = max(1, workers)
+    print(f"找到 {len(audio_files)} 个音频文件（每阶段并发数: {workers}）")
+    
+    rate_limiter = RateLimiter(requests_per_minute)
+    # 轮询节奏根据历史处理耗时自适应，历史记录保存在输出目录
+    poller = AdaptivePoller(history_file=output_dir / "processing_history.json", deadline=processing_deadline)
+    
+    # 按音频内容哈希缓存，文件改名/重新编号后无需重新转录
+    cache = TranscriptionCache(output_dir)
+    # 任务日志：逐步记录状态，崩溃后可复用已上传的远端文件并回收遗留文件
+    journal = TranscriptionJournal(output_dir)
+    previous_states = journal.replay()
     
     results = []
-    for i, audio_file in enumerate(audio_files, 1):
-        print(f"\n[{i}/{len(audio_files)}]")
-        
-        # 生成输出文件名
-        rel_path = audio_file.relative_to(podcasts_dir)
-        output_file = output_dir / rel_path.with_suffix('.txt')
-        
-        # 如果已存在转录文件，跳过
+    jobs = []
+    chunked_jobs = []
+    for audio_file in audio_files:
+        output_file = output_path_for(audio_file, podcasts_dir, output_dir)
+        # 如果已存在转录文件，跳过（不登记到缓存：不知道它是用哪个提示词和模型生成的，也不必为此计算音频哈希）
         if output_file.exists():
             print(f"  跳过（已存在）: {output_file.name}")
-            with open(output_file, 'r', encoding='utf-8') as f:
-                transcription = f.read()
-        else:
-            transcription = transcribe_audio_with_gemini(audio_file, output_file)
+            results.append(success_record(audio_file, output_file))
+            continue
         
+        chunked = bool(chunk_threshold_mb) and audio_file.stat().st_size > chunk_threshold_mb * 1024 * 1024
+        prompt = cache_prompt(TRANSCRIPTION_PROMPT, segment_seconds, overlap_seconds) if chunked else TRANSCRIPTION_PROMPT
+        cached_text = cache.lookup(audio_file, prompt, TRANSCRIPTION_MODEL)
+        if cached_text is not None:
+            print(f"  缓存命中（音频内容相同）: {output_file.name}")
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            output_file.write_text(cached_text, encoding='utf-8')
+            results.append(success_record(audio_file, output_file))
+        elif chunked:
+            # 分段任务本身没有远端文件，断点续传以片段为单位：上次已上传、尚未转录完的片段复用远端文件
+            job = new_job(audio_file, output_file, journal)
+            job['resume'] = resumable_segments(previous_states, output_file)
+            if job['resume']:
+                print(f"  断点续传，{len(job['resume'])} 个片段复用已上传的文件: {output_file.name}")
+            emit(job, 'queued')
+            chunked_jobs.append(job)
+        else:
+            job = new_job(audio_file, output_file, journal)
+            previous = previous_states.get(str(audio_file), {})
+            if previous.get('state') in ('uploaded', 'processing'):
+                job['remote_file'] = resume_remote_file(genai, previous.get('remote_name'))
+                if job['remote_file'] is not None:
+                    print(f"  断点续传，复用已上传的文件: {job['remote_file'].name}")
+            emit(job, 'queued')
+            jobs.append(job)
+    
+    # 回收上次运行遗留、本次不再使用的远端文件
+    in_use = [job['remote_file'].name for job in jobs if job['remote_file'] is not None]
+    in_use += [name for job in chunked_jobs for name in job['resume'].values()]
+    collect_orphans(genai, journal, in_use)
+    
+    print(f"待转录: {len(jobs) + len(chunked_jobs)} 个文件（分段 {len(chunked_jobs)} 个，缓存命中 {cache.hits} 个）")
+    if workers == 1:
+        for i, job in enumerate(jobs, 1):
+            print(f"\n[{i}/{len(jobs)}]")
+            if transcribe_audio_with_gemini(job['audio_file'], job['output_file'], rate_limiter, poller, cache, stream,
+                                            journal, job['remote_file']):
+                results.append(success_record(job['audio_file'], job['output_file']))
+    elif jobs:
+        # 上传/处理/生成三个阶段重叠执行；处理阶段主要是等待，给更多并发
+        pipeline = TranscriptionPipeline(
+            genai, TRANSCRIPTION_PROMPT,
+            upload_workers=workers, process_workers=workers * 2, generate_workers=workers,
+            rate_limiter=rate_limiter, poller=poller, stream=stream,
+        )
+        for job in pipeline.run(jobs):
+            if job['transcription']:
+                cache.store(job['audio_file'], job['output_file'], job['transcription'], TRANSCRIPTION_PROMPT,
+                            job['model_name'] or TRANSCRIPTION_MODEL)
+                results.append(success_record(job['audio_file'], job['output_file']))
+        print(pipeline.format_metrics())
+    
+    # 长音频：片段之间并发，失败的片段单独重试
+    for job in chunked_jobs:
+        transcription = transcribe_chunked(
+            genai, job['audio_file'], job['output_file'], TRANSCRIPTION_PROMPT,
+            segment_seconds=segment_seconds, overlap_seconds=overlap_seconds, workers=max(2, workers),
+            rate_limiter=rate_limiter, poller=poller, journal=journal, resume=job['resume'],
+        )
         if transcription:
-            results.append({
-                'audio_file': str(audio_file),
-                'transcription_file': str(output_file),
-                'status': 'success'
-            })
-        
-        time.sleep(2)  # 避免API请求过快
+            emit(job, 'saved', output_file=job['output_file'])
+            cache.store(job['audio_file'], job['output_file'], transcription,
+                        cache_prompt(TRANSCRIPTION_PROMPT, segment_seconds, overlap_seconds), TRANSCRIPTION_MODEL)
+            results.append(success_record(job['audio_file'], job['output_file']))
+        else:
+            emit(job, 'failed', error="分段转录失败")
     
     # 保存转录记录
     record_file = output_dir / "transcription_records.json"
-    with open(record_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    merge_transcription_records(record_file, results)
+    journal.compact()
     
     print(f"\n✅ 批量转录完成！记录已保存到: {record_file}")
     print(f"成功转录: {len(results)} 个文件")
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="使用Gemini API批量转录播客音频")
+    parser.add_argument("--workers", type=int, default=1, help="流水线每个阶段的并发数（默认1，即串行）")
+    parser.add_argument("--rpm", type=float, default=30, help="所有线程共享的每分钟API请求上限（默认30）")
+    parser.add_argument("--processing-deadline", type=float, default=1800,
+                        help="单个文件远端处理的最长等待秒数（默认1800）")
+    parser.add_argument("--chunk-threshold-mb", type=float, default=None,
+                        help="超过该大小（MB）的音频分段并发转录（默认不分段，需要ffmpeg）")
+    parser.add_argument("--segment-minutes", type=float, default=10, help="分段转录时每段的分钟数（默认10）")
+    parser.add_argument("--overlap-seconds", type=float, default=15, help="相邻片段的重叠秒数（默认15）")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式接收转录结果并增量写入 .partial 文件（崩溃时保留已生成部分）")
+    args = parser.parse_args()
+    
     podcasts_dir = Path(__file__).parent.parent / "podcasts"
     output_dir = Path(__file__).parent.parent / "transcriptions"
     
@@ -217,7 +302,10 @@ def main():
         print("请先运行 download_podcasts.py 下载音频文件")
         return
     
-    batch_transcribe(podcasts_dir, output_dir)
+    batch_transcribe(podcasts_dir, output_dir, workers=args.workers, requests_per_minute=args.rpm,
+                     processing_deadline=args.processing_deadline, chunk_threshold_mb=args.chunk_threshold_mb,
+                     segment_seconds=args.segment_minutes * 60, overlap_seconds=args.overlap_seconds,
+                     stream=args.stream)
 
 if __name__ == "__main__":
     main()
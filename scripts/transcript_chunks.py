@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+按发言边界把转录切成不超过 token 预算的分块，供 map-reduce 分析使用
+
+- token 数按字符粗估：中日韩字符约 1 token/字，其余字符约 4 字符/token（与 Gemini 对中文的计数大致相当）
+- 分块只在发言之间切开；单句发言本身超过预算时（整篇没有说话人标签的转录常见），
+  在句末标点处再切，仍然不会丢弃任何文字
+- 每个分块记录它覆盖的发言下标，coverage() 用来确认主播的每句发言都进了某个分块
+"""
+
+import re
+from typing import Dict, List
+
+from transcript_normalizer import format_utterance
+
+CJK_RE = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]')
+SENTENCE_END_RE = re.compile(r'(?<=[。！？!?；;…])')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估 token 数"""
+    cjk = len(CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _split_long_text(text: str, max_tokens: int) -> List[str]:
+    """在句末标点处把超长文本切成不超过预算的若干段"""
+    pieces = []
+    current = ""
+    for sentence in SENTENCE_END_RE.split(text):
+        if not sentence:
+            continue
+        if current and estimate_tokens(current + sentence) > max_tokens:
+            pieces.append(current)
+            current = ""
+        while estimate_tokens(sentence) > max_tokens:
+            # 连标点都没有的超长句子，按字符硬切
+            cut = max(1, max_tokens)
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:]
+        current += sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_utterances(utterances: List[Dict], max_tokens: int = 12000) -> List[Dict]:
+    """把发言列表切成分块：[{'index', 'text', 'tokens', 'utterances': [发言下标...]}]"""
+    chunks = []
+    lines, members, tokens = [], [], 0
+
+    def flush():
+        nonlocal lines, members, tokens
+        if lines:
+            chunks.append({'index': len(chunks), 'text': "\n".join(lines), 'tokens': tokens, 'utterances': members})
+        lines, members, tokens = [], [], 0
+
+    for i, utterance in enumerate(utterances):
+        line = format_utterance(utterance)
+        line_tokens = estimate_tokens(line)
+        if line_tokens > max_tokens:
+            flush()
+            for piece in _split_long_text(utterance['text'], max_tokens):
+                lines, members, tokens = [format_utterance(dict(utterance, text=piece))], [i], estimate_tokens(piece)
+                flush()
+            continue
+        if tokens + line_tokens > max_tokens:
+            flush()
+        lines.append(line)
+        members.append(i)
+        tokens += line_tokens
+    flush()
+    return chunks
+
+
+def coverage(utterances: List[Dict], chunks: List[Dict], speaker: str = '主播', total: int = None) -> float:
+    """分块覆盖的某个说话人发言字数占比（1.0 表示全覆盖）
+
+    utterances 是压缩过的发言时，total 传原文中该说话人的总字数，分母不随压缩变小。
+    """
+    covered = {i for chunk in chunks for i in chunk['utterances']}
+    if total is None:
+        total = sum(len(u['text']) for u in utterances if u['speaker'] == speaker)
+    if not total:
+        return 1.0
+    return sum(len(utterances[i]['text']) for i in covered if utterances[i]['speaker'] == speaker) / total
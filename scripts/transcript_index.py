@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+转录全文检索：基于列式发言存储（utterance_store）的倒排索引
+
+- 分词：文本转小写后，英文/数字连续串作为一个词，中文等其余文字按相邻两个字切成二元组（单个字自成一词），
+  不需要中文分词词典；索引里另外收录每个字的单字词（不计入文档长度），单字查询（如“钱”）直接查单字词的倒排
+- 文档 = 一句发言，文档编号与 utterances.bin 中的发言下标一致，命中后直接从存储取播客、单集、说话人、时间戳
+- 每个单集一个倒排段文件（normalized/index_segments/<播客>/<单集>.idx），记录源文件哈希；
+  转录变化时只重新切分、重写变化的单集，其余段原样保留，不需要全量合并
+- normalized/search_index.json 记录段的顺序（与发言存储中的单集顺序一致）、对应的存储清单哈希和平均文档长度
+- 段文件布局与发言存储相同（小端，各列 8 字节对齐，读写工具见 column_file），打开时 mmap，词表按 UTF-8 排序后二分查找，
+  加载索引只是映射几十个小文件，不解析倒排
+
+段文件：
+    头部        MAGIC(8) + 版本/文档数/词数(3 x uint32) + 各列偏移(6 x uint64) + 元数据偏移(uint64)
+    term_off    uint32[t+1]  第 k 个词为 terms[term_off[k]:term_off[k+1]]
+    post_off    uint32[t+1]  第 k 个词的倒排为 docs/tfs[post_off[k]:post_off[k+1]]
+    docs        uint32[p]    集内发言下标（升序）
+    tfs         uint16[p]    词在该发言中出现的次数
+    doc_len     uint32[n]    每句发言的词数（tokenize 的结果，不含单字词）
+    terms       bytes        排好序的词首尾相接
+    meta        JSON         源文件哈希、转录文件路径
+
+用法:
+    python3 scripts/transcript_index.py Agent                         # 检索
+    python3 scripts/transcript_index.py Agent --podcast 潘乱 --speaker 主播
+    python3 scripts/transcript_index.py --full                        # 强制重建索引
+"""
+
+import argparse
+import json
+import os
+import re
+import struct
+import time
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from column_file import close_mapping, open_mapping, pad, read_column, write_column
+from transcript_normalizer import MANIFEST_FILENAME, NORMALIZED_DIRNAME
+from utterance_store import STORE_FILENAME, UtteranceStore, build_store
+
+INDEX_FILENAME = "search_index.json"
+SEGMENTS_DIRNAME = "index_segments"
+MAGIC = b"TXTSEG01"
+VERSION = 2  # 2: 收录单字词
+HEADER = struct.Struct("<8s3I7Q")
+MAX_TF = 0xFFFF
+
+TOKEN_RE = re.compile(r'[0-9a-z]+|[^\W0-9a-z_]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """英文/数字串整体为一词，其余文字按二元组切分"""
+    tokens = []
+    for run in TOKEN_RE.findall(text.lower()):
+        if run.isascii() or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[k:k + 2] for k in range(len(run) - 1))
+    return tokens
+
+
+def index_terms(text: str) -> tuple:
+    """返回 (索引词 -> 词频, 文档长度)：tokenize 的词之外，再加上二元组里每个字的单字词"""
+    counts = Counter()
+    length = 0
+    for run in TOKEN_RE.findall(text.lower()):
+        if run.isascii() or len(run) == 1:
+            counts[run] += 1
+            length += 1
+        else:
+            counts.update(run[k:k + 2] for k in range(len(run) - 1))
+            counts.update(run)
+            length += len(run) - 1
+    return counts, length
+
+
+def _segment_path(segments_dir: Path, episode_file: str) -> Path:
+    return segments_dir / Path(episode_file).with_suffix('.idx')
+
+
+def write_segment(segment_file: Path, store: UtteranceStore, j: int, sha256: str):
+    """切分第 j 集的全部发言，写出该集的倒排段文件"""
+    postings = {}
+    doc_lengths = array('I')
+    for local, i in enumerate(store.episode_range(j)):
+        counts, length = index_terms(store.text_at(i))
+        doc_lengths.append(length)
+        for term, tf in counts.items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array('I'), array('H'))
+            entry[0].append(local)
+            entry[1].append(min(tf, MAX_TF))
+
+    term_offsets = array('I', [0])
+    post_offsets = array('I', [0])
+    docs = array('I')
+    tfs = array('H')
+    terms = bytearray()
+    for raw, term in sorted((term.encode('utf-8'), term) for term in postings):
+        term_docs, term_tfs = postings[term]
+        terms += raw
+        docs.extend(term_docs)
+        tfs.extend(term_tfs)
+        term_offsets.append(len(terms))
+        post_offsets.append(len(docs))
+    meta = json.dumps({'sha256': sha256, 'file': store.episodes[j]['file']}, ensure_ascii=False).encode('utf-8')
+
+    segment_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = segment_file.with_suffix('.tmp')
+    with open(tmp_file, 'wb') as f:
+        f.write(b"\0" * HEADER.size)
+        offsets = [write_column(f, column) for column in (term_offsets, post_offsets, docs, tfs, doc_lengths)]
+        pad(f)
+        offsets.append(f.tell())
+        f.write(terms)
+        meta_offset = f.tell()
+        f.write(meta)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(doc_lengths), len(postings), *offsets, meta_offset))
+    os.replace(tmp_file, segment_file)
+
+
+class IndexSegment:
+    """一个单集的只读内存映射倒排段；文档编号是集内发言下标"""
+
+    COLUMNS = ('term_offsets', 'post_offsets', 'docs', 'tfs', 'doc_lengths', 'terms', '_buf')
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file, self._map = open_mapping(self.path)
+        try:
+            self._open()
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self):
+        buf = memoryview(self._map)
+        self._buf = buf
+        if len(buf) < HEADER.size:
+            raise ValueError(f"不是有效的索引段: {self.path}")
+        magic, version, n, t, to_off, po_off, dc_off, tf_off, dl_off, tm_off, meta_off = HEADER.unpack_from(buf)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"不是有效的索引段: {self.path}")
+        self.count = n
+        self.term_count = t
+        self.term_offsets = read_column(buf, to_off, 'I', t + 1)
+        self.post_offsets = read_column(buf, po_off, 'I', t + 1)
+        self.docs = read_column(buf, dc_off, 'I', self.post_offsets[t])
+        self.tfs = read_column(buf, tf_off, 'H', self.post_offsets[t])
+        self.doc_lengths = read_column(buf, dl_off, 'I', n)
+        self.terms = buf[tm_off:meta_off]
+        self.meta = json.loads(bytes(buf[meta_off:]).decode('utf-8'))
+
+    def close(self):
+        close_mapping(self, self.COLUMNS, self._file, self._map)
+        self._file = self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def postings(self, term: str) -> range:
+        """二分查找词表，返回该词的倒排在 docs/tfs 中的区间（词不存在时为空）"""
+        key = term.encode('utf-8')
+        lo, hi = 0, self.term_count
+        offsets, terms = self.term_offsets, self.terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = terms[offsets[mid]:offsets[mid + 1]].tobytes()
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return range(self.post_offsets[mid], self.post_offsets[mid + 1])
+        return range(0)
+
+
+def _segment_is_current(segment_file: Path, sha256: str, count: int) -> bool:
+    try:
+        with IndexSegment(segment_file) as segment:
+            return segment.meta.get('sha256') == sha256 and segment.count == count
+    except (OSError, ValueError):
+        return False
+
+
+def build_index(transcriptions_dir: Path, full: bool = False) -> Path:
+    """增量更新发言存储和各单集的索引段，返回索引清单路径；存储没变时什么都不做"""
+    transcriptions_dir = Path(transcriptions_dir)
+    store_file = build_store(transcriptions_dir, full=full)
+    normalized_dir = transcriptions_dir / NORMALIZED_DIRNAME
+    index_file = normalized_dir / INDEX_FILENAME
+    segments_dir = normalized_dir / SEGMENTS_DIRNAME
+
+    with UtteranceStore(store_file) as store:
+        digest = store.meta.get('manifest_sha256')
+        if not full and index_file.exists():
+            try:
+                with open(index_file, 'r', encoding='utf-8') as f:
+                    existing = json.load(f)
+                if existing.get('version') == VERSION and existing.get('manifest_sha256') == digest:
+                    return index_file
+            except (OSError, json.JSONDecodeError):
+                pass
+
+        with open(normalized_dir / MANIFEST_FILENAME, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        segments = []
+        live_segments = set()
+        rebuilt = 0
+        total_length = 0
+        for j, episode in enumerate(store.episodes):
+            count = store.episode_offsets[j + 1] - store.episode_offsets[j]
+            sha256 = manifest.get(episode['file'], {}).get('sha256', '')
+            segment_file = _segment_path(segments_dir, episode['file'])
+            live_segments.add(segment_file)
+            if full or not _segment_is_current(segment_file, sha256, count):
+                write_segment(segment_file, store, j, sha256)
+                rebuilt += 1
+            with IndexSegment(segment_file) as segment:
+                total_length += sum(segment.doc_lengths)
+            segments.append(str(segment_file.relative_to(segments_dir)))
+
+        # 源转录已删除的单集
+        if segments_dir.exists():
+            for segment_file in segments_dir.rglob('*.idx'):
+                if segment_file not in live_segments:
+                    segment_file.unlink()
+
+        tmp_file = index_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': VERSION,
+                'manifest_sha256': digest,
+                'segments': segments,
+                'doc_count': len(store),
+                'avg_doc_len': total_length / len(store) if len(store) else 0.0,
+                'rebuilt_segments': rebuilt,
+            }, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_file, index_file)
+    return index_file
+
+
+class TranscriptIndex:
+    """检索索引：发言存储 + 按单集顺序排列的索引段，文档编号为存储中的全局发言下标"""
+
+    def __init__(self, transcriptions_dir: Path):
+        normalized_dir = Path(transcriptions_dir) / NORMALIZED_DIRNAME
+        with open(normalized_dir / INDEX_FILENAME, 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.store = UtteranceStore(normalized_dir / STORE_FILENAME)
+        self.segments = []
+        try:
+            if (self.meta.get('version') != VERSION
+                    or self.meta.get('manifest_sha256') != self.store.meta.get('manifest_sha256')):
+                raise ValueError("检索索引与发言存储不一致，请先运行 python3 scripts/transcript_index.py 重建")
+            for name in self.meta['segments']:
+                self.segments.append(IndexSegment(normalized_dir / SEGMENTS_DIRNAME / name))
+        except Exception:
+            self.close()
+            raise
+        self.count = len(self.store)
+        self.avg_doc_len = self.meta['avg_doc_len']
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def episode_of(self, i: int) -> int:
+        """全局发言下标所属的单集下标"""
+        offsets = self.store.episode_offsets
+        lo, hi = 0, len(self.segments)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if offsets[mid + 1] <= i:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def postings(self, term: str) -> Iterator:
+        """按文档编号升序产出 (全局发言下标, 词频)"""
+        offsets = self.store.episode_offsets
+        for j, segment in enumerate(self.segments):
+            base = offsets[j]
+            for p in segment.postings(term):
+                yield base + segment.docs[p], segment.tfs[p]
+
+    def doc_freq(self, term: str) -> int:
+        return sum(len(segment.postings(term)) for segment in self.segments)
+
+    def doc_length(self, i: int) -> int:
+        j = self.episode_of(i)
+        return self.segments[j].doc_lengths[i - self.store.episode_offsets[j]]
+
+    def hit(self, i: int) -> Dict:
+        """发言 i 的检索结果：播客、单集、说话人、名字、时间戳、文本"""
+        episode = self.store.episodes[self.episode_of(i)]
+        return dict(self.store.utterance(i), id=i, podcast=episode['podcast'], episode=episode['episode'],
+                    file=episode['file'])
+
+    def search(self, query: str, podcast: str = None, speaker: str = None, limit: int = 20) -> List[Dict]:
+        """包含查询中每个词（按空白分隔）的发言，按播客/单集/时间顺序返回
+
+        在每个单集的索引段内对倒排求交得到候选，再核对原文，排除二元组都在但不相连的误命中。
+        """
+        parts = query.lower().split()
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        results = []
+        for j, segment in enumerate(self.segments):
+            episode = self.store.episodes[j]
+            if podcast and podcast not in episode['podcast']:
+                continue
+            ranges = sorted((segment.postings(term) for term in terms), key=len)
+            if not ranges[0]:
+                continue
+            candidates = {segment.docs[p] for p in ranges[0]}
+            for postings in ranges[1:]:
+                candidates.intersection_update(segment.docs[p] for p in postings)
+                if not candidates:
+                    break
+            base = self.store.episode_offsets[j]
+            for local in sorted(candidates):
+                i = base + local
+                if speaker and self.store.speaker(i) != speaker:
+                    continue
+                text = self.store.text_at(i).lower()
+                if all(part in text for part in parts):
+                    results.append(self.hit(i))
+                    if len(results) >= limit:
+                        return results
+        return results
+
+
+def open_index(transcriptions_dir: Path = None, rebuild: bool = True) -> TranscriptIndex:
+    """打开检索索引及其发言存储（rebuild=True 时先增量更新）"""
+    if transcriptions_dir is None:
+        transcriptions_dir = Path(__file__).parent.parent / "transcriptions"
+    if rebuild:
+        build_index(transcriptions_dir)
+    return TranscriptIndex(transcriptions_dir)
+
+
+def format_timestamp(seconds: float) -> str:
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def snippet(text: str, query: str, width: int = 60) -> str:
+    """截取第一个查询词附近的文字，并用【】标出"""
+    lower = text.lower()
+    for part in query.lower().split():
+        pos = lower.find(part)
+        if pos >= 0:
+            start = max(0, pos - width // 2)
+            end = min(len(text), pos + len(part) + width // 2)
+            return (('…' if start else '') + text[start:pos] + '【' + text[pos:pos + len(part)] + '】'
+                    + text[pos + len(part):end] + ('…' if end < len(text) else ''))
+    return text[:width]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="转录全文检索")
+    parser.add_argument("query", nargs="*", help="检索词（多个词时要求同时出现）")
+    parser.add_argument("--podcast", help="只看播客目录名包含该字符串的结果（如 潘乱）")
+    parser.add_argument("--speaker", choices=["主播", "嘉宾", "其他"], help="只看该说话人的发言")
+    parser.add_argument("--limit", type=int, default=20, help="最多显示条数")
+    parser.add_argument("--full", action="store_true", help="强制重建存储和索引")
+    parser.add_argument("--dir", type=Path, default=Path(__file__).parent.parent / "transcriptions",
+                        help="转录目录（默认 transcriptions/）")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index_file = build_index(args.dir, full=args.full)
+    built = time.perf_counter()
+    with open_index(args.dir, rebuild=False) as index:
+        opened = time.perf_counter()
+        if not args.query:
+            size = sum(segment.path.stat().st_size for segment in index.segments)
+            print(f"✅ 检索索引: {index_file}（{len(index.segments)} 个索引段，{size / 1024 / 1024:.1f} MB）")
+            print(f"   发言 {index.count} 句，倒排 {sum(len(segment.docs) for segment in index.segments)} 条，"
+                  f"最近一次更新重新切分了 {index.meta.get('rebuilt_segments', 0)} 个单集")
+            print(f"   更新 {(built - started) * 1000:.0f} ms，加载 {(opened - built) * 1000:.1f} ms")
+            return
+        query = ' '.join(args.query)
+        results = index.search(query, args.podcast, args.speaker, args.limit)
+        elapsed = (time.perf_counter() - opened) * 1000
+        for hit in results:
+            speaker = hit['speaker'] or '-'
+            if hit['name']:
+                speaker += f" {hit['name']}"
+            print(f"{hit['podcast']} | {hit['episode']} | {speaker} | {format_timestamp(hit['start'])}")
+            print(f"    {snippet(hit['text'], query)}")
+        print(f"\n共 {len(results)} 条（最多显示 {args.limit} 条），检索 {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
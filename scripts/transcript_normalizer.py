@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+转录文本规范化：把各种时间戳/说话人写法统一为结构化的发言列表
+
+现有转录混用了多种格式，例如：
+    00:02 ...                          [00:00:08] [主播]：...
+    (00:20) [主播] ...                 [00:16.270]...
+    [ 0m1s713ms - 0m5s463ms ] ...      [ 0分7秒151毫秒 - 0分15秒311毫秒 ] ...
+    [嘉宾 许梦圆]：...                  主持人: ...
+单独一行的时间戳作用于下一句发言；没有时间戳也没有说话人的行并入上一句发言；
+[音乐]、（背景音乐）等纯音效行和 ``` / ## / --- 等排版行会被丢弃。
+
+规范化结果按原目录结构保存为 transcriptions/normalized/<播客>/<单集>.jsonl，
+每行一句发言：{"speaker": "主播"|"嘉宾"|"其他"|null, "name": 名字或null, "start": 秒数或null, "text": 正文}。
+manifest.json 记录源文件的大小、修改时间和哈希，增量模式只处理变化过的文件。
+
+用法:
+    python3 scripts/transcript_normalizer.py          # 增量规范化
+    python3 scripts/transcript_normalizer.py --full   # 全部重新处理
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+NORMALIZED_DIRNAME = "normalized"
+MANIFEST_FILENAME = "manifest.json"
+
+# 说话人写法 -> 统一标签
+SPEAKER_ALIASES = {
+    '主播': '主播', '主持人': '主播', '主持': '主播', 'host': '主播',
+    '嘉宾': '嘉宾', '受访者': '嘉宾', 'guest': '嘉宾',
+    '其他': '其他',
+}
+# 英文写法不区分大小写，只给这几个写法加 (?i:)，中文写法不必每个字都按忽略大小写比较
+_LABELS = '|'.join(f'(?i:{label})' if label.isascii() else label
+                   for label in sorted(SPEAKER_ALIASES, key=len, reverse=True))
+
+# 行首时间戳和说话人标签的正则片段（不含行首锚点）。speaker_spans 用同一组片段在整篇文本上扫描，
+# 两边对“哪一行是谁在说话”的判断保持一致
+# [ 0m1s713ms - 0m5s463ms ] / [ 0分7秒151毫秒 - 0分15秒311毫秒 ] / [1m03:07s]（时m分:秒s）
+UNIT_PATTERN = r'\[\s*(?:(\d+)(?:h|时|小时|m(?=\d+:)))?\s*(\d+)(?:m|分|(?<=m\d):|(?<=m\d\d):)\s*(\d+)(?:s|秒)\s*(?:(\d+)(?:ms|毫秒))?\s*(?:-[^\]]*)?\]\s*'
+# [00:00:08] / (00:20) / [00:16.270] / 00:04:770 / 00:02
+CLOCK_PATTERN = r'[\[(（]?\s*(\d{1,2}):(\d{2})(?::(\d{2,3}))?(?:\.(\d{1,3}))?\s*[\])）]?(?=\s|$|\[|【|[^\d:])\s*'
+# 说话人标签里的空白写成 [^\S\n]：逐行解析时与 \s 相同，在整篇文本上扫描时标签不会跨行、不会吞掉下一行的换行
+# [主播]：/ [嘉宾 许梦圆]：/ 【主播】 / [主播] 后面可不带冒号
+BRACKET_SPEAKER_PATTERN = (r'[\[【][^\S\n]*(' + _LABELS + r')(?:(?:[^\S\n]|[·:：\-－])+([^\]】\n]{1,20}?))?'
+                           r'[^\S\n]*[\]】][^\S\n]*[：:]?[^\S\n]*')
+# 主持人: / 嘉宾：
+BARE_SPEAKER_PATTERN = r'(' + _LABELS + r')(?:[^\S\n]+([^：:\s]{1,20}))?[^\S\n]*[：:][^\S\n]*'
+# [李翔]： 这种只写名字的标签
+NAMED_SPEAKER_PATTERN = r'[\[【]([^\]】\d\n]{1,12})[\]】][^\S\n]*[：:][^\S\n]*'
+
+UNIT_RE = re.compile(r'^\s*' + UNIT_PATTERN)
+CLOCK_RE = re.compile(r'^\s*' + CLOCK_PATTERN)
+BRACKET_SPEAKER_RE = re.compile('^' + BRACKET_SPEAKER_PATTERN)
+BARE_SPEAKER_RE = re.compile('^' + BARE_SPEAKER_PATTERN)
+NAMED_SPEAKER_RE = re.compile('^' + NAMED_SPEAKER_PATTERN)
+# [音乐] / （背景音乐） / (音乐播放)
+CUE_ONLY_RE = re.compile(r'^\s*([\[【(（][^\]】)）]{0,30}[\]】)）]\s*)+$')
+LAYOUT_RE = re.compile(r'^\s*(```|#{1,6}\s|---+\s*$|\*\*\*+\s*$)')
+
+
+def parse_timestamp(line: str) -> Tuple[float, str]:
+    """解析行首时间戳，返回 (秒数或None, 去掉时间戳后的文本)"""
+    match = UNIT_RE.match(line)
+    if match:
+        hours, minutes, seconds, millis = match.groups()
+        value = int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis or 0) / 1000
+        return value, line[match.end():]
+    match = CLOCK_RE.match(line)
+    if match:
+        first, second, third, fraction = match.groups()
+        if third is None:
+            value = int(first) * 60 + int(second)
+        elif len(third) == 3:
+            # 00:04:770 = 分:秒:毫秒
+            value = int(first) * 60 + int(second) + int(third) / 1000
+        else:
+            value = int(first) * 3600 + int(second) * 60 + int(third)
+        if fraction:
+            value += int(fraction) / (10 ** len(fraction))
+        return value, line[match.end():]
+    return None, line
+
+
+def parse_speaker(line: str) -> Tuple[str, str, str]:
+    """解析行首说话人，返回 (统一标签或None, 名字或None, 剩余文本)"""
+    match = BRACKET_SPEAKER_RE.match(line) or BARE_SPEAKER_RE.match(line)
+    if match:
+        name = match.group(2).strip() if match.group(2) else None
+        return SPEAKER_ALIASES[match.group(1).lower()], name, line[match.end():]
+    match = NAMED_SPEAKER_RE.match(line)
+    if match:
+        return '其他', match.group(1).strip(), line[match.end():]
+    return None, None, line
+
+
+def parse_line(line: str) -> Tuple[float, str, str, str]:
+    """拆出 (秒数, 说话人, 名字, 正文)；时间戳和说话人标签的先后顺序都可以"""
+    start, rest = parse_timestamp(line)
+    speaker, name, rest = parse_speaker(rest.strip())
+    if start is None and speaker is not None:
+        start, rest = parse_timestamp(rest)
+    return start, speaker, name, rest.strip()
+
+
+def parse_transcript(text: str) -> List[Dict]:
+    """把一篇转录解析为发言列表"""
+    utterances = []
+    pending_start = None
+    current = None
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line or LAYOUT_RE.match(line):
+            continue
+        start, speaker, name, body = parse_line(line)
+        if CUE_ONLY_RE.match(body) if body else False:
+            body = ''
+        if not body:
+            # 单独一行的时间戳/说话人标签，作用于下一句
+            if start is not None:
+                pending_start = start
+            if speaker is not None:
+                current = {'speaker': speaker, 'name': name, 'start': pending_start, 'text': ''}
+                utterances.append(current)
+                pending_start = None
+            continue
+        if start is None:
+            start = pending_start
+        pending_start = None
+
+        if speaker is None and current is not None and (start is None or not current['text']):
+            # 没有新标签的行：并入上一句（上一句为空时补上时间戳）
+            if current['start'] is None:
+                current['start'] = start
+            current['text'] = f"{current['text']}\n{body}" if current['text'] else body
+            continue
+        if speaker is None and current is not None:
+            # 带时间戳但没有说话人：沿用上一句的说话人
+            speaker, name = current['speaker'], current['name']
+        current = {'speaker': speaker, 'name': name, 'start': start, 'text': body}
+        utterances.append(current)
+    return [u for u in utterances if u['text']]
+
+
+def format_utterance(utterance: Dict) -> str:
+    """按统一格式输出一句发言：[HH:MM:SS] [主播]：正文"""
+    parts = []
+    if utterance.get('start') is not None:
+        seconds = int(utterance['start'])
+        parts.append(f"[{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}] ")
+    if utterance.get('speaker'):
+        label = utterance['speaker'] + (f" {utterance['name']}" if utterance.get('name') else '')
+        parts.append(f"[{label}]：")
+    parts.append(utterance['text'])
+    return ''.join(parts)
+
+
+def normalized_path(transcription_file: Path, transcriptions_dir: Path) -> Path:
+    rel_path = Path(transcription_file).relative_to(transcriptions_dir)
+    return transcriptions_dir / NORMALIZED_DIRNAME / rel_path.with_suffix('.jsonl')
+
+
+def _source_fingerprint(path: Path) -> Dict:
+    stat = path.stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _load_manifest(manifest_file: Path) -> Dict:
+    if manifest_file.exists():
+        try:
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            pass
+    return {}
+
+
+def write_utterances(path: Path, utterances: List[Dict]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_suffix('.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        for utterance in utterances:
+            f.write(json.dumps(utterance, ensure_ascii=False, separators=(',', ':')) + "\n")
+    os.replace(tmp_file, path)
+
+
+def read_utterances(path: Path) -> List[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def normalize_all(transcriptions_dir: Path, full: bool = False) -> Dict:
+    """规范化目录下所有转录；增量模式只处理大小/修改时间/内容变化过的文件"""
+    transcriptions_dir = Path(transcriptions_dir)
+    normalized_dir = transcriptions_dir / NORMALIZED_DIRNAME
+    manifest_file = normalized_dir / MANIFEST_FILENAME
+    manifest = {} if full else _load_manifest(manifest_file)
+
+    stats = {'processed': 0, 'unchanged': 0, 'removed': 0}
+    seen = set()
+    for txt_file in sorted(transcriptions_dir.rglob('*.txt')):
+        if normalized_dir in txt_file.parents:
+            continue
+        key = str(txt_file.relative_to(transcriptions_dir))
+        seen.add(key)
+        fingerprint = _source_fingerprint(txt_file)
+        entry = manifest.get(key)
+        out_file = normalized_path(txt_file, transcriptions_dir)
+        if entry and out_file.exists() and all(entry.get(k) == v for k, v in fingerprint.items()):
+            stats['unchanged'] += 1
+            continue
+        data = txt_file.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if entry and out_file.exists() and entry.get('sha256') == digest:
+            # 只是修改时间变了，内容没变
+            entry.update(fingerprint)
+            stats['unchanged'] += 1
+            continue
+        utterances = parse_transcript(data.decode('utf-8', errors='replace'))
+        write_utterances(out_file, utterances)
+        manifest[key] = dict(fingerprint, sha256=digest, utterances=len(utterances))
+        stats['processed'] += 1
+
+    for key in [k for k in manifest if k not in seen]:
+        stale = normalized_dir / Path(key).with_suffix('.jsonl')
+        if stale.exists():
+            stale.unlink()
+        del manifest[key]
+        stats['removed'] += 1
+
+    normalized_dir.mkdir(parents=True, exist_ok=True)
+    tmp_file = manifest_file.with_suffix('.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_file, manifest_file)
+    return stats
+
+
+def load_utterances(transcription_file: Path, transcriptions_dir: Path = None) -> List[Dict]:
+    """读取一篇转录的结构化发言：规范化结果是最新的就直接加载，否则现场解析"""
+    transcription_file = Path(transcription_file)
+    if transcriptions_dir is None:
+        transcriptions_dir = Path(__file__).parent.parent / "transcriptions"
+    try:
+        out_file = normalized_path(transcription_file, Path(transcriptions_dir))
+    except ValueError:
+        out_file = None
+    if out_file and out_file.exists() and out_file.stat().st_mtime_ns >= transcription_file.stat().st_mtime_ns:
+        return read_utterances(out_file)
+    return parse_transcript(transcription_file.read_text(encoding='utf-8', errors='replace'))
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="规范化转录文本为结构化发言")
+    parser.add_argument("--full", action="store_true", help="忽略清单，全部重新处理")
+    parser.add_argument("--dir", type=Path, default=Path(__file__).parent.parent / "transcriptions",
+                        help="转录目录（默认 transcriptions/）")
+    args = parser.parse_args()
+
+    stats = normalize_all(args.dir, full=args.full)
+    print(f"✅ 规范化完成: 处理 {stats['processed']} 个，未变化 {stats['unchanged']} 个，清理 {stats['removed']} 个")
+    print(f"结果目录: {args.dir / NORMALIZED_DIRNAME}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+按音频内容寻址的转录缓存
+
+缓存键 = 音频内容的SHA-256 + 转录提示词与模型的哈希。
+音频文件被重命名或重新编号（如 download_podcasts_simple 的 episode_counter）后，
+只要内容和提示词不变就直接复用已有转录，不再上传和付费转录。
+只登记本流程生成的转录；更早留下的转录文件不知道用的是哪个提示词和模型，不登记，以免当成当前键的命中。
+
+索引是 transcriptions/ 下的 JSON-lines 文件，每行一条记录，只追加不改写。
+转录文本本身不复制，记录中保存转录文件相对路径和文本哈希，命中时校验文本未被改动。
+"""
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Dict
+
+INDEX_FILENAME = "transcription_cache.jsonl"
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """分块计算文件SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def prompt_key(prompt: str, model_name: str) -> str:
+    """提示词+模型版本的短哈希"""
+    return hashlib.sha256(f"{model_name}\n{prompt}".encode('utf-8')).hexdigest()[:16]
+
+
+class TranscriptionCache:
+    """音频哈希 -> 转录文件 的持久化索引"""
+
+    def __init__(self, root_dir: Path):
+        self.root_dir = Path(root_dir)
+        self.index_file = self.root_dir / INDEX_FILENAME
+        self.lock = threading.Lock()
+        self.entries = {}   # (audio_sha256, prompt_key) -> 记录
+        self.stat_memo = {}  # (音频路径, 大小, mtime_ns) -> audio_sha256，避免重复读取大文件
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not self.index_file.exists():
+            return
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self._remember(entry)
+                except (json.JSONDecodeError, KeyError):
+                    continue  # 跳过写了一半的行
+
+    def _remember(self, entry: Dict):
+        self.entries[(entry['audio_sha256'], entry['prompt_key'])] = entry
+        if entry.get('audio_path'):
+            self.stat_memo[(entry['audio_path'], entry['audio_size'], entry['audio_mtime_ns'])] = entry['audio_sha256']
+
+    def audio_hash(self, audio_file: Path) -> str:
+        """音频内容哈希（文件大小和修改时间未变时直接用已知结果）"""
+        stat = audio_file.stat()
+        memo_key = (str(audio_file), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            known = self.stat_memo.get(memo_key)
+        if known:
+            return known
+        digest = file_sha256(audio_file)
+        with self.lock:
+            self.stat_memo[memo_key] = digest
+        return digest
+
+    def lookup(self, audio_file: Path, prompt: str, model_name: str) -> str:
+        """命中返回转录文本，否则返回None"""
+        key = (self.audio_hash(audio_file), prompt_key(prompt, model_name))
+        with self.lock:
+            entry = self.entries.get(key)
+        text = None
+        if entry:
+            cached_file = self.root_dir / entry['transcription_file']
+            if cached_file.exists():
+                text = cached_file.read_text(encoding='utf-8')
+                if text_sha256(text) != entry['text_sha256']:
+                    text = None  # 转录文件已被修改或替换，视为未命中
+        with self.lock:
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return text
+
+    def store(self, audio_file: Path, transcription_file: Path, text: str, prompt: str, model_name: str):
+        """登记一条转录结果"""
+        stat = audio_file.stat()
+        try:
+            rel_file = Path(transcription_file).resolve().relative_to(self.root_dir.resolve())
+        except ValueError:
+            rel_file = Path(transcription_file).resolve()
+        entry = {
+            'audio_sha256': self.audio_hash(audio_file),
+            'prompt_key': prompt_key(prompt, model_name),
+            'model': model_name,
+            'transcription_file': str(rel_file),
+            'text_sha256': text_sha256(text),
+            'audio_path': str(audio_file),
+            'audio_size': stat.st_size,
+            'audio_mtime_ns': stat.st_mtime_ns,
+        }
+        with self.lock:
+            old = self.entries.get((entry['audio_sha256'], entry['prompt_key']))
+            if old and all(old.get(k) == entry[k] for k in entry):
+                return
+            self._remember(entry)
+            self.root_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.index_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
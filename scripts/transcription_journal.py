@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+转录任务日志：只追加的 JSON-lines 文件，记录每个音频文件的状态变化
+
+状态依次为 queued -> uploaded（附远端文件名）-> processing -> generated -> saved -> remote_deleted，
+出错时记录 failed。每次状态变化立即落盘，因此进程崩溃后：
+- 已上传但未完成的文件可以直接复用远端文件，无需重新上传
+- 日志中记录过但从未删除的远端文件可以被回收，不会遗留在 Gemini 文件存储中
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict
+
+JOURNAL_FILENAME = "transcription_journal.jsonl"
+
+STATES = ["queued", "uploaded", "processing", "generated", "saved", "remote_deleted", "failed"]
+
+
+class TranscriptionJournal:
+    """线程安全的转录状态日志"""
+
+    def __init__(self, root_dir: Path):
+        self.path = Path(root_dir) / JOURNAL_FILENAME
+        self.lock = threading.Lock()
+
+    def record(self, audio_file, state: str, **fields):
+        """追加一条状态记录并立即落盘"""
+        if state not in STATES:
+            raise ValueError(f"未知状态: {state}")
+        entry = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'audio_file': str(audio_file), 'state': state}
+        entry.update({k: str(v) if isinstance(v, Path) else v for k, v in fields.items() if v is not None})
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _entries(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 崩溃时写了一半的行
+
+    def replay(self) -> Dict[str, Dict]:
+        """按日志重建每个音频文件的最新状态
+
+        queued 开始新一轮任务，之前各轮的字段全部丢弃；remote_name 只保留到 remote_deleted 为止，
+        远端文件删除后的状态（以及压缩后的日志）不再指向它。
+        """
+        latest = {}
+        for entry in self._entries():
+            if entry['state'] == 'queued':
+                latest[entry['audio_file']] = dict(entry)
+                continue
+            state = latest.setdefault(entry['audio_file'], {})
+            state.update(entry)
+            if entry['state'] == 'remote_deleted':
+                state.pop('remote_name', None)
+        return latest
+
+    def resumable_remote(self, audio_file) -> str:
+        """上次运行中已上传、尚未生成转录的远端文件名"""
+        state = self.replay().get(str(audio_file), {})
+        if state.get('state') in ('uploaded', 'processing'):
+            return state.get('remote_name')
+        return None
+
+    def orphans(self, in_use=()) -> Dict[str, str]:
+        """日志中上传过但没有删除记录的远端文件：远端文件名 -> 音频路径"""
+        uploaded = {}
+        for entry in self._entries():
+            name = entry.get('remote_name')
+            if not name:
+                continue
+            if entry['state'] == 'remote_deleted':
+                uploaded.pop(name, None)
+            else:
+                uploaded[name] = entry['audio_file']
+        in_use = set(in_use)
+        return {name: audio_file for name, audio_file in uploaded.items() if name not in in_use}
+
+    def compact(self):
+        """把日志压缩为每个文件的最新状态一行（未回收的远端文件各保留一条上传记录）"""
+        with self.lock:
+            latest = self.replay()
+            orphans = self.orphans()
+            tmp_file = self.path.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                for remote_name, audio_file in orphans.items():
+                    if latest.get(audio_file, {}).get('remote_name') != remote_name:
+                        entry = {'audio_file': audio_file, 'state': 'uploaded', 'remote_name': remote_name}
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                for entry in latest.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp_file, self.path)
+
+
+def collect_orphans(client, journal: TranscriptionJournal, in_use=()) -> int:
+    """删除日志中遗留的远端文件，返回删除数量"""
+    removed = 0
+    for remote_name, audio_file in journal.orphans(in_use).items():
+        try:
+            client.delete_file(remote_name)
+            print(f"  🧹 已回收遗留的远端文件: {remote_name}（{Path(audio_file).name}）")
+            removed += 1
+        except Exception as e:
+            # 远端文件已过期或已被删除
+            print(f"  远端文件 {remote_name} 无法删除（可能已过期）: {e}")
+        journal.record(audio_file, 'remote_deleted', remote_name=remote_name)
+    return removed
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+分阶段的转录流水线：上传 -> 等待处理 -> 生成转录
+
+每个阶段有独立的工作线程和并发上限，阶段之间用队列连接，
+因此第N+1个文件上传时，第N个文件可以在远端处理，第N-1个文件在生成转录。
+处理阶段由单个轮询线程负责，每轮统一查询所有到期的待处理文件（见 poller.poll_many）。
+
+任务字典中带有 'journal'（TranscriptionJournal）时，各阶段的状态变化会写入任务日志，
+已带 remote_file 的任务（上次运行中已上传的文件）跳过上传阶段。
+
+client 参数是 google.generativeai 模块或具有相同接口
+（upload_file / get_file / delete_file / GenerativeModel）的本地替身，便于离线测试。
+"""
+
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from poller import AdaptivePoller, poll_many
+from transcription_progress import StreamingTranscriptWriter
+
+STAGES = ["upload", "process", "generate"]
+
+# 模型优先级：gemini-2.5-flash，失败时依次回退
+MODEL_CANDIDATES = ["models/gemini-2.5-flash", "models/gemini-2.0-flash", "gemini-pro"]
+
+
+def create_model(client, candidates: List[str] = None):
+    """按优先级创建Gemini模型"""
+    candidates = candidates or MODEL_CANDIDATES
+    last_error = None
+    for name in candidates:
+        try:
+            return client.GenerativeModel(name)
+        except Exception as e:
+            print(f"  ⚠️  无法使用{name}: {e}")
+            last_error = e
+    raise last_error
+
+
+def new_job(audio_file: Path, output_file: Path = None, journal=None) -> Dict:
+    """创建一个转录任务"""
+    return {
+        'audio_file': Path(audio_file),
+        'output_file': Path(output_file) if output_file else None,
+        'remote_file': None,
+        'transcription': None,
+        'model_name': None,
+        'error': None,
+        'timings': {},
+        'journal': journal,
+    }
+
+
+def emit(job: Dict, state: str, **fields):
+    """把任务状态变化写入任务日志（如果有）"""
+    journal = job.get('journal')
+    if journal:
+        journal.record(job['audio_file'], state, **fields)
+
+
+def resume_remote_file(client, remote_name: str):
+    """获取上次运行中上传的远端文件，已过期或处理失败时返回None"""
+    if not remote_name:
+        return None
+    try:
+        remote_file = client.get_file(remote_name)
+    except Exception:
+        return None
+    if remote_file.state.name == "FAILED":
+        return None
+    return remote_file
+
+
+def upload_stage(client, job: Dict, throttle: Callable = None):
+    """上传音频文件"""
+    audio_file = job['audio_file']
+    if throttle:
+        throttle()
+    job['remote_file'] = client.upload_file(path=str(audio_file), display_name=audio_file.name)
+    emit(job, 'uploaded', remote_name=job['remote_file'].name)
+    print(f"  [{audio_file.name}] 文件已上传: {job['remote_file'].name}")
+
+
+def process_stage(client, job: Dict, throttle: Callable = None, poller: AdaptivePoller = None):
+    """等待远端文件处理完成"""
+    emit(job, 'processing', remote_name=job['remote_file'].name)
+    poller = poller or AdaptivePoller()
+    job['remote_file'] = poller.wait_for_file(client, job['remote_file'], job['audio_file'].stat().st_size, throttle)
+    check_remote_state(job)
+
+
+def check_remote_state(job: Dict):
+    """处理结束后检查远端文件状态"""
+    remote_file = job['remote_file']
+    if remote_file.state.name == "FAILED":
+        raise RuntimeError("文件处理失败")
+    if remote_file.state.name != "ACTIVE":
+        print(f"  [{job['audio_file'].name}] ⚠️  文件状态异常: {remote_file.state.name}")
+
+
+def generate_stage(client, job: Dict, model, prompt: str, throttle: Callable = None, stream: bool = False):
+    """生成转录文本并保存（任务自带 prompt 时优先使用）
+
+    stream=True 时边接收边写入 .partial 文件，完成后原子重命名为正式文件。
+    """
+    if throttle:
+        throttle()
+    contents = [job['remote_file'], job.get('prompt') or prompt]
+    output_file = job['output_file']
+    job['model_name'] = getattr(model, 'model_name', None)
+
+    if stream and output_file:
+        writer = StreamingTranscriptWriter(output_file, job['audio_file'])
+        try:
+            for chunk in model.generate_content(contents, stream=True):
+                writer.append(chunk.text)
+        except Exception:
+            writer.fail()
+            raise
+        emit(job, 'generated')
+        transcription = writer.finish()
+    else:
+        transcription = model.generate_content(contents).text
+        emit(job, 'generated')
+        if output_file:
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(transcription)
+    job['transcription'] = transcription
+
+    if output_file:
+        emit(job, 'saved', output_file=output_file)
+        print(f"  [{job['audio_file'].name}] ✅ 转录完成，已保存到: {output_file}（{len(transcription)} 字符）")
+
+
+def cleanup_remote(client, job: Dict):
+    """删除已上传的远端文件"""
+    remote_file = job.get('remote_file')
+    if remote_file is None:
+        return
+    try:
+        client.delete_file(remote_file.name)
+        emit(job, 'remote_deleted', remote_name=remote_file.name)
+        job['remote_file'] = None
+        print(f"  [{job['audio_file'].name}] 已清理上传文件")
+    except Exception as e:
+        print(f"  [{job['audio_file'].name}] 清理文件时出错: {e}")
+
+
+class TranscriptionPipeline:
+    """上传/处理/生成三阶段流水线，每阶段独立并发并记录耗时"""
+
+    def __init__(self, client, prompt: str, model=None, upload_workers: int = 2, process_workers: int = 4,
+                 generate_workers: int = 2, rate_limiter=None, poller: AdaptivePoller = None, stream: bool = False):
+        self.client = client
+        self.prompt = prompt
+        self.model = model
+        self.workers = {
+            'upload': max(1, upload_workers),
+            'process': max(1, process_workers),
+            'generate': max(1, generate_workers),
+        }
+        self.rate_limiter = rate_limiter
+        self.poller = poller or AdaptivePoller()
+        self.stream = stream
+        self.metrics = {stage: {'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0, 'queue_wait': 0.0}
+                        for stage in STAGES}
+        self.metrics_lock = threading.Lock()
+
+    def _throttle(self):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+    def _run_stage(self, stage: str, job: Dict):
+        if stage == 'upload':
+            upload_stage(self.client, job, self._throttle)
+        else:
+            generate_stage(self.client, job, self.model, self.prompt, self._throttle, self.stream)
+            cleanup_remote(self.client, job)
+
+    def _record(self, stage: str, elapsed: float, queue_wait: float, failed: bool):
+        with self.metrics_lock:
+            m = self.metrics[stage]
+            m['count'] += 1
+            m['total'] += elapsed
+            m['max'] = max(m['max'], elapsed)
+            m['queue_wait'] += queue_wait
+            if failed:
+                m['errors'] += 1
+
+    def _finish(self, stage: str, job: Dict, started: float, enqueued_at: float, error: Exception,
+                outbox: queue.Queue, done: queue.Queue):
+        failed = error is not None
+        if failed:
+            job['error'] = f"{stage}: {error}"
+            emit(job, 'failed', error=job['error'])
+            print(f"  [{job['audio_file'].name}] ❌ {stage} 阶段失败: {error}")
+            cleanup_remote(self.client, job)
+        finished = time.monotonic()
+        job['timings'][stage] = finished - started
+        self._record(stage, finished - started, started - enqueued_at, failed)
+        # 失败的任务直接结束，不进入后续阶段
+        (done if failed or outbox is None else outbox).put((job, finished))
+
+    def _worker(self, stage: str, inbox: queue.Queue, outbox: queue.Queue, done: queue.Queue):
+        while True:
+            item = inbox.get()
+            if item is None:
+                return
+            job, enqueued_at = item
+            started = time.monotonic()
+            error = None
+            try:
+                self._run_stage(stage, job)
+            except Exception as e:
+                error = e
+            self._finish(stage, job, started, enqueued_at, error, outbox, done)
+
+    def _process_loop(self, inbox: queue.Queue, outbox: queue.Queue, done: queue.Queue):
+        """处理阶段：单线程批量轮询所有待处理文件，最多同时跟踪 workers['process'] 个"""
+        pending = {}  # 远端文件名 -> 跟踪状态
+        closing = False
+        while True:
+            now = time.monotonic()
+            timeout = max(0.0, min(p['next_due'] for p in pending.values()) - now) if pending else None
+            if not closing and len(pending) < self.workers['process']:
+                try:
+                    item = inbox.get(timeout=timeout)
+                except queue.Empty:
+                    item = False
+                if item is None:
+                    closing = True
+                elif item:
+                    job, enqueued_at = item
+                    emit(job, 'processing', remote_name=job['remote_file'].name)
+                    size_bytes = job['audio_file'].stat().st_size
+                    intervals = self.poller.intervals(size_bytes)
+                    pending[job['remote_file'].name] = {
+                        'job': job, 'enqueued_at': enqueued_at, 'started': time.monotonic(),
+                        'size_bytes': size_bytes, 'intervals': intervals,
+                        'next_due': time.monotonic() + next(intervals),
+                    }
+                    continue
+            elif timeout:
+                time.sleep(timeout)
+            if closing and not pending:
+                return
+
+            now = time.monotonic()
+            due = [name for name, p in pending.items() if p['next_due'] <= now]
+            if not due:
+                continue
+            self._throttle()
+            try:
+                states = poll_many(self.client, due)
+            except Exception as e:
+                print(f"  ⚠️  查询文件状态失败: {e}")
+                for name in due:
+                    pending[name]['next_due'] = now + next(pending[name]['intervals'])
+                continue
+
+            for name in due:
+                p = pending[name]
+                job = p['job']
+                job['remote_file'] = states[name]
+                elapsed = time.monotonic() - p['started']
+                if job['remote_file'].state.name != "PROCESSING":
+                    del pending[name]
+                    error = None
+                    try:
+                        check_remote_state(job)
+                        self.poller.record(p['size_bytes'], elapsed)
+                    except Exception as e:
+                        error = e
+                    self._finish('process', job, p['started'], p['enqueued_at'], error, outbox, done)
+                elif elapsed >= self.poller.deadline:
+                    del pending[name]
+                    self._finish('process', job, p['started'], p['enqueued_at'],
+                                 TimeoutError(f"处理超时（{elapsed:.0f}秒）"), outbox, done)
+                else:
+                    p['next_due'] = time.monotonic() + next(p['intervals'])
+
+    def run(self, jobs: List[Dict]) -> List[Dict]:
+        """运行流水线，按输入顺序返回任务"""
+        if not jobs:
+            return []
+        if self.model is None:
+            self.model = create_model(self.client)
+
+        queues = {stage: queue.Queue() for stage in STAGES}
+        done = queue.Queue()
+        threads = {}
+        for index, stage in enumerate(STAGES):
+            outbox = queues[STAGES[index + 1]] if index + 1 < len(STAGES) else None
+            if stage == 'process':
+                threads[stage] = [
+                    threading.Thread(target=self._process_loop, args=(queues[stage], outbox, done), daemon=True)
+                ]
+            else:
+                threads[stage] = [
+                    threading.Thread(target=self._worker, args=(stage, queues[stage], outbox, done), daemon=True)
+                    for _ in range(self.workers[stage])
+                ]
+            for t in threads[stage]:
+                t.start()
+
+        now = time.monotonic()
+        for job in jobs:
+            # 已有远端文件（断点续传）的任务直接进入处理阶段
+            queues['process' if job['remote_file'] is not None else 'upload'].put((job, now))
+
+        # 所有任务要么完成生成，要么在某个阶段失败后进入done
+        for _ in jobs:
+            done.get()
+
+        for stage in STAGES:
+            for _ in threads[stage]:
+                queues[stage].put(None)
+            for t in threads[stage]:
+                t.join()
+        return jobs
+
+    def format_metrics(self) -> str:
+        """各阶段耗时统计"""
+        lines = ["阶段耗时统计:"]
+        for stage in STAGES:
+            m = self.metrics[stage]
+            avg = m['total'] / m['count'] if m['count'] else 0
+            avg_wait = m['queue_wait'] / m['count'] if m['count'] else 0
+            lines.append(
+                f"  {stage:<8} 并发 {self.workers[stage]} | 完成 {m['count']} 失败 {m['errors']} | "
+                f"平均 {avg:.1f}s 最长 {m['max']:.1f}s | 平均排队 {avg_wait:.1f}s"
+            )
+        return "\n".join(lines)
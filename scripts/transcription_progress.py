@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+流式转录的增量落盘与进度查看
+
+流式模式下模型返回的文本块逐块追加到 <转录文件>.partial，
+同时在 <转录文件>.progress.json 中记录已写字符数、耗时和速率。
+全部完成后 .partial 原子重命名为正式的 .txt，进度文件删除；
+中途崩溃时已生成的部分仍保留在 .partial 中。
+
+直接运行本脚本可查看 transcriptions/ 下正在进行的转录进度（monitor_transcription.sh 会调用）。
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+PARTIAL_SUFFIX = ".partial"
+PROGRESS_SUFFIX = ".progress.json"
+
+
+def partial_path(output_file: Path) -> Path:
+    return output_file.with_name(output_file.name + PARTIAL_SUFFIX)
+
+
+def progress_path(output_file: Path) -> Path:
+    return output_file.with_name(output_file.name + PROGRESS_SUFFIX)
+
+
+class StreamingTranscriptWriter:
+    """把流式返回的文本块追加写入 .partial，并定期刷新进度文件"""
+
+    def __init__(self, output_file: Path, audio_file: Path = None, progress_interval: float = 2):
+        self.output_file = Path(output_file)
+        self.audio_file = audio_file
+        self.progress_interval = progress_interval
+        self.partial_file = partial_path(self.output_file)
+        self.progress_file = progress_path(self.output_file)
+        self.chars = 0
+        self.chunks = []
+        self.started = time.time()
+        self.last_report = 0.0
+        self.output_file.parent.mkdir(parents=True, exist_ok=True)
+        self.handle = open(self.partial_file, 'w', encoding='utf-8')
+        self._write_progress('streaming')
+
+    def _write_progress(self, state: str):
+        elapsed = time.time() - self.started
+        progress = {
+            'output_file': str(self.output_file),
+            'audio_file': str(self.audio_file) if self.audio_file else None,
+            'state': state,
+            'chars': self.chars,
+            'elapsed_seconds': round(elapsed, 1),
+            'chars_per_second': round(self.chars / elapsed, 1) if elapsed > 0 else 0,
+            'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        tmp_file = self.progress_file.with_name(self.progress_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(progress, f, ensure_ascii=False)
+        os.replace(tmp_file, self.progress_file)
+
+    def append(self, text: str):
+        if not text:
+            return
+        self.handle.write(text)
+        self.handle.flush()
+        self.chunks.append(text)
+        self.chars += len(text)
+        now = time.monotonic()
+        if now - self.last_report >= self.progress_interval:
+            self.last_report = now
+            self._write_progress('streaming')
+
+    def finish(self) -> str:
+        """落盘并原子替换为正式文件，返回全文"""
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+        self.handle.close()
+        os.replace(self.partial_file, self.output_file)
+        try:
+            self.progress_file.unlink()
+        except FileNotFoundError:
+            pass
+        return "".join(self.chunks)
+
+    def fail(self):
+        """保留 .partial，进度标记为失败"""
+        if not self.handle.closed:
+            self.handle.close()
+        self._write_progress('failed')
+
+
+def read_progress(root_dir: Path) -> List[Dict]:
+    """读取目录下所有进行中/失败的流式转录进度"""
+    results = []
+    for progress_file in sorted(Path(root_dir).rglob('*' + PROGRESS_SUFFIX)):
+        try:
+            with open(progress_file, 'r', encoding='utf-8') as f:
+                progress = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            continue
+        progress['stale_seconds'] = round(time.time() - progress_file.stat().st_mtime, 1)
+        results.append(progress)
+    return results
+
+
+def main():
+    """打印转录进度"""
+    root_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent.parent / "transcriptions"
+    progress_list = read_progress(root_dir)
+    if not progress_list:
+        print("⏳ 没有进行中的流式转录")
+        return
+    for progress in progress_list:
+        icon = "📝" if progress['state'] == 'streaming' else "❌"
+        print(f"{icon} {Path(progress['output_file']).name}")
+        print(f"   状态: {progress['state']} | 已写入: {progress['chars']} 字符 | "
+              f"耗时: {progress['elapsed_seconds']:.0f}秒 | 速率: {progress['chars_per_second']:.1f} 字符/秒")
+        print(f"   最后更新: {progress['updated_at']}（{progress['stale_seconds']:.0f}秒前）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+列式发言存储：把所有转录的规范化发言打包成一个可内存映射的二进制文件
+
+文件布局（小端，各列按 8 字节对齐）：
+    头部      MAGIC(8) + 版本/发言数/单集数(3 x uint32) + 各列偏移(6 x uint64) + 元数据长度(uint64)
+    speaker   uint8[n]      说话人编码（SPEAKER_CODES）
+    start     int32[n]      开始时间（毫秒，-1 表示未知）
+    name      uint32[n]     说话人名字在名字表中的下标（0 表示无名字）
+    text_off  uint32[n+1]   第 i 句的 UTF-8 文本为 text[text_off[i]:text_off[i+1]]
+    episode   uint32[m+1]   第 j 集的发言为 [episode[j], episode[j+1])
+    text      bytes         全部发言文本首尾相接
+    meta      JSON          单集列表（播客、文件路径）、名字表、源文件清单哈希
+
+打开时用 mmap 映射整个文件，各列是 memoryview，按下标切片不复制、不重新拆分字符串；
+text_bytes()/text_at() 等按句访问的接口返回复制出来的 bytes/str，调用方持有它们不影响 close()。
+
+用法:
+    python3 scripts/utterance_store.py          # 增量规范化并（必要时）重建存储，打印统计
+    python3 scripts/utterance_store.py --full   # 强制重建
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from column_file import close_mapping, open_mapping, pad, read_column, write_column
+from transcript_normalizer import MANIFEST_FILENAME, NORMALIZED_DIRNAME, normalize_all, read_utterances
+
+STORE_FILENAME = "utterances.bin"
+MAGIC = b"UTTSTOR1"
+VERSION = 2  # 2: 名字下标改为 uint32
+HEADER = struct.Struct("<8s3I7Q")
+
+SPEAKER_CODES = {None: 0, '主播': 1, '嘉宾': 2, '其他': 3}
+SPEAKER_LABELS = {code: label for label, code in SPEAKER_CODES.items()}
+
+
+def _manifest_digest(normalized_dir: Path) -> str:
+    manifest_file = normalized_dir / MANIFEST_FILENAME
+    if not manifest_file.exists():
+        return ""
+    return hashlib.sha256(manifest_file.read_bytes()).hexdigest()
+
+
+def build_store(transcriptions_dir: Path, full: bool = False) -> Path:
+    """规范化转录并打包为列式存储；源文件清单未变时直接复用已有存储"""
+    transcriptions_dir = Path(transcriptions_dir)
+    normalize_all(transcriptions_dir, full=full)
+    normalized_dir = transcriptions_dir / NORMALIZED_DIRNAME
+    store_file = normalized_dir / STORE_FILENAME
+    digest = _manifest_digest(normalized_dir)
+
+    if not full and store_file.exists():
+        try:
+            with UtteranceStore(store_file) as store:
+                if store.meta.get('manifest_sha256') == digest:
+                    return store_file
+        except ValueError:
+            pass  # 旧版本或损坏的文件，重建
+
+    speakers = array('B')
+    starts = array('i')
+    name_ids = array('I')
+    text_offsets = array('I', [0])
+    episode_offsets = array('I', [0])
+    names = [""]
+    name_index = {}
+    episodes = []
+    text_size = 0
+
+    tmp_file = store_file.with_suffix('.tmp')
+    text_tmp = store_file.with_suffix('.text.tmp')
+    with open(text_tmp, 'wb') as text_out:
+        for jsonl_file in sorted(normalized_dir.rglob('*.jsonl')):
+            rel_path = jsonl_file.relative_to(normalized_dir)
+            for utterance in read_utterances(jsonl_file):
+                data = utterance['text'].encode('utf-8')
+                text_out.write(data)
+                text_size += len(data)
+                speakers.append(SPEAKER_CODES.get(utterance['speaker'], 0))
+                starts.append(int(round(utterance['start'] * 1000)) if utterance['start'] is not None else -1)
+                name = utterance.get('name') or ""
+                if name not in name_index:
+                    name_index[name] = len(names)
+                    names.append(name)
+                name_ids.append(name_index[name] if name else 0)
+                text_offsets.append(text_size)
+            episode_offsets.append(len(speakers))
+            episodes.append({
+                'podcast': rel_path.parts[0] if len(rel_path.parts) > 1 else "",
+                'episode': rel_path.stem,
+                'file': str(rel_path.with_suffix('.txt')),
+            })
+
+    meta = json.dumps({'episodes': episodes, 'names': names, 'manifest_sha256': digest},
+                      ensure_ascii=False).encode('utf-8')
+    with open(tmp_file, 'wb') as f:
+        f.write(b"\0" * HEADER.size)
+        offsets = [write_column(f, column) for column in (speakers, starts, name_ids, text_offsets, episode_offsets)]
+        pad(f)
+        offsets.append(f.tell())
+        with open(text_tmp, 'rb') as text_in:
+            for chunk in iter(lambda: text_in.read(1024 * 1024), b''):
+                f.write(chunk)
+        meta_offset = f.tell()
+        f.write(meta)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(speakers), len(episodes), *offsets, meta_offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, store_file)
+    text_tmp.unlink()
+    return store_file
+
+
+class UtteranceStore:
+    """只读的内存映射发言存储"""
+
+    COLUMNS = ('speaker_codes', 'starts', 'name_ids', 'text_offsets', 'episode_offsets', 'text', '_buf')
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file, self._map = open_mapping(self.path)
+        try:
+            self._open()
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self):
+        buf = memoryview(self._map)
+        self._buf = buf
+        if len(buf) < HEADER.size:
+            raise ValueError(f"不是有效的发言存储: {self.path}")
+        magic, version, n, m, sp_off, st_off, nm_off, to_off, ep_off, tx_off, meta_off = HEADER.unpack_from(buf)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"不是有效的发言存储: {self.path}")
+        self.count = n
+        self.speaker_codes = buf[sp_off:sp_off + n]
+        self.starts = read_column(buf, st_off, 'i', n)
+        self.name_ids = read_column(buf, nm_off, 'I', n)
+        self.text_offsets = read_column(buf, to_off, 'I', n + 1)
+        self.episode_offsets = read_column(buf, ep_off, 'I', m + 1)
+        self.text = buf[tx_off:meta_off]
+        self.meta = json.loads(bytes(buf[meta_off:]).decode('utf-8'))
+        self.episodes = self.meta['episodes']
+        self.names = self.meta['names']
+
+    def close(self):
+        close_mapping(self, self.COLUMNS, self._file, self._map)
+        self._file = self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def speaker(self, i: int) -> str:
+        return SPEAKER_LABELS.get(self.speaker_codes[i])
+
+    def name(self, i: int) -> str:
+        return self.names[self.name_ids[i]] or None
+
+    def start(self, i: int) -> float:
+        value = self.starts[i]
+        return value / 1000 if value >= 0 else None
+
+    def text_bytes(self, i: int) -> bytes:
+        """第 i 句的 UTF-8 文本"""
+        return self.text[self.text_offsets[i]:self.text_offsets[i + 1]].tobytes()
+
+    def text_at(self, i: int) -> str:
+        return str(self.text[self.text_offsets[i]:self.text_offsets[i + 1]], 'utf-8')
+
+    def utterance(self, i: int) -> Dict:
+        return {'speaker': self.speaker(i), 'name': self.name(i), 'start': self.start(i), 'text': self.text_at(i)}
+
+    def episode_range(self, j: int) -> range:
+        return range(self.episode_offsets[j], self.episode_offsets[j + 1])
+
+    def find_episode(self, file) -> int:
+        """按转录文件相对路径（如 播客/单集.txt）查找单集下标，找不到返回 -1"""
+        file = str(file)
+        for j, episode in enumerate(self.episodes):
+            if episode['file'] == file:
+                return j
+        return -1
+
+    def iter_episode(self, j: int) -> Iterator[Dict]:
+        for i in self.episode_range(j):
+            yield self.utterance(i)
+
+    def episode_stats(self, j: int) -> Dict:
+        """一集的发言数、各说话人的发言数和文本字节数（只读列，不解码文本）"""
+        rows = self.episode_range(j)
+        codes = self.speaker_codes[rows.start:rows.stop].tobytes()
+        return {
+            'utterances': len(rows),
+            'speakers': {label: codes.count(code) for label, code in SPEAKER_CODES.items() if label},
+            'bytes': self.text_offsets[rows.stop] - self.text_offsets[rows.start],
+        }
+
+    def stats(self) -> List[Dict]:
+        """每个播客的发言数与各说话人的字节数（只读列，不解码文本）"""
+        per_podcast = {}
+        for j, episode in enumerate(self.episodes):
+            entry = per_podcast.setdefault(episode['podcast'], {
+                'podcast': episode['podcast'], 'episodes': 0, 'utterances': 0,
+                'bytes': {label: 0 for label in SPEAKER_CODES if label},
+            })
+            entry['episodes'] += 1
+            for i in self.episode_range(j):
+                entry['utterances'] += 1
+                label = self.speaker(i)
+                if label:
+                    entry['bytes'][label] += self.text_offsets[i + 1] - self.text_offsets[i]
+        return list(per_podcast.values())
+
+
+def open_store(transcriptions_dir: Path = None, rebuild: bool = True) -> UtteranceStore:
+    """打开 transcriptions/normalized/utterances.bin（rebuild=True 时先增量更新）"""
+    if transcriptions_dir is None:
+        transcriptions_dir = Path(__file__).parent.parent / "transcriptions"
+    transcriptions_dir = Path(transcriptions_dir)
+    if rebuild:
+        return UtteranceStore(build_store(transcriptions_dir))
+    return UtteranceStore(transcriptions_dir / NORMALIZED_DIRNAME / STORE_FILENAME)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="构建列式发言存储并打印统计")
+    parser.add_argument("--full", action="store_true", help="强制重新规范化并重建存储")
+    parser.add_argument("--dir", type=Path, default=Path(__file__).parent.parent / "transcriptions",
+                        help="转录目录（默认 transcriptions/）")
+    args = parser.parse_args()
+
+    store_file = build_store(args.dir, full=args.full)
+    with UtteranceStore(store_file) as store:
+        print(f"✅ 发言存储: {store_file}（{store_file.stat().st_size / 1024 / 1024:.1f} MB）")
+        print(f"   单集 {len(store.episodes)} 个，发言 {len(store)} 句，文本 {len(store.text) / 1024 / 1024:.1f} MB")
+        for entry in store.stats():
+            bytes_by_speaker = ' '.join(f"{label} {size / 1024:.0f}KB" for label, size in entry['bytes'].items())
+            print(f"   {entry['podcast']}: {entry['episodes']} 集 / {entry['utterances']} 句 | {bytes_by_speaker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# 脚本之间按同目录导入，测试里同样把 scripts/ 放进导入路径
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+sys.path.insert(0, str(Path(__file__).parent))
@@ -0,0 +1,94 @@
+"""
+google.generativeai 文件/模型接口的本地替身（upload_file / get_file / list_files / delete_file / GenerativeModel）
+
+上传、远端处理和生成都按给定秒数耗时，并记录每种操作的执行区间和最大并发数，供测试检查流水线的阶段重叠和并发上限。
+"""
+
+import threading
+import time
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+
+
+class FakeGenAI:
+    def __init__(self, upload_seconds: float = 0.05, processing_seconds: float = 0.05, generate_seconds: float = 0.05,
+                 failing: tuple = ()):
+        """failing: 远端处理会失败（FAILED）的文件名（display_name）"""
+        self.upload_seconds = upload_seconds
+        self.processing_seconds = processing_seconds
+        self.generate_seconds = generate_seconds
+        self.failing = set(failing)
+        self.lock = threading.Lock()
+        self.files = {}  # 远端文件名 -> {'display_name', 'ready_at'}
+        self.active = Counter()
+        self.peak = Counter()
+        self.intervals = defaultdict(list)  # 操作 -> [(display_name, 开始, 结束)]
+        self.calls = Counter()
+        self.next_id = 0
+
+    def _track(self, op: str, display_name: str, seconds: float):
+        with self.lock:
+            self.calls[op] += 1
+            self.active[op] += 1
+            self.peak[op] = max(self.peak[op], self.active[op])
+        started = time.monotonic()
+        time.sleep(seconds)
+        with self.lock:
+            self.active[op] -= 1
+            self.intervals[op].append((display_name, started, time.monotonic()))
+
+    def _snapshot(self, name: str):
+        entry = self.files[name]
+        if time.monotonic() < entry['ready_at']:
+            state = "PROCESSING"
+        else:
+            state = "FAILED" if entry['display_name'] in self.failing else "ACTIVE"
+        return SimpleNamespace(name=name, display_name=entry['display_name'], state=SimpleNamespace(name=state))
+
+    def upload_file(self, path: str, display_name: str = None):
+        self._track('upload', display_name, self.upload_seconds)
+        with self.lock:
+            self.next_id += 1
+            name = f"files/f{self.next_id}"
+            self.files[name] = {'display_name': display_name,
+                                'ready_at': time.monotonic() + self.processing_seconds}
+            return self._snapshot(name)
+
+    def get_file(self, name: str):
+        with self.lock:
+            self.calls['get_file'] += 1
+            return self._snapshot(name)
+
+    def list_files(self):
+        """和真实接口一样是惰性的迭代器，calls['listed'] 记录实际取出的文件数"""
+        with self.lock:
+            self.calls['list_files'] += 1
+            names = list(self.files)
+        for name in names:
+            with self.lock:
+                self.calls['listed'] += 1
+                snapshot = self._snapshot(name)
+            yield snapshot
+
+    def delete_file(self, name: str):
+        with self.lock:
+            self.calls['delete_file'] += 1
+            del self.files[name]
+
+    def GenerativeModel(self, model_name: str):
+        return FakeModel(self, model_name)
+
+
+class FakeModel:
+    def __init__(self, client: FakeGenAI, model_name: str):
+        self.client = client
+        self.model_name = model_name
+
+    def generate_content(self, contents, stream: bool = False):
+        remote_file, prompt = contents
+        display_name = self.client.files[remote_file.name]['display_name']
+        self.client._track('generate', display_name, self.client.generate_seconds)
+        text = f"[主播]：{display_name} 的转录"
+        if stream:
+            return [SimpleNamespace(text=text[:4]), SimpleNamespace(text=text[4:])]
+        return SimpleNamespace(text=text)
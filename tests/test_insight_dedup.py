@@ -0,0 +1,45 @@
+from insight_dedup import cluster_insights
+
+
+def test_near_duplicates_merge_and_sort_by_support():
+    items = [
+        "主播认为内容创作者应该长期专注一个垂直领域",
+        "大模型",
+        "主播认为，内容创作者应该长期专注于一个垂直领域。",
+        "大模型",
+        "大模形",
+        "主播认为内容创作者应当长期专注一个垂直领域！",
+        "",
+        None,
+    ]
+    clusters = cluster_insights(items)
+    assert [c['support'] for c in clusters] == [3, 2, 1]
+    assert clusters[0]['text'] in (items[0], items[2], items[5])
+    assert len(clusters[0]['members']) == 3
+    # 短条目只合并完全相同的
+    assert (clusters[1]['text'], clusters[2]['text']) == ("大模型", "大模形")
+
+
+def test_non_strings_are_kept_and_only_merged_when_identical():
+    items = [{'topic': "AI"}, "一条独立的观察，和别的都不一样", {'topic': "AI"}, ["x"]]
+    clusters = cluster_insights(items)
+    assert clusters[0] == {'text': {'topic': "AI"}, 'support': 2, 'members': [{'topic': "AI"}, {'topic': "AI"}]}
+    assert [c['text'] for c in clusters[1:]] == ["一条独立的观察，和别的都不一样", ["x"]]
+
+
+def test_embeddings_merge_paraphrases():
+    vectors = {
+        "内容的长期价值来自持续积累的信任": [1.0, 0.0, 0.1],
+        "可信度要靠长时间一点点攒出来才有价值": [0.98, 0.02, 0.12],
+        "短视频平台的分发逻辑正在改变": [0.0, 1.0, 0.0],
+    }
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return [vectors[text] for text in texts]
+
+    clusters = cluster_insights(list(vectors), embed=embed)
+    assert len(calls) == 1
+    assert [c['support'] for c in clusters] == [2, 1]
+    assert clusters[1]['text'] == "短视频平台的分发逻辑正在改变"
@@ -0,0 +1,37 @@
+import argparse
+
+import pytest
+
+from json_extract import JSONObjectScanner, add_structured_argument, extract_json_object, structured_output_enabled
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('```json\n{"a": {"b": [1, 2]}, "c": "}"}\n```', {'a': {'b': [1, 2]}, 'c': "}"}),
+    ('前面 {xxx} 后面 {"a": 1}', {'a': 1}),
+    ('说明：用 { 表示集合。结果如下\n```json\n{"a": 1}\n```', {'a': 1}),
+    ('说明：用 { 表示"集合。结果如下\n{"a": 1}', {'a': 1}),
+    ('例如 { ] 这样的写法。{"a": [1]}', {'a': [1]}),
+    ('{"a": "引号 \\" 和反斜杠 \\\\"}', {'a': '引号 " 和反斜杠 \\'}),
+    ('没有对象 [1, 2]', None),
+    ('{"a": 1', None),
+])
+def test_extract_json_object(text, expected):
+    assert extract_json_object(text) == expected
+
+
+def test_scanner_accepts_chunks_split_anywhere():
+    text = '好的 {"a": "x\\"}", "b": [{"c": 1}]} 结束'
+    for cut in range(len(text) + 1):
+        scanner = JSONObjectScanner()
+        result = scanner.feed(text[:cut]) or scanner.feed(text[cut:])
+        assert result == {'a': 'x"}', 'b': [{'c': 1}]}, cut
+
+
+def test_structured_argument_enables_structured_output(monkeypatch):
+    monkeypatch.delenv("LLM_STRUCTURED_OUTPUT", raising=False)
+    parser = argparse.ArgumentParser()
+    add_structured_argument(parser)
+    assert parser.parse_args([]).structured is False
+    assert not structured_output_enabled()
+    assert parser.parse_args(["--structured"]).structured is True
+    assert structured_output_enabled()
@@ -0,0 +1,37 @@
+import llm_cache
+from llm_cache import LLMCache
+
+
+def test_hits_are_written_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, 'ACCESS_FLUSH_BATCH', 3)
+    cache = LLMCache(tmp_path / "cache.sqlite")
+    cache.put("k", "model", "回复")
+    commits = []
+    cache.conn.set_trace_callback(lambda sql: commits.append(sql) if sql == "COMMIT" else None)
+
+    assert cache.get("k") == "回复"
+    assert cache.get("missing") is None
+    assert commits == []
+    assert cache.get("k") == "回复"
+    assert commits == ["COMMIT"]
+
+    hits, = cache.conn.execute("SELECT hits FROM responses WHERE key = 'k'").fetchone()
+    assert hits == 2
+    assert cache.stats()['total'] == {'hits': 2, 'misses': 1, 'stores': 1}
+
+
+def test_put_evicts_only_when_the_running_estimate_exceeds_the_limit(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite", max_bytes=10)
+    sums = []
+    cache.conn.set_trace_callback(lambda sql: sums.append(sql) if "SUM(size)" in sql else None)
+
+    cache.put("a", "model", "12345")
+    cache.put("b", "model", "12345")
+    assert sums == []
+
+    cache.put("c", "model", "12345")
+    assert len(sums) == 1
+    assert cache.evicted == 1
+    assert cache.get("a") is None
+    assert cache.get("c") == "12345"
+    assert cache._size_estimate == 10
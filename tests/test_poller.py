@@ -0,0 +1,34 @@
+from fake_genai import FakeGenAI
+from poller import poll_many
+
+
+def upload(client, count):
+    return [client.upload_file(path=f"{i}.mp3", display_name=f"{i}.mp3").name for i in range(count)]
+
+
+def test_few_names_use_get_file():
+    client = FakeGenAI(upload_seconds=0)
+    names = upload(client, 300)
+    states = poll_many(client, names[-2:])
+    assert sorted(states) == sorted(names[-2:])
+    assert client.calls['list_files'] == 0
+    assert client.calls['get_file'] == 2
+
+
+def test_list_files_stops_when_all_found():
+    client = FakeGenAI(upload_seconds=0)
+    names = upload(client, 300)
+    states = poll_many(client, names[:5])
+    assert sorted(states) == sorted(names[:5])
+    assert client.calls['listed'] == 5
+    assert client.calls['get_file'] == 0
+
+
+def test_list_files_scan_is_capped():
+    client = FakeGenAI(upload_seconds=0)
+    names = upload(client, 300)
+    wanted = names[:3] + names[-3:]
+    states = poll_many(client, wanted, scan_limit=100)
+    assert sorted(states) == sorted(wanted)
+    assert client.calls['listed'] == 100
+    assert client.calls['get_file'] == 3  # 列表前 100 个里没有的后 3 个
@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+
+import pytest
+
+import resumable_download
+from resumable_download import DownloadManifest, download_resumable, download_segmented, part_path
+
+DATA = bytes(range(256)) * 40  # 10240 字节
+
+
+def make_fetch(data, ranges=True, fail_after=None, etag='"v1"'):
+    """内存里的 fetch(offset, end)：requests 记录每次请求的 (offset, end)，fail_after 字节后断线一次"""
+    requests = []
+    failure = [fail_after]
+
+    @contextmanager
+    def fetch(offset, end=None):
+        requests.append((offset, end))
+        headers = {'ETag': etag}
+        if ranges and (offset or end is not None):
+            if offset >= len(data):
+                headers['Content-Range'] = f"bytes */{len(data)}"
+                yield 416, headers, iter(())
+                return
+            last = len(data) - 1 if end is None else min(end, len(data) - 1)
+            body = data[offset:last + 1]
+            headers['Content-Range'] = f"bytes {offset}-{last}/{len(data)}"
+            status = 206
+        else:
+            body = data
+            headers['Content-Length'] = str(len(data))
+            status = 200
+
+        def chunks():
+            for i in range(0, len(body), 1000):
+                if failure[0] is not None and i >= failure[0]:
+                    failure[0] = None
+                    raise ConnectionError("断线")
+                yield memoryview(bytearray(body[i:i + 1000]))
+        yield status, headers, chunks()
+
+    fetch.requests = requests
+    return fetch
+
+
+def test_interrupted_download_resumes_and_is_recorded(tmp_path):
+    output = tmp_path / "ep.mp3"
+    fetch = make_fetch(DATA, fail_after=3000)
+    assert download_resumable(fetch, output, url="http://x/ep.mp3") == len(DATA)
+    assert output.read_bytes() == DATA
+    assert fetch.requests == [(0, None), (3000, None)]
+    entry = DownloadManifest(tmp_path).entries["ep.mp3"]
+    assert (entry['size'], entry['url'], entry['etag']) == (len(DATA), "http://x/ep.mp3", '"v1"')
+    assert not part_path(output).exists()
+
+
+def test_unregistered_prefix_of_the_same_file_is_resumed(tmp_path):
+    output = tmp_path / "ep.mp3"
+    output.write_bytes(DATA[:5000])
+    fetch = make_fetch(DATA)
+    download_resumable(fetch, output, url="http://x/ep.mp3")
+    assert output.read_bytes() == DATA
+    assert fetch.requests == [(0, 4999), (5000, None)]
+
+
+@pytest.mark.parametrize("existing, fetch", [
+    (DATA[:4000] + b"x" * 1000, make_fetch(DATA)),  # 另一集的内容
+    (DATA + b"extra", make_fetch(DATA)),  # 比服务器上的文件还大
+    (DATA[:5000], make_fetch(DATA, ranges=False)),  # 无法核对
+])
+def test_unverified_existing_file_is_moved_aside(tmp_path, existing, fetch):
+    output = tmp_path / "ep.mp3"
+    output.write_bytes(existing)
+    download_resumable(fetch, output, url="http://x/ep.mp3")
+    assert output.read_bytes() == DATA
+    assert (tmp_path / "ep.mp3.stale").read_bytes() == existing
+
+
+def test_etag_mismatch_with_manifest_entry_moves_file_aside(tmp_path):
+    output = tmp_path / "ep.mp3"
+    output.write_bytes(DATA[:5000])
+    DownloadManifest(tmp_path).record(output, len(DATA), "0" * 64, "http://x/ep.mp3", '"old"')
+    download_resumable(make_fetch(DATA, etag='"new"'), output, url="http://x/ep.mp3")
+    assert output.read_bytes() == DATA
+    assert (tmp_path / "ep.mp3.stale").exists()
+
+
+def test_checksum_mismatch_discards_the_download(tmp_path):
+    output = tmp_path / "ep.mp3"
+    with pytest.raises(ValueError):
+        download_resumable(make_fetch(DATA), output, expected_sha256="0" * 64)
+    assert not output.exists() and not part_path(output).exists()
+
+def test_segmented_download_assembles_ranges(tmp_path, monkeypatch):
+    monkeypatch.setattr(resumable_download, 'MIN_SEGMENT_SIZE', 1000)
+    output = tmp_path / "ep.mp3"
+    fetch = make_fetch(DATA, fail_after=1000)
+    assert download_segmented(fetch, output, 4, url="http://x/ep.mp3") == len(DATA)
+    assert output.read_bytes() == DATA
+    segments = [(0, 2559), (2560, 5119), (5120, 7679), (7680, 10239)]
+    ranged = [request for request in fetch.requests[1:] if request not in segments]
+    assert fetch.requests[0] == (0, 0)
+    assert set(segments) <= set(fetch.requests)
+    # 断线的那一段从已写到的位置续传，只补剩下的部分
+    assert len(ranged) == 1 and any(start < ranged[0][0] and ranged[0][1] == end for start, end in segments)
+    assert DownloadManifest(tmp_path).entries["ep.mp3"]['etag'] == '"v1"'
+
+
+def test_segmented_download_falls_back_without_range_support(tmp_path, monkeypatch):
+    monkeypatch.setattr(resumable_download, 'MIN_SEGMENT_SIZE', 1000)
+    output = tmp_path / "ep.mp3"
+    fetch = make_fetch(DATA, ranges=False)
+    download_segmented(fetch, output, 4)
+    assert output.read_bytes() == DATA
+    assert fetch.requests == [(0, 0), (0, None)]
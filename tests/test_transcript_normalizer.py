@@ -0,0 +1,68 @@
+import pytest
+
+from transcript_normalizer import format_utterance, normalize_all, parse_line, parse_transcript, read_utterances
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("[00:00:08] [主播]：大家好", (8, '主播', None, "大家好")),
+    ("(00:20) [嘉宾] 你好", (20, '嘉宾', None, "你好")),
+    ("[00:16.270]开场", (16.27, None, None, "开场")),
+    ("00:04:770 主持人：欢迎", (4.77, '主播', None, "欢迎")),
+    ("[ 0m1s713ms - 0m5s463ms ] 嘉宾: 嗯", (1.713, '嘉宾', None, "嗯")),
+    ("[ 0分7秒151毫秒 - 0分15秒311毫秒 ] 好的", (7.151, None, None, "好的")),
+    ("[1m03:07s] [主播]: 继续", (3787, '主播', None, "继续")),
+    ("[嘉宾 许梦圆]：我觉得", (None, '嘉宾', "许梦圆", "我觉得")),
+    ("【主播】今天", (None, '主播', None, "今天")),
+    ("[Host]: Hello", (None, '主播', None, "Hello")),
+    ("[李翔]：嗯", (None, '其他', "李翔", "嗯")),
+    ("[主播]：[00:01:02] 先标签后时间", (62, '主播', None, "先标签后时间")),
+    ("普通正文", (None, None, None, "普通正文")),
+])
+def test_parse_line(line, expected):
+    start, speaker, name, text = parse_line(line)
+    assert start == (None if expected[0] is None else pytest.approx(expected[0]))
+    assert (speaker, name, text) == expected[1:]
+
+
+def test_parse_transcript_merges_lines_and_applies_pending_timestamps():
+    text = "\n".join([
+        "## 中文播客音频转录",
+        "```",
+        "[00:00:05]",
+        "[主播]：大家好，",
+        "欢迎收听。",
+        "[音乐]",
+        "[00:00:20] [嘉宾]：谢谢邀请。",
+        "[00:00:31] 接着说。",
+        "[主播]",
+        "那我们开始。",
+        "---",
+    ])
+    assert parse_transcript(text) == [
+        {'speaker': '主播', 'name': None, 'start': 5, 'text': "大家好，\n欢迎收听。"},
+        {'speaker': '嘉宾', 'name': None, 'start': 20, 'text': "谢谢邀请。"},
+        {'speaker': '嘉宾', 'name': None, 'start': 31, 'text': "接着说。"},
+        {'speaker': '主播', 'name': None, 'start': None, 'text': "那我们开始。"},
+    ]
+
+
+def test_format_utterance_round_trips():
+    utterance = {'speaker': '嘉宾', 'name': '许梦圆', 'start': 3725, 'text': "我觉得"}
+    line = format_utterance(utterance)
+    assert line == "[01:02:05] [嘉宾 许梦圆]：我觉得"
+    assert parse_transcript(line) == [utterance]
+
+
+def test_normalize_all_is_incremental(tmp_path):
+    source = tmp_path / "播客" / "01.txt"
+    source.parent.mkdir()
+    source.write_text("[主播]：你好\n", encoding='utf-8')
+
+    assert normalize_all(tmp_path) == {'processed': 1, 'unchanged': 0, 'removed': 0}
+    assert normalize_all(tmp_path) == {'processed': 0, 'unchanged': 1, 'removed': 0}
+    out_file = tmp_path / "normalized" / "播客" / "01.jsonl"
+    assert read_utterances(out_file) == [{'speaker': '主播', 'name': None, 'start': None, 'text': "你好"}]
+
+    source.unlink()
+    assert normalize_all(tmp_path) == {'processed': 0, 'unchanged': 0, 'removed': 1}
+    assert not out_file.exists()
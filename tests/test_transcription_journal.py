@@ -0,0 +1,32 @@
+from transcription_journal import TranscriptionJournal
+
+
+def test_deleted_remote_file_is_not_revived_by_compaction(tmp_path):
+    journal = TranscriptionJournal(tmp_path)
+    journal.record("a.mp3", 'queued')
+    journal.record("a.mp3", 'uploaded', remote_name="files/r1")
+    journal.record("a.mp3", 'remote_deleted', remote_name="files/r1")
+    journal.record("a.mp3", 'queued')
+    journal.record("a.mp3", 'failed', error="upload: boom")
+
+    assert journal.orphans() == {}
+    assert 'remote_name' not in journal.replay()["a.mp3"]
+    journal.compact()
+    assert journal.orphans() == {}
+    assert journal.replay()["a.mp3"]['state'] == 'failed'
+
+
+def test_undeleted_upload_survives_compaction(tmp_path):
+    journal = TranscriptionJournal(tmp_path)
+    journal.record("a.mp3", 'queued')
+    journal.record("a.mp3", 'uploaded', remote_name="files/r1")
+    journal.record("a.mp3", 'processing', remote_name="files/r1")
+    journal.record("b.mp3", 'queued')
+    journal.record("b.mp3", 'uploaded', remote_name="files/r2")
+    journal.record("b.mp3", 'queued')  # 重新排队：r2 仍未删除，还是遗留文件
+
+    journal.compact()
+
+    assert journal.orphans() == {"files/r1": "a.mp3", "files/r2": "b.mp3"}
+    assert journal.resumable_remote("a.mp3") == "files/r1"
+    assert journal.resumable_remote("b.mp3") is None
@@ -0,0 +1,65 @@
+from fake_genai import FakeGenAI
+from poller import AdaptivePoller
+from transcription_pipeline import STAGES, TranscriptionPipeline, new_job
+
+
+def make_jobs(tmp_path, count):
+    jobs = []
+    for i in range(count):
+        audio_file = tmp_path / "audio" / f"{i:02d}.mp3"
+        audio_file.parent.mkdir(exist_ok=True)
+        audio_file.write_bytes(b"\0" * 1024)
+        jobs.append(new_job(audio_file, tmp_path / "out" / f"{i:02d}.txt"))
+    return jobs
+
+
+def fast_poller():
+    return AdaptivePoller(min_interval=0.01, max_interval=0.02, jitter=0, deadline=5)
+
+
+def test_run_overlaps_stages_within_concurrency_caps(tmp_path):
+    client = FakeGenAI(upload_seconds=0.1, processing_seconds=0.02, generate_seconds=0.05)
+    jobs = make_jobs(tmp_path, 8)
+    pipeline = TranscriptionPipeline(client, "prompt", upload_workers=2, process_workers=4, generate_workers=1,
+                                     poller=fast_poller())
+
+    assert pipeline.run(jobs) == jobs
+
+    for job in jobs:
+        assert job['error'] is None
+        assert job['output_file'].read_text(encoding='utf-8') == f"[主播]：{job['audio_file'].name} 的转录"
+    assert client.files == {}  # 生成后远端文件都已删除
+
+    # 每个阶段的并发不超过各自的上限，且上限被用满
+    assert client.peak['upload'] == 2
+    assert client.peak['generate'] == 1
+
+    # 有文件在生成的同时，另一个文件还在上传
+    assert any(u_name != g_name and u_start < g_end and g_start < u_end
+               for u_name, u_start, u_end in client.intervals['upload']
+               for g_name, g_start, g_end in client.intervals['generate'])
+
+    for stage in STAGES:
+        assert pipeline.metrics[stage]['count'] == 8
+        assert pipeline.metrics[stage]['errors'] == 0
+    report = pipeline.format_metrics()
+    assert "upload   并发 2 | 完成 8 失败 0" in report
+    assert "process  并发 4 | 完成 8 失败 0" in report
+    assert "generate 并发 1 | 完成 8 失败 0" in report
+
+
+def test_failed_processing_skips_generation(tmp_path):
+    client = FakeGenAI(upload_seconds=0.01, processing_seconds=0.02, generate_seconds=0.01, failing=("01.mp3",))
+    jobs = make_jobs(tmp_path, 3)
+    pipeline = TranscriptionPipeline(client, "prompt", poller=fast_poller())
+
+    pipeline.run(jobs)
+
+    assert jobs[1]['error'] == "process: 文件处理失败"
+    assert jobs[1]['transcription'] is None
+    assert not jobs[1]['output_file'].exists()
+    assert [job['error'] for job in (jobs[0], jobs[2])] == [None, None]
+    assert client.files == {}
+    assert pipeline.metrics['process']['errors'] == 1
+    assert pipeline.metrics['generate']['count'] == 2
+    assert "process  并发 4 | 完成 3 失败 1" in pipeline.format_metrics()
@@ -0,0 +1,37 @@
+from host_context import compact_host_context, compact_utterances
+from utterance_store import open_store
+
+TRANSCRIPT = "\n".join([
+    "[00:00:01] [主播]：欢迎收听本期节目。",
+    "[嘉宾]：谢谢邀请，我先介绍一下自己，做了很多年产品。",
+    "[00:01:00] [主播]：你怎么看这件事？",
+    "[主播]：嗯。",
+    "[主播]：嗯。",
+    "[嘉宾]：我觉得还早。",
+]) + "\n"
+
+
+def test_episode_stats_and_compaction_come_from_the_store(tmp_path):
+    (tmp_path / "播客_主播").mkdir()
+    (tmp_path / "播客_主播" / "第1期.txt").write_text(TRANSCRIPT, encoding='utf-8')
+
+    with open_store(tmp_path) as store:
+        j = store.find_episode("播客_主播/第1期.txt")
+        assert store.episode_stats(j) == {
+            'utterances': 6,
+            'speakers': {'主播': 4, '嘉宾': 2, '其他': 0},
+            'bytes': sum(len(store.text_bytes(i)) for i in store.episode_range(j)),
+        }
+        context = compact_utterances(list(store.iter_episode(j)))
+
+    expected = compact_host_context(TRANSCRIPT)
+    assert context['text'] == expected['text']
+    assert (context['host_spans'], context['duplicates']) == (3, 1)
+
+
+def test_compact_utterances_without_host_returns_formatted_text():
+    utterances = [{'speaker': None, 'name': None, 'start': 5, 'text': "只有正文"}]
+    context = compact_utterances(utterances)
+    assert context['utterances'] is None
+    assert context['text'] == "[00:00:05] 只有正文"
+    assert context['ratio'] == 1.0